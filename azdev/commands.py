@@ -20,6 +20,7 @@ def load_command_table(self, _):
     # TODO: enhance with tox support
     with CommandGroup(self, '', operation_group('testtool')) as g:
         g.command('test', 'run_tests')
+        g.command('test-stats', 'test_stats')
 
     with CommandGroup(self, '', operation_group('style')) as g:
         g.command('style', 'check_style')
@@ -57,6 +58,8 @@ def load_command_table(self, _):
     with CommandGroup(self, 'perf', operation_group('performance')) as g:
         g.command('load-times', 'check_load_time')
         g.command('benchmark', 'benchmark', is_preview=True, table_transformer=performance_benchmark_data_transformer)
+        g.command('compare', 'compare', is_preview=True)
+        g.command('memory', 'memory', is_preview=True)
 
     with CommandGroup(self, 'extension', operation_group('extensions')) as g:
         g.command('add', 'add_extension')
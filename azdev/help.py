@@ -147,8 +147,41 @@ helps['test'] = """
         - name: Run tests for a module but run the tests that failed last time first.
           text: azdev test {mod} -a --ff
 
+        - name: Run the tests of a module against two profiles at the same time.
+          text: azdev test {mod} --profiles latest,2019-03-01-hybrid
+
+        - name: Run recorded tests of a module without forking a process for every test.
+          text: azdev test {mod} --isolation worker
+
+        - name: Run recently failed tests first, then those of changed modules, then the longest ones.
+          text: azdev test CLI --order failed changed slowest
+
         - name: Run tests for only those modules which have changed based on a git diff.
           text: azdev test --repo azure-cli --tgt upstream/master --src upstream/dev
+
+        - name: Record which source files every test executes.
+          text: azdev test CLI --record-impact
+
+        - name: Run only the tests which executed files changed by a git diff, according to the recording.
+          text: azdev test --impacted --repo azure-cli --tgt upstream/dev
+
+        - name: Run the second of eight shards of equal expected run time, on one of eight CI agents.
+          text: azdev test CLI --shard 2/8 --durations-from results/*.xml
+
+        - name: Rebuild the test index by parsing test files instead of importing them.
+          text: azdev test --discover --discovery-backend ast
+"""
+
+
+helps['test-stats'] = """
+    short-summary: Show statistics of the test runs recorded by `azdev test`.
+    long-summary: >
+        Every `azdev test` run adds the duration and outcome of each test from its junit XML results to a local
+        timing database. This shows the recent runs, the slowest tests and modules, flaky tests, which both passed
+        and failed at the same CLI commit, and the tests whose latest duration changed the most.
+    examples:
+        - name: Show the 20 slowest tests and modules.
+          text: azdev test-stats --top 20
 """
 
 
@@ -157,6 +190,10 @@ helps['linter'] = """
     examples:
         - name: Check linter rules for only those modules which have changed based on a git diff.
           text: azdev linter --repo azure-cli --tgt upstream/master --src upstream/dev
+        - name: Check linter rules for a module without replaying the verdicts of earlier runs.
+          text: azdev linter vm --no-cache
+        - name: Check linter rules of all modules in 8 processes.
+          text: azdev linter CLI --jobs 8
 """
 
 helps['statistics'] = """
@@ -204,6 +241,11 @@ helps['perf'] = """
 
 helps['perf load-times'] = """
     short-summary: Verify that all modules load within an acceptable timeframe.
+    examples:
+        - name: Find the imports that make a command module slow to load.
+          text: azdev perf load-times --import-time --top 10
+        - name: Measure 12 runs concurrently on a machine with many cores.
+          text: azdev perf load-times --runs 12 --parallel
 """
 
 helps['perf benchmark'] = """
@@ -211,6 +253,40 @@ helps['perf benchmark'] = """
     examples:
         - name: Run benchmark on "network application-gateway" and "storage account"
           text: azdev perf benchmark "network application-gateway -h" "storage account" "version" "group list"
+        - name: Compare cold runs with warm runs to tell import cost apart from command table and parser cost
+          text: azdev perf benchmark "vm create -h" "network vnet list" --warm
+        - name: Benchmark all commands, sampling each until its median is known within 5%, for at most 30 seconds
+          text: azdev perf benchmark --max-rel-ci 0.05 --time-budget 30
+        - name: Continue a sweep over all commands that was interrupted, killing runs that take longer than a minute
+          text: azdev perf benchmark --resume --task-timeout 60
+        - name: Profile the 3 slowest commands; render a .collapsed file with e.g. `flamegraph.pl vm_create_-h.collapsed > vm.svg`
+          text: azdev perf benchmark "vm create -h" "network vnet list" "version" "group list" --profile-slowest 3 --profile-dir ./profiles
+"""
+
+helps['perf memory'] = """
+    short-summary: Measure the memory used to load the full command table and help, and to run `az <command> --help`.
+    long-summary: >
+        Every target runs in a fresh interpreter. The peak RSS comes from a plain run, the breakdown from a separate
+        run under tracemalloc, which charges each allocation to the command module or extension whose code is closest
+        to it on the stack. Results are stored so they can be compared with `azdev perf compare --kind memory`.
+    examples:
+        - name: Measure the full command table load.
+          text: azdev perf memory
+        - name: Also measure the help of two commands and show the 20 biggest modules and allocators.
+          text: azdev perf memory "vm create" "network vnet list" --top 20
+"""
+
+helps['perf compare'] = """
+    short-summary: Compare two stored performance baselines and fail on statistically significant regressions.
+    long-summary: >
+        `azdev perf benchmark` and `azdev perf load-times` store their samples locally, keyed by the commit of the CLI
+        repo and a fingerprint of the machine. This command runs a one-sided Mann-Whitney U test per command or module
+        between two of those baselines and only fails when a slowdown is both significant and larger than --min-change.
+    examples:
+        - name: Compare the two most recent benchmark baselines on this machine.
+          text: azdev perf compare
+        - name: Compare module load times of the current CLI commit with an older one.
+          text: azdev perf compare --kind load-times --base 1a2b3c4
 """
 
 helps['extension'] = """
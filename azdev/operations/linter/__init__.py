@@ -19,7 +19,8 @@ from azdev.utilities.path import get_cli_repo_path, get_ext_repo_paths
 from azdev.operations.style import run_pylint
 
 from .linter import LinterManager, LinterScope, RuleError, LinterSeverity
-from .util import filter_modules, merge_exclusion
+from .util import filter_modules, merge_exclusion, LoadedHelp
+from .verdict_cache import VerdictCache, package_salt
 
 
 logger = get_logger(__name__)
@@ -29,13 +30,14 @@ CHECKERS_PATH = 'azdev.operations.linter.pylint_checkers'
 # pylint:disable=too-many-locals, too-many-statements, too-many-branches
 def run_linter(modules=None, rule_types=None, rules=None, ci_exclusions=None,
                git_source=None, git_target=None, git_repo=None, include_whl_extensions=False,
-               min_severity=None, save_global_exclusion=False):
+               min_severity=None, save_global_exclusion=False, no_cache=False, jobs=None):
 
     require_azure_cli()
 
+    import knack
+    import azure.cli.core  # pylint: disable=import-error
     from azure.cli.core import get_default_cli  # pylint: disable=import-error
-    from azure.cli.core.file_util import (  # pylint: disable=import-error
-        get_all_help, create_invoker_and_load_cmds_and_args)
+    from azure.cli.core.file_util import create_invoker_and_load_cmds_and_args  # pylint: disable=import-error
 
     heading('CLI Linter')
 
@@ -112,38 +114,44 @@ def run_linter(modules=None, rule_types=None, rules=None, ci_exclusions=None,
                 mod_exclusions = yaml.safe_load(f)
             merge_exclusion(exclusions, mod_exclusions or {})
 
+    # the rules of commands, groups and parameters read the loaded help, and only those of help entries the YAML
+    read_help = not rule_types or any(t in rule_types for t in ['params', 'commands', 'command_groups', 'help_entries'])
+    read_yaml_help = not rule_types or 'help_entries' in rule_types
+
     start = time.time()
     display('Initializing linter with command table and help files...')
     az_cli = get_default_cli()
 
-    # load commands, args, and help
+    # load commands and args, help is loaded as the rules read it
     create_invoker_and_load_cmds_and_args(az_cli)
-    loaded_help = get_all_help(az_cli)
+    loaded_help = LoadedHelp(az_cli) if read_help else {}
 
     stop = time.time()
-    logger.info('Commands and help loaded in %i sec', stop - start)
+    logger.info('Commands loaded in %i sec', stop - start)
     command_loader = az_cli.invocation.commands_loader
 
-    # format loaded help
-    loaded_help = {data.command: data for data in loaded_help if data.command}
-
-    # load yaml help
+    # collect yaml help
     help_file_entries = {}
     for entry_name, help_yaml in helps.items():
         # ignore help entries from azdev itself, unless it also coincides
         # with a CLI or extension command name.
-        if entry_name in azdev_helps and entry_name not in command_loader.command_table:
+        if not read_yaml_help or (entry_name in azdev_helps and entry_name not in command_loader.command_table):
             continue
-        help_entry = yaml.safe_load(help_yaml)
-        help_file_entries[entry_name] = help_entry
+        help_file_entries[entry_name] = help_yaml
 
     # trim command table and help to just selected_modules
     command_loader, help_file_entries = filter_modules(
         command_loader, help_file_entries, modules=selected_mod_names, include_whl_extensions=include_whl_extensions)
 
+    # load the yaml help of the entries left
+    help_file_entries = {entry_name: yaml.safe_load(help_yaml) for entry_name, help_yaml in help_file_entries.items()}
+
     if not command_loader.command_table:
         logger.warning('No commands selected to check.')
 
+    # verdicts are only replayed while the rules, azure-cli-core and knack are unchanged
+    verdict_cache = None if no_cache else VerdictCache(salt=package_salt(azure.cli.core, knack))
+
     # Instantiate and run Linter
     linter_manager = LinterManager(command_loader=command_loader,
                                    help_file_entries=help_file_entries,
@@ -155,7 +163,9 @@ def run_linter(modules=None, rule_types=None, rules=None, ci_exclusions=None,
                                    update_global_exclusion=update_global_exclusion,
                                    git_source=git_source,
                                    git_target=git_target,
-                                   git_repo=git_repo)
+                                   git_repo=git_repo,
+                                   verdict_cache=verdict_cache,
+                                   jobs=jobs)
 
     subheading('Results')
     logger.info('Running linter: %i commands, %i help entries',
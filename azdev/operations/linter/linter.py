@@ -4,15 +4,19 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 from difflib import context_diff
 from enum import Enum
 from importlib import import_module
 import inspect
+import logging
+import multiprocessing
 import os
 import re
 from pkgutil import iter_modules
 import yaml
-from knack.log import get_logger
+from knack.log import get_logger, CLI_LOGGER_NAME
 
 from azdev.operations.regex import (
     get_all_tested_commands_from_regex,
@@ -22,10 +26,20 @@ from azdev.operations.regex import (
     search_command_group)
 from azdev.utilities import diff_branches_detail
 from azdev.utilities.path import get_cli_repo_path, get_ext_repo_paths
-from .util import share_element, exclude_commands, LinterError
+from .util import exclude_commands, get_command_modules, LinterError
+from .verdict_cache import fingerprint, rule_fingerprint
 
 PACKAGE_NAME = 'azdev.operations.linter'
 _logger = get_logger(__name__)
+# the start of the az commands in help examples, up to the first argument
+_EXAMPLE_COMMAND_REGEX = re.compile(r'\baz((?:\s+[a-z0-9][a-z0-9-]*)+)')
+# rule checks of a rule group below which forking workers costs more than it saves
+MIN_PARALLEL_CHECKS = 20000
+# chunks of entities per worker and rule, so that workers which drew cheap entities take on more
+CHUNKS_PER_JOB = 4
+
+# the LinterManager running the rules, inherited by the worker processes forked from it
+_forked_manager = None
 
 
 class LinterSeverity(Enum):
@@ -59,10 +73,19 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
             self._parameters[command_name] = set()
             for name in command.arguments:
                 self._parameters[command_name].add(name)
+        # {help entry: [parameter names]} of the YAML help and {help entry: {parameter names}} of the loaded help
+        self._help_entry_parameter_names = {
+            entry_name: [param_help.get('name', None) for param_help in help_entry.get('parameters', None) or []]
+            for entry_name, help_entry in help_file_entries.items() if isinstance(help_entry, dict)}
+        # {help entry: ({parameter names}, {option: (position, parameter help)})} of the loaded help, on first use
+        self._loaded_help_parameters = {}
         self.git_source = git_source
         self.git_target = git_target
         self.git_repo = git_repo
         self.exclusions = exclusions
+        self._fingerprints = {rule_group: {} for rule_group in ['commands', 'command_groups', 'help_file_entries']}
+        self._commands_by_length = None
+        self._command_names_fingerprint = None
 
     @property
     def commands(self):
@@ -117,11 +140,21 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
         return self._all_yaml_help.get(entry_name).get('examples', [])
 
     def get_help_entry_parameter_names(self, entry_name):
-        return [param_help.get('name', None) for param_help in
-                self._all_yaml_help.get(entry_name).get('parameters', [])]
+        return self._help_entry_parameter_names.get(entry_name, [])
 
     def is_valid_parameter_help_name(self, entry_name, param_name):
-        return param_name in [param.name for param in getattr(self._loaded_help.get(entry_name), 'parameters', [])]
+        return param_name in self._get_loaded_help_parameters(entry_name)[0]
+
+    def _get_loaded_help_parameters(self, entry_name):
+        """ The parameter names in the loaded help of an entry, and the first parameter help of each option. """
+        if entry_name not in self._loaded_help_parameters:
+            parameter_helps = getattr(self._loaded_help.get(entry_name), 'parameters', None) or []
+            option_helps = {}
+            for position, param in enumerate(parameter_helps):
+                for option in param.name.split():
+                    option_helps.setdefault(option, (position, param))
+            self._loaded_help_parameters[entry_name] = {param.name for param in parameter_helps}, option_helps
+        return self._loaded_help_parameters[entry_name]
 
     def get_command_help(self, command_name):
         return self._get_loaded_help_description(command_name)
@@ -139,8 +172,10 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
         if not command_help:
             return None
 
-        parameter_helps = command_help.parameters
-        param_help = next((param for param in parameter_helps if share_element(options, param.name.split())), None)
+        # the first parameter help in the help of the command that names one of the options
+        option_helps = self._get_loaded_help_parameters(command_name)[1]
+        param_help = min((option_helps[option] for option in options if option in option_helps),
+                         key=lambda match: match[0], default=(None, None))[1]
         # workaround for --ids which is not does not generate doc help (BUG)
         if not param_help:
             command_args = self._command_loader.command_table.get(command_name).arguments
@@ -187,6 +222,79 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
                 expired_options_list.append(opt.target)
         return expired_options_list
 
+    def get_fingerprint(self, rule_group, entity):
+        """ Hash of everything the rules of `rule_group` can read about `entity`. """
+        if rule_group == 'params':
+            # parameter rules may read the other parameters of the command too
+            return self._command_fingerprint(entity[0])
+        if rule_group == 'commands':
+            return self._command_fingerprint(entity)
+        if rule_group == 'command_groups':
+            return self._command_group_fingerprint(entity)
+        return self._help_entry_fingerprint(entity)
+
+    def _loaded_help_data(self, entry):
+        help_entry = self._loaded_help.get(entry, None)
+        if not help_entry:
+            return None
+        return [help_entry.short_summary, help_entry.long_summary,
+                [[p.name, p.short_summary, p.long_summary] for p in getattr(help_entry, 'parameters', None) or []]]
+
+    def _command_fingerprint(self, command_name):
+        fingerprints = self._fingerprints['commands']
+        if command_name not in fingerprints:
+            command = self._command_loader.command_table[command_name]
+            fingerprints[command_name] = fingerprint(
+                command_name, command.deprecate_info, getattr(command, 'supports_no_wait', None),
+                {name: argument.type.settings for name, argument in command.arguments.items()},
+                self._loaded_help_data(command_name))
+        return fingerprints[command_name]
+
+    def _command_group_fingerprint(self, command_group_name):
+        fingerprints = self._fingerprints['command_groups']
+        if command_group_name not in fingerprints:
+            if self._commands_by_length is None:
+                self._commands_by_length = {}
+                for command_name in sorted(self.commands):
+                    self._commands_by_length.setdefault(len(command_name.split()), []).append(command_name)
+            group = self._command_loader.command_group_table.get(command_group_name)
+            # the commands of the group, as require_wait_command_if_no_wait finds them: by prefix, one word longer
+            names = self._commands_by_length.get(len(command_group_name.split()) + 1, [])
+            group_commands = []
+            for command_name in names[bisect_left(names, command_group_name):]:
+                if not command_name.startswith(command_group_name):
+                    break
+                group_commands.append([command_name, self._command_fingerprint(command_name)])
+            fingerprints[command_group_name] = fingerprint(
+                command_group_name, getattr(group, 'group_kwargs', None), self._loaded_help_data(command_group_name),
+                group_commands)
+        return fingerprints[command_group_name]
+
+    def _help_entry_fingerprint(self, entry_name):
+        fingerprints = self._fingerprints['help_file_entries']
+        if entry_name not in fingerprints:
+            if self._command_names_fingerprint is None:
+                self._command_names_fingerprint = fingerprint(sorted(self.commands))
+            yaml_help = self._all_yaml_help.get(entry_name)
+            # examples are parsed with the parser of the commands they run
+            example_commands = []
+            for example in (yaml_help or {}).get('examples', None) or []:
+                for match in _EXAMPLE_COMMAND_REGEX.finditer(str(example.get('text', ''))):
+                    words = match.group(1).split()
+                    command_name = next((' '.join(words[:i]) for i in range(len(words), 0, -1)
+                                         if ' '.join(words[:i]) in self._parameters), None)
+                    if command_name:
+                        example_commands.append([command_name, self._command_fingerprint(command_name)])
+            fingerprints[entry_name] = fingerprint(
+                entry_name, yaml_help, entry_name in self._parameters, entry_name in self.command_groups,
+                self._loaded_help_data(entry_name), self._command_names_fingerprint, example_commands)
+        return fingerprints[entry_name]
+
+    def load_help(self, rule_group, entities):
+        """ Loads the help the rules of `rule_group` read about `entities`. """
+        for entry_name in {entity[0] for entity in entities} if rule_group == 'params' else entities:
+            self._loaded_help.get(entry_name, None)
+
     def _get_loaded_help_description(self, entry):
         help_entry = self._loaded_help.get(entry, None)
         if help_entry:
@@ -355,13 +463,17 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
         return exec_state, violations
 
 
+# rule types whose rules check one entity at a time, which can be split among workers
+_ENTITY_RULE_TYPES = {'help_file_entries', 'command_groups', 'commands', 'params'}
+
+
 # pylint: disable=too-many-instance-attributes
 class LinterManager:
     _RULE_TYPES = {'help_file_entries', 'command_groups', 'commands', 'params', 'command_test_coverage'}
 
     def __init__(self, command_loader=None, help_file_entries=None, loaded_help=None, exclusions=None,
                  rule_inclusions=None, use_ci_exclusions=None, min_severity=None, update_global_exclusion=None,
-                 git_source=None, git_target=None, git_repo=None):
+                 git_source=None, git_target=None, git_repo=None, verdict_cache=None, jobs=None):
         # default to running only rules of the highest severity
         self.min_severity = min_severity or LinterSeverity.get_ordered_members()[-1]
         self._exclusions = exclusions or {}
@@ -378,6 +490,13 @@ class LinterManager:
         self._ci = use_ci_exclusions if use_ci_exclusions is not None else os.environ.get('CI', False)
         self._violiations = {}
         self._update_global_exclusion = update_global_exclusion
+        self._verdict_cache = verdict_cache
+        self._rule_fingerprints = {}
+        # linters of the rules with CI exclusions, by the modules they exclude
+        self._filtered_linters = {}
+        self._command_modules = None
+        # workers are forked, so they share the loaded command table copy-on-write
+        self._jobs = (jobs or os.cpu_count() or 1) if 'fork' in multiprocessing.get_all_start_methods() else 1
 
     def add_rule(self, rule_type, rule_name, rule_callable, rule_severity):
         include_rule = not self._rule_inclusions or rule_name in self._rule_inclusions
@@ -386,21 +505,74 @@ class LinterManager:
                 # if a rule has exclusions return a linter that factors in those exclusions
                 # otherwise return the main linter.
                 if rule_name in self._ci_exclusions and self._ci:
-                    mod_exclusions = self._ci_exclusions[rule_name]
-                    command_loader, help_file_entries = exclude_commands(
-                        self._command_loader,
-                        self._help_file_entries,
-                        mod_exclusions)
-                    return Linter(command_loader=command_loader, help_file_entries=help_file_entries,
-                                  loaded_help=self._loaded_help)
+                    return self._filtered_linter(self._ci_exclusions[rule_name])
                 return self.linter
 
             self._rules[rule_type][rule_name] = rule_callable, get_linter, rule_severity
 
+    def _filtered_linter(self, module_exclusions):
+        """ A linter without the commands of `module_exclusions`, shared by the rules that exclude the same modules. """
+        key = frozenset(module_exclusions or [])
+        if key not in self._filtered_linters:
+            if self._command_modules is None:
+                self._command_modules = get_command_modules(self._command_loader)
+            command_loader, help_file_entries = exclude_commands(
+                self._command_loader,
+                self._help_file_entries,
+                module_exclusions,
+                command_modules=self._command_modules)
+            self._filtered_linters[key] = Linter(command_loader=command_loader, help_file_entries=help_file_entries,
+                                                 loaded_help=self._loaded_help)
+        return self._filtered_linters[key]
+
     def mark_rule_failure(self, rule_severity):
         if rule_severity is LinterSeverity.HIGH:
             self._exit_code = 1
 
+    def check_rule(self, rule_func, rule_group, entity, *args):
+        """ Runs `rule_func` with `args` on `entity` and returns the message of its RuleError, or None if it passed.
+        With a verdict cache the verdict is replayed, unless the rule or what it can read about the entity changed
+        since it was stored. """
+        if self._verdict_cache is None:
+            return _call_rule(rule_func, args)
+
+        rule_name = rule_func.__name__
+        if rule_name not in self._rule_fingerprints:
+            self._rule_fingerprints[rule_name] = rule_fingerprint(rule_func, self._verdict_cache.salt)
+        rule_hash = self._rule_fingerprints[rule_name]
+        entity_hash = self.linter.get_fingerprint(rule_group, entity)
+        entity_name = entity if isinstance(entity, str) else '\t'.join(entity)
+        found, violation, warnings = self._verdict_cache.get(rule_name, rule_hash, entity_name, entity_hash)
+        if found:
+            # the warnings the rule logged, e.g. about skipped help examples, are part of its output
+            for logger_name, level, message in warnings:
+                logging.getLogger(logger_name).log(level, message)
+            return violation
+        capture = _WarningCapture()
+        root_logger = logging.getLogger(CLI_LOGGER_NAME)
+        root_logger.addHandler(capture)
+        try:
+            violation = _call_rule(rule_func, args)
+        finally:
+            root_logger.removeHandler(capture)
+        self._verdict_cache.put(rule_name, rule_hash, entity_name, entity_hash, violation, capture.warnings)
+        return violation
+
+    def rule_entities(self, rule_group):
+        """ The entities the rules of `rule_group` check with the current linter. """
+        if rule_group == 'params':
+            return [(command_name, parameter_name) for command_name in self.linter.commands
+                    for parameter_name in self.linter.get_command_parameters(command_name)]
+        return list(getattr(self.linter, rule_group))
+
+    def entity_exclusions(self, rule_group, entity):
+        """ Names of the rules excluded for an entity of `rule_group`. """
+        if rule_group == 'params':
+            command_name, parameter_name = entity
+            parameters = self._exclusions.get(command_name, {}).get('parameters', {})
+            return parameters.get(parameter_name, {}).get('rule_exclusions', [])
+        return self._exclusions.get(entity, {}).get('rule_exclusions', [])
+
     @property
     def exclusions(self):
         return self._exclusions
@@ -448,6 +620,11 @@ class LinterManager:
         if run_command_test_coverage and self._rules.get('command_test_coverage'):
             self._run_rules('command_test_coverage')
 
+        if self._verdict_cache is not None:
+            self._verdict_cache.save()
+            _logger.info('Linter verdicts: %d replayed from the cache, %d evaluated.',
+                         self._verdict_cache.hits, self._verdict_cache.misses)
+
         if not self.exit_code:
             print(os.linesep + 'No violations found for linter rules.')
 
@@ -478,36 +655,129 @@ class LinterManager:
         YELLOW = '\x1b[33m'
         CYAN = '\x1b[36m'
         RESET = '\x1b[39m'
-        # print('enter _run_rules')
-        for rule_name, (rule_func, linter_callable, rule_severity) in self._rules.get(rule_group).items():
-            # print('enter_items')
+        results = self._evaluate_rules(rule_group)
+        for rule_name, (_, _, rule_severity) in self._rules.get(rule_group).items():
+            if rule_name not in results:
+                continue
             severity_str = rule_severity.name
-            # use new linter if needed
-            with LinterScope(self, linter_callable):
-                # print('enter_with')
-                # if the rule's severity is lower than the linter's severity skip it.
-                if self._linter_severity_is_applicable(rule_severity, rule_name):
-                    # print('enter violations', rule_func)
-                    violations = sorted(rule_func()) or []
-                    # print('enter to find')
-                    if violations:
-                        if rule_severity == LinterSeverity.HIGH:
-                            sev_color = RED
-                        elif rule_severity == LinterSeverity.MEDIUM:
-                            sev_color = YELLOW
-                        else:
-                            sev_color = CYAN
-
-                        # pylint: disable=duplicate-string-formatting-argument
-                        print('- {} FAIL{} - {}{}{} severity: {}'.format(RED, RESET, sev_color,
-                                                                         severity_str, RESET, rule_name, ))
-                        for violation_msg, entity_name, name in violations:
-                            print(violation_msg)
-                            self._save_violations(entity_name, name)
-                        print()
-                    else:
-                        print('- {} pass{}: {} '.format(GREEN, RESET, rule_name))
-        # print('enter_end')
+            violations = results[rule_name]
+            if violations:
+                if rule_severity == LinterSeverity.HIGH:
+                    sev_color = RED
+                elif rule_severity == LinterSeverity.MEDIUM:
+                    sev_color = YELLOW
+                else:
+                    sev_color = CYAN
+
+                # pylint: disable=duplicate-string-formatting-argument
+                print('- {} FAIL{} - {}{}{} severity: {}'.format(RED, RESET, sev_color,
+                                                                 severity_str, RESET, rule_name, ))
+                for violation_msg, entity_name, name in violations:
+                    print(violation_msg)
+                    self._save_violations(entity_name, name)
+                print()
+            else:
+                print('- {} pass{}: {} '.format(GREEN, RESET, rule_name))
+
+    def _evaluate_rules(self, rule_group):
+        """ {rule name: sorted violations} of the rules of `rule_group` that are applicable at the min severity. """
+        rule_names = [rule_name for rule_name, (_, _, rule_severity) in self._rules.get(rule_group).items()
+                      if self._linter_severity_is_applicable(rule_severity, rule_name)]
+        fused = [rule_name for rule_name in rule_names if self._is_fusable(rule_group, rule_name)]
+        entities = self.rule_entities(rule_group) if fused else []
+
+        if self._jobs < 2 or len(entities) * len(rule_names) < MIN_PARALLEL_CHECKS:
+            results = self._evaluate(rule_group, fused, entities)
+            for rule_name in rule_names:
+                if rule_name not in results:
+                    results.update(self._evaluate(rule_group, [rule_name]))
+        else:
+            results = self._evaluate_in_workers(rule_group, rule_names, fused, entities)
+        return {rule_name: sorted(results[rule_name]) for rule_name in rule_names}
+
+    def _is_fusable(self, rule_group, rule_name):
+        """ Whether a rule can be run in one pass over the entities with other rules: it checks one entity at a
+        time, with the main linter rather than one that factors in CI exclusions. """
+        rule_func = self._rules[rule_group][rule_name][0]
+        return rule_group in _ENTITY_RULE_TYPES and hasattr(rule_func, 'check') and \
+            not (rule_name in self._ci_exclusions and self._ci)
+
+    def _evaluate(self, rule_group, rule_names, entities=None):
+        """ {rule name: violations} of the rules on `entities`, or on all entities they check. Rules that can be
+        fused visit every entity together, and its exclusions are looked up once for all of them. The others check
+        the entities of their own linter. """
+        fused = [rule_name for rule_name in rule_names if self._is_fusable(rule_group, rule_name)]
+        results = {rule_name: [] for rule_name in fused}
+        if fused:
+            checks = [(rule_name, self._rules[rule_group][rule_name][0].check) for rule_name in fused]
+            linter = self.linter
+            for entity in self.rule_entities(rule_group) if entities is None else entities:
+                exclusions = self.entity_exclusions(rule_group, entity)
+                for rule_name, check in checks:
+                    violation = check(linter, entity, exclusions)
+                    if violation is not None:
+                        results[rule_name].append(violation)
+
+        for rule_name in rule_names:
+            if rule_name not in results:
+                rule_func, linter_callable, _ = self._rules[rule_group][rule_name]
+                # use new linter if needed
+                with LinterScope(self, linter_callable):
+                    results[rule_name] = list(rule_func() if entities is None else rule_func(entities))
+        return results
+
+    def _evaluate_in_workers(self, rule_group, rule_names, fused, entities):
+        """ Evaluates the rules on chunks of their entities in forked worker processes. Violations are merged back
+        per rule, and rules with violations are marked as failed here, as the workers can't. """
+        global _forked_manager  # pylint: disable=global-statement
+        _logger.info('Running %s rules on %d processes.', rule_group, self._jobs)
+        tasks = []
+        if fused:
+            tasks.append((fused, entities))
+        for rule_name in rule_names:
+            if rule_name in fused:
+                continue
+            rule_func, linter_callable, _ = self._rules[rule_group][rule_name]
+            if rule_group in _ENTITY_RULE_TYPES and hasattr(rule_func, 'check'):
+                with LinterScope(self, linter_callable):
+                    tasks.append(([rule_name], self.rule_entities(rule_group)))
+            else:
+                tasks.append(([rule_name], None))
+
+        # help is loaded as it is read, load it before forking so the workers share it instead of each loading it
+        if rule_group in _ENTITY_RULE_TYPES:
+            self.linter.load_help(rule_group, entities if fused else self.rule_entities(rule_group))
+
+        results = {rule_name: [] for rule_name in rule_names}
+        # workers start from a copy of the cache, they only report what they add to it
+        counts = self._verdict_cache.take_changes()[1:] if self._verdict_cache is not None else None
+        _forked_manager = self
+        try:
+            with ProcessPoolExecutor(self._jobs, mp_context=multiprocessing.get_context('fork')) as executor:
+                futures = []
+                for task_rules, task_entities in tasks:
+                    if task_entities is None:
+                        futures.append(executor.submit(_evaluate_chunk, rule_group, task_rules, None))
+                        continue
+                    size = -(-len(task_entities) // (self._jobs * CHUNKS_PER_JOB)) or 1
+                    futures.extend(executor.submit(_evaluate_chunk, rule_group, task_rules, task_entities[i:i + size])
+                                   for i in range(0, len(task_entities), size))
+                for future in futures:
+                    chunk_results, cache_changes = future.result()
+                    for rule_name, violations in chunk_results.items():
+                        results[rule_name].extend(violations)
+                    if self._verdict_cache is not None:
+                        self._verdict_cache.merge_changes(cache_changes)
+        finally:
+            _forked_manager = None
+            if counts:
+                self._verdict_cache.hits += counts[0]
+                self._verdict_cache.misses += counts[1]
+
+        for rule_name, violations in results.items():
+            if violations:
+                self.mark_rule_failure(self._rules[rule_group][rule_name][2])
+        return results
 
     def _linter_severity_is_applicable(self, rule_severity, rule_name):
         if self.min_severity.value > rule_severity.value:
@@ -535,6 +805,33 @@ class RuleError(Exception):
     pass  # pylint: disable=unnecessary-pass
 
 
+def _evaluate_chunk(rule_group, rule_names, entities):
+    """ Runs in a forked worker: the violations of rules on some of their entities, and the verdicts they cached. """
+    manager = _forked_manager
+    # pylint: disable=protected-access
+    results = manager._evaluate(rule_group, rule_names, entities)
+    return results, manager._verdict_cache.take_changes() if manager._verdict_cache is not None else None
+
+
+class _WarningCapture(logging.Handler):
+    """ Collects the warnings logged while a rule runs, to store them with its verdict. """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.warnings = []
+
+    def emit(self, record):
+        self.warnings.append([record.name, record.levelno, record.getMessage()])
+
+
+def _call_rule(rule_func, args):
+    try:
+        rule_func(*args)
+    except RuleError as ex:
+        return str(ex)
+    return None
+
+
 class LinterScope:
     """
     Linter Context manager. used when calling a rule function. Allows substitution of main linter for a linter
@@ -65,46 +65,55 @@ class ParameterRule(BaseRule):
 
     def __call__(self, func):
         def add_to_linter(linter_manager):
-            def wrapper():
-                linter = linter_manager.linter
-
-                for command_name in linter.commands:
-                    for parameter_name in linter.get_command_parameters(command_name):
-                        exclusion_parameters = linter_manager.exclusions.get(command_name, {}).get('parameters', {})
-                        exclusions = exclusion_parameters.get(parameter_name, {}).get('rule_exclusions', [])
-                        if func.__name__ not in exclusions:
-                            try:
-                                func(linter, command_name, parameter_name)
-                            except RuleError as ex:
-                                linter_manager.mark_rule_failure(self.severity)
-                                yield (_create_violation_msg(ex, 'Parameter: {}, `{}`', command_name, parameter_name),
-                                       (command_name, parameter_name),
-                                       func.__name__)
-
-            linter_manager.add_rule('params', func.__name__, wrapper, self.severity)
+            def check(linter, entity, exclusions):
+                command_name, parameter_name = entity
+                if func.__name__ in exclusions:
+                    return None
+                violation = linter_manager.check_rule(func, 'params', entity, linter, command_name, parameter_name)
+                if violation is None:
+                    return None
+                linter_manager.mark_rule_failure(self.severity)
+                return (_create_violation_msg(violation, 'Parameter: {}, `{}`', command_name, parameter_name),
+                        entity,
+                        func.__name__)
+
+            linter_manager.add_rule('params', func.__name__, _entity_rule_wrapper(linter_manager, 'params', check),
+                                    self.severity)
         add_to_linter.linter_rule = True
         return add_to_linter
 
 
 def _get_decorator(func, rule_group, print_format, severity):
     def add_to_linter(linter_manager):
-        def wrapper():
-            linter = linter_manager.linter
-            # print('enter add to linter', len(getattr(linter, rule_group)))
-            for iter_entity in getattr(linter, rule_group):
-                exclusions = linter_manager.exclusions.get(iter_entity, {}).get('rule_exclusions', [])
-                if func.__name__ not in exclusions:
-                    try:
-                        func(linter, iter_entity)
-                    except RuleError as ex:
-                        linter_manager.mark_rule_failure(severity)
-                        yield (_create_violation_msg(ex, print_format, iter_entity), iter_entity, func.__name__)
-
-        linter_manager.add_rule(rule_group, func.__name__, wrapper, severity)
+        def check(linter, entity, exclusions):
+            if func.__name__ in exclusions:
+                return None
+            violation = linter_manager.check_rule(func, rule_group, entity, linter, entity)
+            if violation is None:
+                return None
+            linter_manager.mark_rule_failure(severity)
+            return _create_violation_msg(violation, print_format, entity), entity, func.__name__
+
+        linter_manager.add_rule(rule_group, func.__name__, _entity_rule_wrapper(linter_manager, rule_group, check),
+                                severity)
     add_to_linter.linter_rule = True
     return add_to_linter
 
 
+def _entity_rule_wrapper(linter_manager, rule_group, check):
+    """ A rule that yields the violations of `check` on `entities`, or on all entities of its group. `check` is kept
+    on it, so that the linter manager can run several rules in one pass over the entities. """
+    def wrapper(entities=None):
+        linter = linter_manager.linter
+        for entity in linter_manager.rule_entities(rule_group) if entities is None else entities:
+            violation = check(linter, entity, linter_manager.entity_exclusions(rule_group, entity))
+            if violation is not None:
+                yield violation
+
+    wrapper.check = check
+    return wrapper
+
+
 def _create_violation_msg(ex, format_string, *format_args):
     violation_string = format_string.format(*format_args)
     return '    {} - {}'.format(violation_string, ex)
@@ -4,6 +4,7 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+from collections.abc import Mapping
 import copy
 import re
 
@@ -29,18 +30,37 @@ def filter_modules(command_loader, help_file_entries, modules=None, include_whl_
                         include_whl_extensions=include_whl_extensions)
 
 
-def exclude_commands(command_loader, help_file_entries, module_exclusions, include_whl_extensions=False):
+def exclude_commands(command_loader, help_file_entries, module_exclusions, include_whl_extensions=False,
+                     command_modules=None):
     """ Modify the command table and help entries to exclude certain modules/extensions.
 
     : param command_loader: The CLICommandsLoader containing the command table to filter.
     : help_file_entries: The dict of HelpFile entries to filter.
     : modules: [str] list of module or extension names to remove.
+    : command_modules: The result of `get_command_modules` for the command table, to reuse it between calls.
     """
     return _filter_mods(command_loader, help_file_entries, modules=module_exclusions, exclude=True,
-                        include_whl_extensions=include_whl_extensions)
+                        include_whl_extensions=include_whl_extensions, command_modules=command_modules)
 
 
-def _filter_mods(command_loader, help_file_entries, modules=None, exclude=False, include_whl_extensions=False):
+def get_command_modules(command_loader, include_whl_extensions=False):
+    """ {command name: (source name, long name)} of the module or extension of every command in the command table.
+    The long name is None for commands whose source is unknown. """
+    name_index = get_name_index(include_whl_extensions=include_whl_extensions)
+    command_modules = {}
+    for command_name in command_loader.command_table:
+        try:
+            source_name, _ = _get_command_source(command_name, command_loader.command_table)
+        except LinterError as ex:
+            # command is unrecognized
+            logger.warning(ex)
+            source_name = None
+        command_modules[command_name] = source_name, name_index.get(source_name)
+    return command_modules
+
+
+def _filter_mods(command_loader, help_file_entries, modules=None, exclude=False, include_whl_extensions=False,
+                 command_modules=None):
     modules = modules or []
 
     # command tables and help entries must be copied to allow for seperate linter scope
@@ -50,21 +70,12 @@ def _filter_mods(command_loader, help_file_entries, modules=None, exclude=False,
     command_loader.command_table = command_table
     command_loader.command_group_table = command_group_table
     help_file_entries = help_file_entries.copy()
-    name_index = get_name_index(include_whl_extensions=include_whl_extensions)
+    if command_modules is None:
+        command_modules = get_command_modules(command_loader, include_whl_extensions=include_whl_extensions)
 
     for command_name in list(command_loader.command_table.keys()):
-        try:
-            source_name, _ = _get_command_source(command_name, command_loader.command_table)
-        except LinterError as ex:
-            # command is unrecognized
-            logger.warning(ex)
-            source_name = None
-
-        try:
-            long_name = name_index[source_name]
-            is_specified = source_name in modules or long_name in modules
-        except KeyError:
-            is_specified = False
+        source_name, long_name = command_modules[command_name]
+        is_specified = long_name is not None and (source_name in modules or long_name in modules)
         if is_specified == exclude:
             # brute force method of ignoring commands from a module or extension
             command_loader.command_table.pop(command_name, None)
@@ -81,6 +92,51 @@ def _filter_mods(command_loader, help_file_entries, modules=None, exclude=False,
     return command_loader, help_file_entries
 
 
+class LoadedHelp(Mapping):
+    """ The help of every command and group of the CLI, by name, as `get_all_help` of azure-cli-core loads it. The help
+    of an entry is loaded the first time it is read, so the help of commands no rule checks is never loaded. Entries
+    whose help fails to load are skipped with a warning, and left out of the mapping as if they had no help, which
+    is why iterating over it loads the help of every entry. """
+
+    def __init__(self, cli_ctx):
+        from azure.cli.core.file_util import _store_parsers  # pylint: disable=import-error
+
+        self._help_ctx = cli_ctx.help_cls(cli_ctx)
+        parser_keys, parser_values, sub_parser_keys, sub_parser_values = [], [], [], []
+        _store_parsers(cli_ctx.invocation.parser, parser_keys, parser_values, sub_parser_keys, sub_parser_values)
+        self._parsers = dict(zip(sub_parser_keys, sub_parser_values))
+        for name, parser in zip(parser_keys, parser_values):
+            self._parsers.setdefault(name, parser)
+        self._parsers.pop('', None)
+        self._help = {}
+
+    def __getitem__(self, name):
+        if name not in self._help:
+            self._help[name] = self._load(name, self._parsers[name])
+        if self._help[name] is None:
+            raise KeyError(name)
+        return self._help[name]
+
+    def __iter__(self):
+        return (name for name in self._parsers if name in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def _load(self, name, parser):
+        from azure.cli.core._help import CliCommandHelpFile, CliGroupHelpFile  # pylint: disable=import-error
+        from azure.cli.core.file_util import _is_group  # pylint: disable=import-error
+        try:
+            self._help_ctx.update_loaders_with_help_file_contents(name.split())
+            help_file_cls = CliGroupHelpFile if _is_group(parser) else CliCommandHelpFile
+            help_file = help_file_cls(self._help_ctx, name, parser)
+            help_file.load(parser)
+            return help_file
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning("Skipping '%s': %s", name, ex)
+            return None
+
+
 def share_element(first_iter, second_iter):
     return any(element in first_iter for element in second_iter)
 
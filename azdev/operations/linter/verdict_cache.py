@@ -0,0 +1,177 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+""" Persistent cache of linter rule verdicts.
+
+A verdict is whether a rule passed on an entity (a command, command group, parameter or help entry), the message
+of its violation if not, and the warnings the rule logged on the way, which are logged again when the verdict is
+replayed. It is stored under a hash of the rule's source and of everything the rules can read about
+the entity, so a later run only evaluates the rules again for entities whose metadata or help changed.
+"""
+
+from contextlib import contextmanager
+from enum import Enum
+import functools
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import sys
+import types
+
+from azdev.utilities import get_azdev_config_dir, make_dirs
+
+VERDICT_CACHE_FILE = 'linter_cache.db'
+# objects nested deeper than this in command metadata are represented by their type only
+MAX_FINGERPRINT_DEPTH = 6
+# hex digits of a fingerprint kept, 80 bits are plenty to tell versions of one entity apart
+FINGERPRINT_LENGTH = 20
+
+
+def _stable(value, depth=0):  # pylint: disable=too-many-return-statements
+    """ A JSON-serializable form of `value` that is the same in every process, unlike the repr of functions and
+    objects, which contains their address. """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return str(value)
+    if depth >= MAX_FINGERPRINT_DEPTH:
+        return type(value).__qualname__
+    if isinstance(value, dict):
+        return [[str(k), _stable(v, depth + 1)] for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))]
+    if isinstance(value, (list, tuple)):
+        return [_stable(v, depth + 1) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_stable(v, depth + 1) for v in value), key=json.dumps)
+    if isinstance(value, functools.partial):
+        return ['partial', _stable(value.func, depth + 1), _stable(value.args, depth + 1),
+                _stable(value.keywords, depth + 1)]
+    if hasattr(value, '__qualname__'):
+        # functions and classes
+        return '{}.{}'.format(getattr(value, '__module__', ''), value.__qualname__)
+    attributes = {k: v for k, v in getattr(value, '__dict__', {}).items() if not k.startswith('_') and k != 'cli_ctx'}
+    return [type(value).__qualname__, _stable(attributes, depth + 1)]
+
+
+def fingerprint(*values):
+    """ Hash of `values`, which may contain command metadata objects. """
+    data = json.dumps(_stable(values), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+
+
+@functools.lru_cache(maxsize=None)
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def rule_fingerprint(func, salt=''):
+    """ Hash of the source of the module defining the rule `func`, of the linter modules it reads through and of the
+    azdev modules its module imports names from. """
+    from . import linter, rule_decorators, util
+    module_names = {m.__name__ for m in [linter, rule_decorators, util]}
+    for value in func.__globals__.values():
+        module_name = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, '__module__', None)
+        if isinstance(module_name, str) and module_name.split('.')[0] == 'azdev':
+            module_names.add(module_name)
+    module_files = sorted(filter(None, (getattr(sys.modules.get(m), '__file__', None) for m in module_names)))
+    return fingerprint(salt, [_file_hash(path) for path in module_files if path != func.__code__.co_filename],
+                       _file_hash(func.__code__.co_filename))
+
+
+def package_salt(*packages):
+    """ Hash of the source of `packages` and of the Python version, for the rules depend on the parsers of
+    azure-cli-core, knack and argparse. The source is hashed rather than the version, as an editable install keeps
+    its version across commits. """
+    package_hashes = []
+    for package in packages:
+        for root, dirs, files in os.walk(os.path.dirname(package.__file__)):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            package_hashes.extend(_file_hash(os.path.join(root, f)) for f in sorted(files) if f.endswith('.py'))
+    return fingerprint(platform.python_version(), package_hashes)
+
+
+class VerdictCache:
+    """ Rule verdicts of earlier linter runs, kept in a SQLite file in the azdev config dir with one row per rule.
+    `salt` is to be mixed into the rule hashes, e.g. the `package_salt` of azure-cli-core and knack, whose parsers
+    and deprecation checks the rules depend on. """
+
+    def __init__(self, path=None, salt=''):
+        if not path:
+            make_dirs(get_azdev_config_dir())
+            path = os.path.join(get_azdev_config_dir(), VERDICT_CACHE_FILE)
+        self.path = path
+        self.salt = salt
+        self.hits = 0
+        self.misses = 0
+        # {rule: (rule hash, {entity: [entity hash, violation, warnings if any]})}, read on first use of a rule
+        self._rules = {}
+        self._changed = set()
+        # verdicts put since the last take_changes, to pass them from a worker process to the main one
+        self._changes = []
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS rules ('
+                         'rule TEXT PRIMARY KEY, rule_hash TEXT NOT NULL, verdicts TEXT NOT NULL)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _verdicts(self, rule, rule_hash):
+        if rule not in self._rules:
+            with self._connect() as conn:
+                row = conn.execute('SELECT rule_hash, verdicts FROM rules WHERE rule = ?', (rule,)).fetchone()
+            # verdicts of another version of the rule don't count
+            self._rules[rule] = (rule_hash, json.loads(row[1]) if row and row[0] == rule_hash else {})
+        return self._rules[rule][1]
+
+    def get(self, rule, rule_hash, entity, entity_hash):
+        """ (True, violation message or None, [[logger name, level, message]] of the warnings) if the verdict of the
+        rule on `entity` was stored for the same hashes, otherwise (False, None, []). """
+        cached = self._verdicts(rule, rule_hash).get(entity)
+        if cached is not None and cached[0] == entity_hash:
+            self.hits += 1
+            return True, cached[1], cached[2] if len(cached) > 2 else []
+        self.misses += 1
+        return False, None, []
+
+    def put(self, rule, rule_hash, entity, entity_hash, violation, warnings=None):
+        # most rules log nothing, so the warnings are only stored if there are any
+        self._verdicts(rule, rule_hash)[entity] = [entity_hash, violation] + ([warnings] if warnings else [])
+        self._changed.add(rule)
+        self._changes.append((rule, rule_hash, entity, entity_hash, violation, warnings))
+
+    def take_changes(self):
+        """ The verdicts put, and the numbers of hits and misses, since the last call. """
+        changes = self._changes, self.hits, self.misses
+        self._changes = []
+        self.hits = self.misses = 0
+        return changes
+
+    def merge_changes(self, changes):
+        """ Adds the changes taken from the cache of a worker process. """
+        verdicts, hits, misses = changes
+        for verdict in verdicts:
+            self.put(*verdict)
+        self.hits += hits
+        self.misses += misses
+
+    def save(self):
+        """ Writes the verdicts of the rules that changed since the last save. """
+        if not self._changed:
+            return
+        with self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO rules VALUES (?, ?, ?)',
+                             [(rule,) + (self._rules[rule][0], json.dumps(self._rules[rule][1]))
+                              for rule in sorted(self._changed)])
+        self._changed = set()
+        self._changes = []
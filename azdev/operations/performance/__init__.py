@@ -0,0 +1,837 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import re
+import sys
+import timeit
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from azdev.utilities import (
+    display, heading, subheading, cmd, py_cmd, make_dirs, require_azure_cli)
+from . import _memory_probe
+from .result_store import ResultStore
+from .scheduler import BenchmarkJournal, BenchmarkSampler, BenchmarkScheduler, JOURNAL_FILE
+
+logger = get_logger(__name__)
+
+TOTAL = 'ALL'
+BENCHMARK_KIND = 'benchmark'
+BENCHMARK_WARM_KIND = 'benchmark-warm'
+LOAD_TIMES_KIND = 'load-times'
+IMPORT_TIMES_KIND = 'import-times'
+MEMORY_KIND = 'memory'
+MEMORY_MODULES_KIND = 'memory-modules'
+COMMAND_TABLE_TARGET = 'command table'
+PROFILE_DIR = 'profiles'
+TOTAL_THRESHOLD = 300
+DEFAULT_THRESHOLD = 10
+THRESHOLDS = {
+    # threshold value: num of exceptions allowed
+    50: 2,
+    40: 3
+}
+
+
+# pylint: disable=too-many-statements
+def check_load_time(runs=3, import_time=False, top=5, parallel=False):
+
+    require_azure_cli()
+
+    if import_time:
+        _check_import_time(runs, top)
+        return
+
+    heading('Module Load Performance')
+
+    if parallel:
+        run_results = _run_load_times_parallel(runs)
+    else:
+        run_results = []
+        # Time the module loading X times
+        for i in range(0, runs + 1):
+            lines = cmd('az -h --debug', show_stderr=True).result
+            if i == 0:
+                # Ignore the first run since it can be longer due to *.pyc file compilation
+                continue
+            run_results.append(_parse_load_times(lines))
+
+    results = {TOTAL: []}
+    for run_result in run_results:
+        for mod, val in run_result.items():
+            results.setdefault(mod, []).append(val)
+
+    store = ResultStore()
+    for mod, val in results.items():
+        store.add(LOAD_TIMES_KIND, mod, val)
+
+    passed_mods = {}
+    failed_mods = {}
+
+    def _claim_higher_threshold(val):
+        avail_thresholds = {k: v for k, v in THRESHOLDS.items() if v}
+        new_threshold = None
+        for threshold in sorted(avail_thresholds):
+            if val < threshold:
+                THRESHOLDS[threshold] = THRESHOLDS[threshold] - 1
+                new_threshold = threshold
+            break
+        return new_threshold
+
+    mods = sorted(results.keys())
+    for mod in mods:
+        val = results[mod]
+        mean_val = mean(val)
+        stdev_val = pstdev(val)
+        threshold = TOTAL_THRESHOLD if mod == TOTAL else DEFAULT_THRESHOLD
+        statistics = {
+            'average': mean_val,
+            'stdev': stdev_val,
+            'threshold': threshold,
+            'values': val
+        }
+        if mean_val > threshold:
+            # claim a threshold exception if available
+            new_threshold = _claim_higher_threshold(mean_val)
+            if new_threshold:
+                statistics['threshold'] = new_threshold
+                passed_mods[mod] = statistics
+            else:
+                failed_mods[mod] = statistics
+        else:
+            passed_mods[mod] = statistics
+
+    subheading('Results')
+    if failed_mods:
+        display('== PASSED MODULES ==')
+        display_table(passed_mods)
+        display('\nFAILED MODULES')
+        display_table(failed_mods)
+        raise CLIError("""
+FAILED: Some modules failed. If values are close to the threshold, rerun. If values
+are large, check that you do not have top-level imports like azure.mgmt or msrestazure
+in any modified files.
+""")
+
+    display("== PASSED MODULES ==")
+    display_table(passed_mods)
+    display(
+        "\nPASSED: Average load time all modules: {} ms".format(
+            int(passed_mods[TOTAL]["average"])
+        )
+    )
+
+
+_LOAD_TIME_REGEX = re.compile(r"[^']*'(?P<mod>[^']*)'[\D]*(?P<val>[\d\.]*)")
+# smallest number of samples the adaptive benchmark takes before it looks at the confidence interval
+ADAPTIVE_MIN_RUNS = 5
+# slowdown of concurrent runs compared to an isolated run that is still considered noise
+INTERFERENCE_TOLERANCE = 0.15
+
+
+def _parse_load_times(lines):
+    """ Returns {module: load time in ms} from the output of `az -h --debug`, including the TOTAL. """
+    try:
+        lines = lines.decode().splitlines()
+    except AttributeError:
+        lines = lines.splitlines()
+    result = {TOTAL: 0}
+    for line in lines:
+        if line.startswith('DEBUG: Loaded module'):
+            matches = _LOAD_TIME_REGEX.match(line)
+            mod = matches.group('mod')
+            val = float(matches.group('val')) * 1000
+            # a module may be logged more than once, its time counts towards the TOTAL every time
+            result[mod] = result.get(mod, 0) + val
+            result[TOTAL] += val
+    return result
+
+
+def _get_isolated_cores():
+    """ Returns the CPUs this process may run on, keeping only one logical CPU per physical core
+    so that concurrent runs don't share a core through hyper-threading. """
+    if not hasattr(os, 'sched_getaffinity'):
+        raise CLIError('--parallel requires CPU affinity support (os.sched_setaffinity), which is only available '
+                       'on Linux.')
+
+    cores = []
+    seen_siblings = set()
+    for cpu in sorted(os.sched_getaffinity(0)):
+        siblings_path = '/sys/devices/system/cpu/cpu{}/topology/thread_siblings_list'.format(cpu)
+        try:
+            with open(siblings_path) as f:
+                siblings = f.read().strip()
+        except OSError:
+            siblings = str(cpu)
+        if siblings not in seen_siblings:
+            seen_siblings.add(siblings)
+            cores.append(cpu)
+    return cores
+
+
+def _run_load_times_parallel(runs):
+    """ Run the warm-up and one reference run alone, then the remaining runs concurrently, each pinned to its own
+    physical core. Warns when the concurrent runs were noticeably slower than the isolated reference run. """
+    import subprocess
+    import tempfile
+
+    cores = _get_isolated_cores()
+    display('Running {} concurrent runs on cores: {}\n'.format(runs, ', '.join(str(c) for c in cores)))
+
+    def _pin(core):
+        return lambda: os.sched_setaffinity(0, {core})  # pylint: disable=no-member
+
+    # warm-up to compile *.pyc files, then one reference run without any concurrent load
+    cmd('az -h --debug', show_stderr=True, preexec_fn=_pin(cores[0]))
+    reference = _parse_load_times(cmd('az -h --debug', show_stderr=True, preexec_fn=_pin(cores[0])).result)
+    run_results = [reference]
+
+    remaining = runs - 1
+    while remaining > 0:
+        batch = cores[:remaining]
+        remaining -= len(batch)
+        procs = []
+        for core in batch:
+            # use files instead of pipes so that no run can block on a full pipe while we wait for another
+            out_file = tempfile.TemporaryFile()  # pylint: disable=consider-using-with
+            # azdev starts no threads, so preexec_fn is safe here
+            # pylint: disable=consider-using-with, subprocess-popen-preexec-fn
+            procs.append((subprocess.Popen(['az', '-h', '--debug'], stdout=out_file,
+                                           stderr=subprocess.STDOUT, preexec_fn=_pin(core)), out_file))
+        for proc, out_file in procs:
+            proc.wait()
+            out_file.seek(0)
+            run_results.append(_parse_load_times(out_file.read()))
+            out_file.close()
+
+    concurrent_totals = [r[TOTAL] for r in run_results[1:]]
+    if concurrent_totals and reference[TOTAL]:
+        slowdown = mean(concurrent_totals) / reference[TOTAL] - 1
+        spread = (max(concurrent_totals) - min(concurrent_totals)) / reference[TOTAL]
+        if slowdown > INTERFERENCE_TOLERANCE or spread > 2 * INTERFERENCE_TOLERANCE:
+            logger.warning('Concurrent runs interfered with each other: they were %.0f%% slower than the isolated '
+                           'reference run (%.0f ms) and %.0f%% apart. Shared caches, memory bandwidth, disk I/O or '
+                           'CPU frequency limits are likely skewing the results. Consider rerunning without '
+                           '--parallel.', slowdown * 100, reference[TOTAL], spread * 100)
+        else:
+            display('No interference detected: concurrent runs were within {:.0f}% of the isolated reference run.\n'
+                    .format(max(slowdown, 0) * 100))
+    return run_results
+
+
+_IMPORT_TIME_REGEX = re.compile(
+    r'^import time:\s*(?P<self>\d+)\s*\|\s*(?P<cumulative>\d+)\s*\|(?P<indent>\s*)(?P<name>\S+)')
+_IMPORT_OWNER_REGEX = re.compile(r'^(azure\.cli\.command_modules\.(?P<mod>[^.]+)|(?P<ext>azext_[^.]+))')
+
+
+def _check_import_time(runs, top):
+    heading('Module Import Time')
+
+    results = {TOTAL: []}
+    offenders = {}
+    for i in range(0, runs + 1):
+        lines = py_cmd('-X importtime -m azure.cli -h', is_module=False, show_stderr=True).result
+        if i == 0:
+            # Ignore the first run since it can be longer due to *.pyc file compilation
+            continue
+
+        try:
+            lines = lines.decode().splitlines()
+        except AttributeError:
+            lines = lines.splitlines()
+        roots = _parse_import_time(lines)
+        mods, imports = _summarize_import_time(roots)
+        results[TOTAL].append(sum(root['cumulative'] for root in roots) / 1000)
+        for mod, val in mods.items():
+            results.setdefault(mod, []).append(val / 1000)
+        for mod, mod_imports in imports.items():
+            for name, val in mod_imports.items():
+                offenders.setdefault(mod, {}).setdefault(name, []).append(val / 1000)
+
+    store = ResultStore()
+    for mod, val in results.items():
+        store.add(IMPORT_TIMES_KIND, mod, val)
+
+    subheading('Results')
+    display('{:<20} {:>12} {:>12}   {}'.format('Module', 'Average', 'Stdev', 'Slowest transitive imports (ms)'))
+    for mod in sorted(results, key=lambda m: mean(results[m]), reverse=True):
+        val = results[mod]
+        # an import only happens in the first run that triggers it, so average over all runs
+        mod_offenders = sorted(((name, sum(v) / len(val)) for name, v in offenders.get(mod, {}).items()),
+                               key=lambda x: x[1], reverse=True)[:top]
+        display('{:<20} {:>12.0f} {:>12.0f}   {}'.format(
+            mod, mean(val), pstdev(val) if len(val) > 1 else 0,
+            ', '.join('{} ({:.0f})'.format(name, t) for name, t in mod_offenders)))
+
+
+def _parse_import_time(lines):
+    """ Build the import tree from the output of `python -X importtime`.
+
+    Each import is printed after all imports it triggered, indented by two spaces per nesting level,
+    so finished children wait in `pending` until their parent shows up. Returns the top-level imports as
+    {'name', 'self', 'cumulative', 'children'} dicts with times in microseconds.
+    """
+    pending = {}
+    for line in lines:
+        match = _IMPORT_TIME_REGEX.match(line)
+        if not match:
+            continue
+        depth = (len(match.group('indent')) - 1) // 2
+        node = {
+            'name': match.group('name'),
+            'self': int(match.group('self')),
+            'cumulative': int(match.group('cumulative')),
+            'children': pending.pop(depth + 1, [])
+        }
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+def _summarize_import_time(roots):
+    """ Charge the import tree to command modules and extensions.
+
+    Returns ({module: cumulative import time}, {module: {import: cumulative import time}}) where the second dict
+    lists, per module, the first import outside of azure.cli and extensions on each path, e.g. `azure.mgmt.compute`.
+    """
+    mods = {}
+    imports = {}
+
+    def _walk(node, owner):
+        match = _IMPORT_OWNER_REGEX.match(node['name'])
+        if owner is None and match:
+            owner = match.group('mod') or match.group('ext')
+            mods[owner] = mods.get(owner, 0) + node['cumulative']
+        elif owner is not None and not match and not node['name'].startswith('azure.cli.'):
+            mod_imports = imports.setdefault(owner, {})
+            mod_imports[node['name']] = mod_imports.get(node['name'], 0) + node['cumulative']
+            return
+        for child in node['children']:
+            _walk(child, owner)
+
+    for root in roots:
+        _walk(root, None)
+    return mods, imports
+
+
+def mean(data):
+    """Return the sample arithmetic mean of data."""
+    n = len(data)
+    if n < 1:
+        raise ValueError("len < 1")
+    return sum(data) / float(n)
+
+
+def sq_deviation(data):
+    """Return sum of square deviations of sequence data."""
+    c = mean(data)
+    return sum((x - c) ** 2 for x in data)
+
+
+def pstdev(data):
+    """Calculates the population standard deviation."""
+    n = len(data)
+    if n < 2:
+        raise ValueError('len < 2')
+    ss = sq_deviation(data)
+    return (ss / n) ** 0.5
+
+
+def median(data):
+    """Return the median of data."""
+    data = sorted(data)
+    n = len(data)
+    if n < 1:
+        raise ValueError("len < 1")
+    if n % 2 == 0:
+        return (data[n // 2 - 1] + data[n // 2]) / 2
+    return data[n // 2]
+
+
+def mann_whitney_u(sample, other):
+    """Return the p-value of a one-sided Mann-Whitney U test that values in `other` tend to be larger
+    than values in `sample`. Uses the normal approximation with tie and continuity correction."""
+    from math import erfc, sqrt
+
+    n1, n2 = len(sample), len(other)
+    if not n1 or not n2:
+        raise ValueError("len < 1")
+    combined = sorted([(val, 0) for val in sample] + [(val, 1) for val in other])
+    size = len(combined)
+
+    # average the ranks of tied values
+    rank_sum = 0
+    tie_term = 0
+    i = 0
+    while i < size:
+        j = i
+        while j + 1 < size and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        rank_sum += rank * sum(1 for k in range(i, j + 1) if combined[k][1])
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    u = rank_sum - n2 * (n2 + 1) / 2
+    variance = n1 * n2 / 12 * ((size + 1) - tie_term / (size * (size - 1))) if size > 1 else 0
+    if variance <= 0:
+        # all values are equal, there is no evidence of a difference
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / sqrt(variance)
+    return 0.5 * erfc(z / sqrt(2))
+
+
+def display_table(data):
+    display('{:<20} {:>12} {:>12} {:>12} {:>25}'.format('Module', 'Average', 'Threshold', 'Stdev', 'Values'))
+    for key, val in data.items():
+        display('{:<20} {:>12.0f} {:>12.0f} {:>12.0f} {:>25}'.format(
+            key, val['average'], val['threshold'], val['stdev'], str(val['values'])))
+
+
+# require azdev setup
+def benchmark(commands=None, runs=20, warm=False, max_rel_ci=None, time_budget=60, task_timeout=300, resume=False,
+              profile_slowest=0, profile_dir=None):
+    if runs <= 0:
+        raise CLIError("Number of runs must be greater than 0.")
+
+    if max_rel_ci is not None and max_rel_ci <= 0:
+        raise CLIError("--max-rel-ci must be greater than 0.")
+
+    if task_timeout <= 0:
+        raise CLIError("--task-timeout must be greater than 0.")
+
+    if profile_slowest < 0:
+        raise CLIError("--profile-slowest must not be negative.")
+
+    if warm:
+        if not hasattr(os, 'fork'):
+            raise CLIError("--warm requires os.fork() and is only supported on POSIX systems.")
+        require_azure_cli()
+
+    if not commands:
+        commands = _benchmark_load_all_commands()
+    # results are stored and journaled by command, so each command is measured once
+    commands = list(dict.fromkeys(commands))
+
+    store = ResultStore()
+    journal = BenchmarkJournal(os.path.join(os.path.dirname(store.path), JOURNAL_FILE), resume=resume)
+
+    # the warm sweep gets its own pool so every worker only pays the azure.cli.core import cost one time
+    sweeps = [(BENCHMARK_KIND, _benchmark_cmd_timer, _benchmark_process_pool_init)]
+    if warm:
+        sweeps.append((BENCHMARK_WARM_KIND, _benchmark_cmd_warm_timer, _benchmark_warm_process_pool_init))
+
+    samplers = {}
+    try:
+        for kind, timer, initializer in sweeps:
+            samplers[kind] = _benchmark_samplers(journal, kind, commands, runs, max_rel_ci, time_budget)
+            pending = [s for s in samplers[kind] if not s.done]
+            if not pending:
+                continue
+
+            def _record(sampler, value, kind=kind):
+                journal.add_sample(kind, sampler.command, value)
+
+            with BenchmarkScheduler(timer, initializer, task_timeout) as scheduler:
+                for sampler in scheduler.run(pending, on_sample=_record):
+                    if sampler.failures:
+                        logger.warning("'%s' timed out or failed in %d run(s).", sampler.command, sampler.failures)
+                    if sampler.time_series:
+                        store.add(kind, sampler.command, sampler.time_series)
+                    journal.mark_done(kind, sampler.command)
+                    logger.info("Measured %s (%s): %d runs", sampler.command, kind, len(sampler.time_series))
+    except KeyboardInterrupt:
+        raise CLIError("Interrupted. The samples taken so far are kept in {}, rerun with --resume to continue."
+                       .format(journal.path))
+    finally:
+        journal.close()
+
+    result = []
+    for index, raw_command in enumerate(commands):
+        sampler = samplers[BENCHMARK_KIND][index]
+        staticstic = _benchmark_cmd_staticstic(sampler.time_series) if sampler.time_series else \
+            dict.fromkeys(["Min", "Max", "Media", "Avg", "Std"])
+        staticstic.update({
+            "Command": raw_command,
+            "Runs": len(sampler.time_series),
+            "Failed": sampler.failures,
+        })
+        if warm:
+            warm_sampler = samplers[BENCHMARK_WARM_KIND][index]
+            if warm_sampler.time_series:
+                staticstic.update({"Warm {}".format(k): v
+                                   for k, v in _benchmark_cmd_staticstic(warm_sampler.time_series).items()})
+        logger.info(staticstic)
+        result.append(staticstic)
+
+    if profile_slowest:
+        profile_dir = profile_dir or os.path.join(os.path.dirname(store.path), PROFILE_DIR)
+        _benchmark_profile(result, profile_slowest, profile_dir, task_timeout)
+
+    return result
+
+
+def compare(base=None, target=None, kind=BENCHMARK_KIND, alpha=0.05, min_change=0.05):
+    """ Compare two stored baselines and fail on statistically significant regressions. """
+    store = ResultStore()
+    baselines = [b['Commit'] for b in store.list_baselines(kind)]
+    if not target:
+        if not baselines:
+            raise CLIError("No '{}' results stored on this machine yet.".format(kind))
+        target = baselines[0]
+    if not base:
+        base = next((b for b in baselines if not b.startswith(target)), None)
+        if not base:
+            raise CLIError("No other baseline to compare '{}' with. Stored baselines: {}".format(
+                target, ', '.join(baselines) or 'none'))
+
+    heading('Performance Comparison')
+    display('Kind: {}\nBase: {}\nTarget: {}\n'.format(kind, base, target))
+
+    base_results = store.get(kind, base)
+    target_results = store.get(kind, target)
+    for baseline, results in [(base, base_results), (target, target_results)]:
+        if not results:
+            raise CLIError("No '{}' results stored for baseline '{}'. Stored baselines: {}".format(
+                kind, baseline, ', '.join(baselines) or 'none'))
+    if not set(base_results) & set(target_results):
+        raise CLIError("Baselines '{}' and '{}' have no '{}' results in common to compare.".format(base, target, kind))
+
+    regressions = []
+    rows = []
+    for name in sorted(set(base_results) & set(target_results)):
+        base_series = base_results[name]
+        target_series = target_results[name]
+        base_median = median(base_series)
+        target_median = median(target_series)
+        change = (target_median - base_median) / base_median if base_median else 0
+
+        status = 'ok'
+        if change > min_change and mann_whitney_u(base_series, target_series) < alpha:
+            status = 'REGRESSED'
+            regressions.append(name)
+        elif -change > min_change and mann_whitney_u(target_series, base_series) < alpha:
+            status = 'improved'
+        rows.append((name, base_median, target_median, change * 100, status))
+
+    missing = sorted(set(base_results) ^ set(target_results))
+    if missing:
+        logger.warning('Not in both baselines, skipped: %s', ', '.join(missing))
+
+    display('{:<40} {:>12} {:>12} {:>10} {:>10}'.format('Name', 'Base', 'Target', 'Change %', 'Status'))
+    for row in rows:
+        display('{:<40} {:>12.4f} {:>12.4f} {:>10.1f} {:>10}'.format(*row))
+
+    if regressions:
+        raise CLIError('FAILED: {} significant regression(s) (p < {}, change > {:.0%}): {}'.format(
+            len(regressions), alpha, min_change, ', '.join(regressions)))
+    display('\nPASSED: No significant regressions.')
+
+
+def _benchmark_profile(result, count, profile_dir, timeout=None):
+    """ Rerun the `count` slowest commands of `result` under cProfile. Writes a .pstats file and a collapsed
+    stack file, as consumed by flamegraph.pl or speedscope, per command into `profile_dir`. """
+    import subprocess
+
+    make_dirs(profile_dir)
+    slowest = sorted((r for r in result if r["Media"] is not None), key=lambda r: r["Media"], reverse=True)[:count]
+    for r in slowest:
+        raw_command = r["Command"]
+        base = os.path.join(profile_dir, re.sub(r'[^\w.-]+', '_', raw_command).strip('_') or 'az')
+        logger.warning("Profiling '%s'...", raw_command)
+        try:
+            _benchmark_cmd_run(raw_command, timeout=timeout, profile=base + '.pstats')
+        except subprocess.TimeoutExpired:
+            logger.warning("Profiling '%s' timed out.", raw_command)
+            continue
+        if not os.path.isfile(base + '.pstats'):
+            logger.warning("No profile was written for '%s'.", raw_command)
+            continue
+
+        with open(base + '.collapsed', 'w') as f:
+            for stack, value in sorted(_pstats_to_collapsed(base + '.pstats').items()):
+                f.write('{} {}\n'.format(stack, value))
+        r["Profile"] = base + '.pstats'
+        logger.warning("Profile of '%s' written to %s.pstats and %s.collapsed", raw_command, base, base)
+
+
+def _pstats_to_collapsed(path, min_time=1e-5):
+    """ Turn a cProfile stats file into collapsed stacks: {'root;caller;callee': self time in microseconds}.
+
+    cProfile only keeps caller/callee pairs, not whole stacks, so the call graph is walked from its roots and the
+    time of every function is split between the paths leading to it by the share each caller has in its total
+    time. Paths worth less than `min_time` seconds and recursive calls are cut off.
+    """
+    import pstats
+
+    stats = pstats.Stats(path).stats  # pylint: disable=no-member
+    children = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, caller_stats in callers.items():
+            children.setdefault(caller, []).append((func, caller_stats[3]))
+
+    def _label(func):
+        filename, line, name = func
+        if filename == '~':
+            return name.replace(';', ':')
+        return '{} ({}:{})'.format(name, os.path.basename(filename), line).replace(';', ':')
+
+    collapsed = {}
+    # iterate instead of recursing, the CLI's call graph is deeper than the recursion limit
+    todo = [(func, [], frozenset(), 1.0) for func, func_stats in stats.items() if not func_stats[4]]
+    while todo:
+        func, path, seen, share = todo.pop()
+        path = path + [_label(func)]
+        self_time = stats[func][2] * share
+        if self_time * 1e6 >= 1:
+            key = ';'.join(path)
+            collapsed[key] = collapsed.get(key, 0) + int(self_time * 1e6)
+        seen = seen | {func}
+        for child, edge_time in children.get(func, []):
+            child_time = stats[child][3]
+            if child in seen or not child_time or edge_time * share < min_time:
+                continue
+            todo.append((child, path, seen, share * edge_time / child_time))
+    return collapsed
+
+
+def memory(commands=None, runs=3, top=10):
+    """ Peak RSS and tracemalloc breakdown of the full command table load and of `az <command> --help`. """
+    import shutil
+    import tempfile
+
+    if runs <= 0:
+        raise CLIError("Number of runs must be greater than 0.")
+
+    require_azure_cli()
+
+    targets = [(COMMAND_TABLE_TARGET, [_memory_probe.COMMAND_TABLE])]
+    targets.extend(('{} --help'.format(command), command.split() + ['--help']) for command in commands or [])
+
+    heading('Memory Usage')
+
+    store = ResultStore()
+    work_dir = tempfile.mkdtemp()
+    try:
+        results = []
+        for name, args in targets:
+            logger.info("Measuring %s...", name)
+            rss, traced, modules, allocators = [], [], {}, []
+            for _ in range(runs):
+                rss.append(_memory_probe_run(work_dir, args)['peak_rss_kb'])
+                traced_run = _memory_probe_run(work_dir, [_memory_probe.TRACE] + args)
+                traced.append(traced_run['traced_peak_kb'])
+                for mod, size in traced_run['modules'].items():
+                    modules.setdefault(mod, []).append(size // 1024)
+                allocators = traced_run['top']
+
+            if None not in rss:
+                store.add(MEMORY_KIND, name, rss)
+            for mod, sizes in modules.items():
+                store.add(MEMORY_MODULES_KIND, '{}: {}'.format(name, mod), sizes)
+            results.append((name, rss, traced, modules, allocators))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    subheading('Results')
+    display('{:<40} {:>16} {:>18}'.format('Target', 'Peak RSS (MiB)', 'Traced Peak (MiB)'))
+    for name, rss, traced, _, _ in results:
+        display('{:<40} {:>16} {:>18.1f}'.format(
+            name, '{:.1f}'.format(mean(rss) / 1024) if None not in rss else 'n/a', mean(traced) / 1024))
+
+    for name, _, _, modules, allocators in results:
+        subheading(name)
+        display('{:<30} {:>18}'.format('Module', 'Allocated (MiB)'))
+        averages = {mod: mean(sizes) for mod, sizes in modules.items()}
+        for mod in sorted(averages, key=averages.get, reverse=True)[:top]:
+            display('{:<30} {:>18.1f}'.format(mod, averages[mod] / 1024))
+        display('\n{:<70} {:>12}'.format('Top allocators', 'Size (KiB)'))
+        for location, size in allocators[:top]:
+            display('{:<70} {:>12.0f}'.format(location, size / 1024))
+
+
+def _memory_probe_run(work_dir, args):
+    """ Run the memory probe in a fresh interpreter and return what it measured. """
+    import json
+
+    output = os.path.join(work_dir, 'probe.json')
+    if os.path.exists(output):
+        os.remove(output)
+    result = _python_run([_memory_probe.__file__, output] + list(args))
+    if not os.path.exists(output):
+        raise CLIError("Memory probe for '{}' failed:\n{}".format(' '.join(args), result))
+    with open(output) as f:
+        return json.load(f)
+
+
+def _benchmark_samplers(journal, kind, commands, runs, max_rel_ci=None, time_budget=60):
+    """ One sampler per command, picking up the samples a resumed journal already has. Takes exactly `runs`
+    samples, unless `max_rel_ci` is given: then samples are taken in batches until the confidence interval of the
+    median is narrower than `max_rel_ci` times the median, or until `time_budget` seconds are used up. """
+    import multiprocessing
+
+    def _is_stable(time_series):
+        low, high = _benchmark_median_ci(time_series)
+        mid = median(time_series)
+        return not mid or (high - low) / mid <= max_rel_ci
+
+    return [BenchmarkSampler(command, runs, is_stable=_is_stable if max_rel_ci else None,
+                             batch_size=max(ADAPTIVE_MIN_RUNS, multiprocessing.cpu_count()),
+                             time_budget=time_budget, **journal.get(kind, command))
+            for command in commands]
+
+
+def _benchmark_median_ci(time_series, z=1.96):
+    """ Distribution-free confidence interval of the median, taken from the order statistics.
+    Returns (low, high); z=1.96 gives a ~95% interval. """
+    from math import ceil, floor, sqrt
+
+    data = sorted(time_series)
+    n = len(data)
+    low_rank = max(int(floor(n / 2 - z * sqrt(n) / 2)), 1)
+    high_rank = min(int(ceil(1 + n / 2 + z * sqrt(n) / 2)), n)
+    return data[low_rank - 1], data[high_rank - 1]
+
+
+def _benchmark_load_all_commands():
+    try:
+        from azure.cli.core import get_default_cli
+        from azure.cli.core.file_util import create_invoker_and_load_cmds_and_args
+    except ImportError:
+        raise CLIError("Azure CLI is not installed")
+
+    az_cli = get_default_cli()
+
+    create_invoker_and_load_cmds_and_args(az_cli)
+
+    commands = list(az_cli.invocation.commands_loader.command_table.keys())
+
+    commands = [cmd + " --help" for cmd in commands]
+
+    return sorted(commands)
+
+
+def _benchmark_process_pool_init():
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _benchmark_warm_process_pool_init():
+    """ Turn a pool worker into a warm template: import the CLI core once so that children forked from it only
+    pay for building the command table, parsing and dispatching. """
+    _benchmark_process_pool_init()
+
+    import azure.cli.core  # pylint: disable=import-error, unused-import, unused-variable
+    import azure.cli.core.commands  # pylint: disable=import-error, unused-import, unused-variable
+    import azure.cli.core.parser  # pylint: disable=import-error, unused-import, unused-variable
+
+
+def _benchmark_cmd_warm_timer(raw_command, timeout=None):
+    import shlex
+    import signal
+
+    class _Timeout(Exception):
+        pass
+
+    def _on_alarm(*_):
+        raise _Timeout()
+
+    s = timeit.default_timer()
+    pid = os.fork()  # pylint: disable=no-member
+    if pid == 0:
+        exit_code = 1
+        try:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, 1)
+            os.dup2(devnull, 2)
+            from azure.cli.core import get_default_cli  # pylint: disable=import-error
+            exit_code = get_default_cli().invoke(shlex.split(raw_command)) or 0
+        except SystemExit as ex:
+            # sys.exit() without a code is a normal exit
+            exit_code = 0 if ex.code is None else ex.code if isinstance(ex.code, int) else 1
+        finally:
+            os._exit(exit_code)  # pylint: disable=protected-access
+
+    previous = signal.signal(signal.SIGALRM, _on_alarm)  # pylint: disable=no-member
+    signal.setitimer(signal.ITIMER_REAL, timeout or 0)  # pylint: disable=no-member
+    try:
+        os.waitpid(pid, 0)
+    except _Timeout:
+        try:
+            os.kill(pid, signal.SIGKILL)  # pylint: disable=no-member
+            os.waitpid(pid, 0)
+        except OSError:
+            # the child was already reaped when the alarm went off
+            pass
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)  # pylint: disable=no-member
+        signal.signal(signal.SIGALRM, previous)  # pylint: disable=no-member
+    e = timeit.default_timer()
+    return round(e - s, 4)
+
+
+def _benchmark_cmd_timer(raw_command, timeout=None):
+    import subprocess
+
+    s = timeit.default_timer()
+    try:
+        _benchmark_cmd_run(raw_command, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None
+    e = timeit.default_timer()
+    return round(e - s, 4)
+
+
+def _benchmark_cmd_run(raw_command, timeout=None, profile=None):
+    """ Run a command the way the benchmark times it. With `profile`, run it under cProfile and write the
+    stats to that path. """
+    import shlex
+
+    runner = ['-m', 'cProfile', '-o', profile] if profile else []
+    return _python_run(runner + ['-m', 'azure.cli'] + shlex.split(raw_command), timeout=timeout)
+
+
+def _python_run(args, timeout=None):
+    """ Run the Python of azdev with the arguments `args` and return its output. Unlike the command line of
+    `py_cmd`, which is split on whitespace, the arguments may contain spaces, e.g. in paths. """
+    import subprocess
+
+    command = [sys.executable] + args
+    logger.info('Running: %s', command)
+    return subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout,
+                          check=False).stdout.decode('utf-8', errors='replace')
+
+
+def _benchmark_cmd_staticstic(time_series: list):
+    from math import sqrt
+
+    time_series.sort()
+
+    size = len(time_series)
+
+    if size % 2 == 0:
+        mid_time = (time_series[size // 2 - 1] + time_series[size // 2]) / 2
+    else:
+        mid_time = time_series[(size - 1) // 2]
+
+    min_time = time_series[0]
+    max_time = time_series[-1]
+    avg_time = sum(time_series) / size
+
+    std_deviation = sqrt(
+        sum((t - avg_time) * (t - avg_time) for t in time_series) / size
+    )
+
+    return {
+        "Min": round(min_time, 4),
+        "Max": round(max_time, 4),
+        "Media": round(mid_time, 4),
+        "Avg": round(avg_time, 4),
+        "Std": round(std_deviation, 4),
+    }
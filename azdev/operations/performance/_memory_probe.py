@@ -0,0 +1,105 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+""" Measures the memory of one CLI invocation in a fresh interpreter.
+
+Usage: python _memory_probe.py OUTPUT [--trace] (--command-table | COMMAND...)
+
+Writes a JSON object to OUTPUT with the peak RSS of the process in KiB and, with --trace, the tracemalloc peak,
+the traced memory still allocated at the end per command module and the top allocating source lines. It is run as
+a script rather than with -m so that the azdev package is not imported and the numbers only contain the CLI.
+"""
+
+import json
+import os
+import re
+import sys
+
+COMMAND_TABLE = '--command-table'
+TRACE = '--trace'
+TRACEBACK_LIMIT = 25
+TOP_ALLOCATORS = 20
+CORE = 'core'
+
+_OWNER_REGEX = re.compile(r'[/\\]command_modules[/\\](?P<mod>[^/\\]+)|[/\\](?P<ext>azext_[^/\\]+)')
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB everywhere else
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _owner(traceback):
+    """ The command module or extension of the most recent frame that belongs to one, else 'core'. """
+    for frame in reversed(traceback):
+        match = _OWNER_REGEX.search(frame.filename)
+        if match:
+            return match.group('mod') or match.group('ext')
+    return CORE
+
+
+def _run(args):
+    from azure.cli.core import get_default_cli  # pylint: disable=import-error
+
+    az_cli = get_default_cli()
+    if args == [COMMAND_TABLE]:
+        from azure.cli.core.file_util import (  # pylint: disable=import-error
+            create_invoker_and_load_cmds_and_args, get_all_help)
+        create_invoker_and_load_cmds_and_args(az_cli)
+        get_all_help(az_cli)
+        return
+
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    stdout, stderr = os.dup(1), os.dup(2)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        az_cli.invoke(args)
+    except SystemExit:
+        pass
+    finally:
+        os.dup2(stdout, 1)
+        os.dup2(stderr, 2)
+
+
+def main(argv):
+    output, args = argv[0], argv[1:]
+    trace = TRACE in args
+    if trace:
+        import tracemalloc
+        args.remove(TRACE)
+        tracemalloc.start(TRACEBACK_LIMIT)
+
+    _run(args)
+
+    result = {'peak_rss_kb': _peak_rss_kb()}
+    if trace:
+        _, traced_peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        modules = {}
+        for stat in snapshot.statistics('traceback'):
+            owner = _owner(stat.traceback)
+            modules[owner] = modules.get(owner, 0) + stat.size
+        result.update({
+            'traced_peak_kb': traced_peak // 1024,
+            'modules': modules,
+            'top': [['{}:{}'.format(stat.traceback[0].filename, stat.traceback[0].lineno), stat.size]
+                    for stat in snapshot.statistics('lineno')[:TOP_ALLOCATORS]],
+        })
+
+    with open(output, 'w') as f:
+        json.dump(result, f)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,136 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import time
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from azdev.utilities import get_azdev_config_dir, make_dirs
+
+logger = get_logger(__name__)
+
+RESULT_STORE_FILE = 'perf_results.db'
+UNKNOWN_COMMIT = 'unknown'
+
+
+def get_machine_fingerprint():
+    """ Returns a short, stable identifier of the current machine and interpreter.
+
+    Timings are only comparable when they were taken on the same hardware with the same Python,
+    so every stored result is tagged with this value.
+    """
+    traits = [
+        platform.node(),
+        platform.system(),
+        platform.machine(),
+        platform.processor(),
+        str(os.cpu_count()),
+        platform.python_implementation(),
+        platform.python_version(),
+    ]
+    return hashlib.sha1('|'.join(traits).encode('utf-8')).hexdigest()[:12]
+
+
+def get_cli_commit():
+    """ Returns the HEAD commit of the Azure CLI repo azdev is set up with, or 'unknown'. """
+    from azdev.utilities import get_cli_repo_path
+    try:
+        from git import Repo, exc as git_exc
+    except ImportError:
+        return UNKNOWN_COMMIT
+
+    try:
+        return Repo(get_cli_repo_path()).head.commit.hexsha
+    except (CLIError, ValueError, git_exc.GitError) as ex:
+        logger.debug('Unable to resolve the CLI repo commit: %s', ex)
+        return UNKNOWN_COMMIT
+
+
+class ResultStore:
+    """ Append-only store of performance measurements, kept in a SQLite file in the azdev config dir.
+
+    Every record is keyed by the kind of measurement (e.g. 'benchmark' or 'load-times'), the measured name
+    (command or module), the commit of the CLI repo and the machine fingerprint.
+    """
+
+    def __init__(self, path=None):
+        if not path:
+            make_dirs(get_azdev_config_dir())
+            path = os.path.join(get_azdev_config_dir(), RESULT_STORE_FILE)
+        self.path = path
+        self._commit = None
+        self._machine = None
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS results ('
+                         'kind TEXT NOT NULL, name TEXT NOT NULL, commit_id TEXT NOT NULL, machine TEXT NOT NULL, '
+                         'created REAL NOT NULL, time_series TEXT NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS results_key ON results (kind, commit_id, machine)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @property
+    def commit(self):
+        if self._commit is None:
+            self._commit = get_cli_commit()
+        return self._commit
+
+    @property
+    def machine(self):
+        if self._machine is None:
+            self._machine = get_machine_fingerprint()
+        return self._machine
+
+    def add(self, kind, name, time_series, commit=None, machine=None):
+        """ Record the samples of one measurement. """
+        with self._connect() as conn:
+            conn.execute('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                         (kind, name, commit or self.commit, machine or self.machine, time.time(),
+                          json.dumps(list(time_series))))
+
+    def get(self, kind, commit, machine=None):
+        """ Returns {name: [samples]} of all measurements taken at `commit` (a full hash or a unique prefix).
+        Samples of repeated measurements are concatenated. """
+        machine = machine or self.machine
+        with self._connect() as conn:
+            rows = conn.execute('SELECT name, time_series FROM results '
+                                'WHERE kind = ? AND machine = ? AND commit_id LIKE ? ORDER BY created',
+                                (kind, machine, '{}%'.format(commit))).fetchall()
+            commits = conn.execute('SELECT DISTINCT commit_id FROM results '
+                                   'WHERE kind = ? AND machine = ? AND commit_id LIKE ?',
+                                   (kind, machine, '{}%'.format(commit))).fetchall()
+        if len(commits) > 1:
+            raise CLIError("'{}' is ambiguous, it matches commits: {}".format(
+                commit, ', '.join(c[0] for c in commits)))
+
+        results = {}
+        for name, time_series in rows:
+            results.setdefault(name, []).extend(json.loads(time_series))
+        return results
+
+    def list_baselines(self, kind, machine=None):
+        """ Returns the commits that have results of `kind` on `machine`, most recent first. """
+        machine = machine or self.machine
+        with self._connect() as conn:
+            rows = conn.execute('SELECT commit_id, COUNT(DISTINCT name), MAX(created) FROM results '
+                                'WHERE kind = ? AND machine = ? GROUP BY commit_id ORDER BY MAX(created) DESC',
+                                (kind, machine)).fetchall()
+        return [{'Commit': commit, 'Entries': entries, 'Last Run': time.strftime('%Y-%m-%d %H:%M:%S',
+                                                                                 time.localtime(created))}
+                for commit, entries, created in rows]
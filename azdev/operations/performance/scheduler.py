@@ -0,0 +1,190 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import json
+import multiprocessing
+import os
+import queue
+import timeit
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+logger = get_logger(__name__)
+
+JOURNAL_FILE = 'benchmark_journal.jsonl'
+# seconds without any finished task, on top of the task timeout, after which the pool is considered stuck
+STALL_GRACE_PERIOD = 60
+
+
+class BenchmarkJournal:
+    """ Append-only JSONL log of every sample of a benchmark sweep, written as soon as the sample is taken.
+
+    A sweep that was interrupted can be resumed from it: samples already in the journal are not taken again and
+    commands that were marked as done are not measured or stored again.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._entries = {}
+        cut_off = False
+        if resume and os.path.isfile(path):
+            with open(path) as f:
+                for line in f:
+                    cut_off = not line.endswith('\n')
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line may be cut off if the sweep was killed while writing it
+                        continue
+                    entry = self._entries.setdefault((record['kind'], record['command']),
+                                                     {'time_series': [], 'failures': 0, 'done': False})
+                    if record.get('done'):
+                        entry['done'] = True
+                    elif record.get('time') is None:
+                        entry['failures'] += 1
+                    else:
+                        entry['time_series'].append(record['time'])
+            logger.warning('Resuming benchmark from %s: %d commands already measured.', path,
+                           sum(1 for e in self._entries.values() if e['done']))
+        # pylint: disable=consider-using-with
+        self._file = open(path, 'a' if resume else 'w')
+        if cut_off:
+            self._file.write('\n')
+
+    def get(self, kind, command):
+        return self._entries.get((kind, command), {'time_series': [], 'failures': 0, 'done': False})
+
+    def add_sample(self, kind, command, value):
+        self._write({'kind': kind, 'command': command, 'time': value})
+
+    def mark_done(self, kind, command):
+        self._write({'kind': kind, 'command': command, 'done': True})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BenchmarkSampler:  # pylint: disable=too-many-instance-attributes
+    """ Collects the samples of one command and decides how many more tasks it needs.
+
+    Takes `runs` samples, unless `is_stable` is given: then samples are requested in batches of `batch_size` until
+    `is_stable(time_series)` holds or `time_budget` seconds have passed since the first batch was requested.
+    Timed out tasks are counted as failures and don't count towards `runs`.
+    """
+
+    def __init__(self, command, runs, is_stable=None, batch_size=1, time_budget=None,
+                 time_series=None, failures=0, done=False):
+        self.command = command
+        self.runs = runs
+        self.is_stable = is_stable
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.time_series = list(time_series or [])
+        self.failures = failures
+        self.done = done
+        self.in_flight = 0
+        self._deadline = None
+
+    def add(self, value):
+        self.in_flight -= 1
+        if value is None:
+            self.failures += 1
+        else:
+            self.time_series.append(value)
+
+    def next_tasks(self):
+        """ Returns how many tasks to submit now. Marks the sampler done when it needs no more samples. """
+        if self.done or self.in_flight:
+            return 0
+
+        if self.is_stable is None:
+            missing = self.runs - len(self.time_series)
+            # give up on commands which do nothing but time out
+            if missing <= 0 or self.failures >= self.runs:
+                self.done = True
+                return 0
+            self.in_flight = missing
+            return missing
+
+        if self._deadline is None:
+            self._deadline = timeit.default_timer() + (self.time_budget or 0)
+        elif self.time_series and self.is_stable(self.time_series):
+            self.done = True
+            return 0
+        elif timeit.default_timer() >= self._deadline:
+            logger.warning("Time budget used up for '%s' after %d runs.", self.command, len(self.time_series))
+            self.done = True
+            return 0
+        self.in_flight = self.batch_size
+        return self.batch_size
+
+
+class BenchmarkScheduler:
+    """ One long-lived process pool which takes (command, run) tasks of all commands at once.
+
+    Tasks of every command are put on the pool's shared queue, so a worker that is done picks up the next task of
+    any command instead of waiting for the slowest run of the current one. `timer(command, timeout)` is expected
+    to enforce `task_timeout` itself and to return None when it hits it.
+    """
+
+    def __init__(self, timer, initializer, task_timeout, processes=None):
+        self.timer = timer
+        self.task_timeout = task_timeout
+        # pylint: disable=consider-using-with
+        self._pool = multiprocessing.Pool(processes or multiprocessing.cpu_count(), initializer)
+        self._results = queue.Queue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self._pool.terminate()
+        else:
+            self._pool.close()
+        self._pool.join()
+
+    def run(self, samplers, on_sample=None):
+        """ Measure all samplers. Yields every sampler once it is done, in the order they finish. """
+        outstanding = 0
+
+        # results are passed back by sampler index, as several samplers may measure the same command
+        def _submit(index):
+            sampler = samplers[index]
+            count = sampler.next_tasks()
+            for _ in range(count):
+                self._pool.apply_async(self.timer, (sampler.command, self.task_timeout),
+                                       callback=lambda value, i=index: self._results.put((i, value)),
+                                       error_callback=lambda ex, i=index: self._results.put((i, ex)))
+            return count
+
+        for index, sampler in enumerate(samplers):
+            outstanding += _submit(index)
+            if sampler.done:
+                yield sampler
+
+        while outstanding:
+            try:
+                index, value = self._results.get(timeout=self.task_timeout + STALL_GRACE_PERIOD)
+            except queue.Empty:
+                raise CLIError('No benchmark task finished within {} seconds, the worker pool seems to be stuck. '
+                               'Rerun with --resume to continue.'.format(self.task_timeout + STALL_GRACE_PERIOD))
+            outstanding -= 1
+            sampler = samplers[index]
+            if isinstance(value, Exception):
+                logger.warning("Measuring '%s' failed: %s", sampler.command, value)
+                value = None
+            sampler.add(value)
+            if on_sample:
+                on_sample(sampler, value)
+            outstanding += _submit(index)
+            if sampler.done:
+                yield sampler
@@ -0,0 +1,225 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+""" Synthetic inputs for the azdev benchmark suite, sized like the real Azure CLI and extension repos. """
+
+import json
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+MODULE_COUNT = 1000
+EXTENSION_COUNT = 200
+TEST_FILES_PER_MODULE = 5
+TEST_CLASSES_PER_FILE = 2
+TESTS_PER_CLASS = 5
+COMMANDS_PER_MODULE = 20
+PARAMETERS_PER_COMMAND = 12
+META_GROUPS = 20
+
+EXTENSION_PACKAGE = 'azext_bench{}'
+
+_TEST_FILE = '''
+from unittest import TestCase
+
+
+class _Base(TestCase):
+    pass
+
+{classes}
+'''
+
+_TEST_CLASS = '''
+class {name}(_Base):
+{tests}
+'''
+
+_TEST_METHOD = '''
+    def test_{module}_{index}(self):
+        self.kwargs.update({{'name': 'x'}})
+        self.cmd('{command} --name {{name}} '
+                 '--resource-group {{rg}}',
+                 checks=[self.check('name', '{{name}}')])
+'''
+
+
+def _write(path, content=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _test_file(module, file_index):
+    classes = []
+    for class_index in range(TEST_CLASSES_PER_FILE):
+        tests = ''.join(_TEST_METHOD.format(module=module, index='{}_{}_{}'.format(file_index, class_index, i),
+                                            command='{} sub{} create'.format(module, i))
+                        for i in range(TESTS_PER_CLASS))
+        classes.append(_TEST_CLASS.format(name='{}Scenario{}Test{}'.format(module.title(), file_index, class_index),
+                                          tests=tests))
+    return _TEST_FILE.format(classes=''.join(classes))
+
+
+@pytest.fixture(scope='session')
+def fake_repos():
+    """ A CLI repo with MODULE_COUNT command modules and an extension repo with EXTENSION_COUNT extensions, each
+    with TEST_FILES_PER_MODULE test files. Returns (cli_repo, ext_repo, [extension source dirs]). """
+    root = tempfile.mkdtemp()
+    cli_repo = os.path.join(root, 'azure-cli')
+    ext_repo = os.path.join(root, 'azure-cli-extensions')
+
+    for name in ['azure-cli', 'azure-cli-core', 'azure-cli-telemetry', 'azure-cli-testsdk']:
+        _write(os.path.join(cli_repo, 'src', name, 'setup.py'))
+    modules_dir = os.path.join(cli_repo, 'src', 'azure-cli', 'azure', 'cli', 'command_modules')
+    for i in range(MODULE_COUNT):
+        module = 'mod{}'.format(i)
+        _write(os.path.join(modules_dir, module, '__init__.py'))
+        for j in range(TEST_FILES_PER_MODULE):
+            _write(os.path.join(modules_dir, module, 'tests', 'latest', 'test_{}_{}.py'.format(module, j)),
+                   _test_file(module, j))
+
+    ext_dirs = []
+    for i in range(EXTENSION_COUNT):
+        ext_dir = os.path.join(ext_repo, 'src', 'bench{}'.format(i))
+        package_dir = os.path.join(ext_dir, EXTENSION_PACKAGE.format(i))
+        _write(os.path.join(ext_dir, 'bench{}.egg-info'.format(i), 'PKG-INFO'))
+        for sub_dir in ['', 'tests', os.path.join('tests', 'latest')]:
+            _write(os.path.join(package_dir, sub_dir, '__init__.py'))
+        for j in range(TEST_FILES_PER_MODULE):
+            _write(os.path.join(package_dir, 'tests', 'latest', 'test_bench{}_{}.py'.format(i, j)),
+                   _test_file('bench{}'.format(i), j))
+        ext_dirs.append(ext_dir)
+
+    yield cli_repo, ext_repo, ext_dirs
+    shutil.rmtree(root, ignore_errors=True)
+
+
+def _meta_parameters(count, seed):
+    return [{
+        'name': 'param_{}'.format(i),
+        'options': ['--param-{}'.format(i), '-p{}'.format(i)] if i % 3 == 0 else ['--param-{}'.format(i)],
+        'required': i % 4 == 0,
+        'choices': ['a', 'b', 'c'] if (i + seed) % 5 == 0 else [],
+        'type': 'string',
+    } for i in range(count)]
+
+
+def _meta(changed):
+    groups = {}
+    for g in range(META_GROUPS):
+        name = 'bench group{}'.format(g)
+        commands = {}
+        for c in range(COMMANDS_PER_MODULE):
+            if changed and c == COMMANDS_PER_MODULE - 1 and g % 10 == 0:
+                continue  # removed command
+            command = '{} cmd{}'.format(name, c)
+            parameters = _meta_parameters(PARAMETERS_PER_COMMAND, 1 if changed and c % 7 == 0 else 0)
+            if changed and c % 11 == 0:
+                parameters = parameters[:-1]
+            if changed and c % 13 == 0:
+                parameters[0]['required'] = not parameters[0]['required']
+            commands[command] = {'name': command, 'is_aaz': False, 'parameters': parameters}
+        if changed and g % 10 == 1:
+            commands['{} new'.format(name)] = {'name': '{} new'.format(name), 'parameters': _meta_parameters(3, 0)}
+        groups[name] = {'name': name, 'commands': commands, 'sub_groups': {}}
+    return {
+        'module_name': 'bench',
+        'name': 'az',
+        'commands': {},
+        'sub_groups': {'bench': {'name': 'bench', 'commands': {}, 'sub_groups': groups}},
+    }
+
+
+@pytest.fixture(scope='session')
+def meta_files():
+    """ Paths of two large command meta JSON files of one module, the second with a mix of breaking changes. """
+    root = tempfile.mkdtemp()
+    paths = []
+    for name, changed in [('az_bench_meta_before.json', False), ('az_bench_meta_after.json', True)]:
+        path = os.path.join(root, name)
+        with open(path, 'w') as f:
+            json.dump(_meta(changed), f)
+        paths.append(path)
+    yield paths
+    shutil.rmtree(root, ignore_errors=True)
+
+
+def _command_names():
+    for m in range(MODULE_COUNT // 4):
+        for c in range(COMMANDS_PER_MODULE):
+            verb = ['create', 'update', 'delete', 'list', 'show'][c % 5]
+            yield 'mod{} sub{} {}'.format(m, c // 5, verb)
+
+
+@pytest.fixture(scope='session')
+def linter_exclusions():
+    """ A linter_exclusions.yml shaped dict excluding rules for every tenth command and parameter, read back from a
+    YAML file like the linter does. """
+    exclusions = {}
+    for index, command in enumerate(_command_names()):
+        if index % 10:
+            continue
+        exclusions[command] = {
+            'rule_exclusions': ['missing_command_help', 'missing_command_test_coverage'],
+            'parameters': {
+                'param_{}'.format(i): {'rule_exclusions': ['missing_parameter_help', 'option_length_too_long']}
+                for i in range(0, PARAMETERS_PER_COMMAND, 3)
+            },
+        }
+    root = tempfile.mkdtemp()
+    path = os.path.join(root, 'linter_exclusions.yml')
+    with open(path, 'w') as f:
+        yaml.safe_dump(exclusions, f)
+    with open(path) as f:
+        exclusions = yaml.safe_load(f)
+    shutil.rmtree(root, ignore_errors=True)
+    return exclusions
+
+
+@pytest.fixture(scope='session')
+def command_loader():
+    """ Stand-in for a loaded CLI command loader with its command and group tables, plus matching YAML help entries
+    and loaded help. Returns (command_loader, help_file_entries, loaded_help). """
+    command_table = {}
+    command_group_table = {}
+    help_file_entries = {}
+    loaded_help = {}
+    for index, command in enumerate(_command_names()):
+        arguments = {}
+        parameter_help = []
+        for i in range(PARAMETERS_PER_COMMAND):
+            options = ['--param-{}'.format(i), '-p'] if i == 0 else ['--param-{}'.format(i)]
+            arguments['param_{}'.format(i)] = SimpleNamespace(type=SimpleNamespace(settings={
+                'options_list': options,
+                'help': 'Parameter {}.'.format(i) if i % 5 else None,
+                'default': None,
+            }))
+            if i % 2:
+                parameter_help.append(SimpleNamespace(name=' '.join(options), short_summary='Param {}.'.format(i),
+                                                      long_summary=''))
+        command_table[command] = SimpleNamespace(arguments=arguments, deprecate_info=None,
+                                                 supports_no_wait=index % 7 == 0)
+        group = command.rsplit(' ', 1)[0]
+        command_group_table.setdefault(group, SimpleNamespace(group_kwargs={}))
+        help_file_entries[command] = {
+            'type': 'command',
+            'short-summary': 'Command {}.'.format(index),
+            'parameters': [{'name': p.name, 'short-summary': p.short_summary} for p in parameter_help],
+            'examples': [{'name': 'Example', 'text': 'az {} --param-1 x'.format(command)}],
+        }
+        loaded_help[command] = SimpleNamespace(short_summary='Command {}.'.format(index) if index % 9 else '',
+                                               long_summary='', parameters=parameter_help)
+    for group in command_group_table:
+        help_file_entries[group] = {'type': 'group', 'short-summary': 'Group.'}
+        loaded_help[group] = SimpleNamespace(short_summary='Group.', long_summary='', parameters=[])
+
+    loader = SimpleNamespace(command_table=command_table, command_group_table=command_group_table,
+                             cmd_to_loader_map={}, cli_ctx=SimpleNamespace(invocation=SimpleNamespace(parser=None)))
+    return loader, help_file_entries, loaded_help
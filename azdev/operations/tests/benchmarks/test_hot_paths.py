@@ -0,0 +1,222 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+""" Benchmarks of azdev's own hot paths, run on the synthetic repos and files from conftest.py.
+
+Run them and compare against a saved run with:
+
+    pytest azdev/operations/tests/benchmarks --benchmark-autosave
+    pytest azdev/operations/tests/benchmarks --benchmark-compare --benchmark-compare-fail=median:10%
+
+Cases that need azure-cli (azure.cli.core) or the command coverage config (azdev.operations.regex downloads it
+when there is no CLI repo) are skipped when those can't be loaded.
+"""
+
+from importlib import import_module
+import os
+import re
+import sys
+from unittest import mock
+
+import pytest
+
+from .conftest import EXTENSION_COUNT, EXTENSION_PACKAGE, MODULE_COUNT, TEST_FILES_PER_MODULE
+
+pytest.importorskip('pytest_benchmark')
+
+
+def _import_or_skip(name):
+    try:
+        module = import_module(name)
+    except Exception as ex:  # pylint: disable=broad-except
+        pytest.skip('{} can not be loaded: {}'.format(name, ex))
+    return module
+
+
+@pytest.fixture
+def repo_paths(fake_repos):
+    cli_repo, ext_repo, _ = fake_repos
+    extension_module = _import_or_skip('azure.cli.core.extension')
+    with mock.patch('azdev.utilities.path.get_cli_repo_path', return_value=cli_repo), \
+            mock.patch('azdev.utilities.path.get_ext_repo_paths', return_value=[ext_repo]), \
+            mock.patch.object(extension_module, 'EXTENSIONS_DIR', os.path.join(ext_repo, 'no-whl-extensions')):
+        yield
+
+
+@pytest.mark.usefixtures('repo_paths')
+def test_get_path_table(benchmark):
+    from azdev.utilities import get_path_table
+
+    table = benchmark(get_path_table)
+
+    assert len(table['mod']) == MODULE_COUNT
+    assert len(table['ext']) == EXTENSION_COUNT
+
+
+@pytest.mark.usefixtures('repo_paths')
+def test_get_path_table_filtered(benchmark):
+    from azdev.utilities import get_path_table
+
+    table = benchmark(lambda: get_path_table(include_only=['mod1', 'mod{}'.format(MODULE_COUNT - 1)]))
+
+    assert len(table['mod']) == 2
+
+
+@pytest.mark.usefixtures('repo_paths')
+def test_get_name_index(benchmark):
+    from azdev.utilities import get_name_index
+
+    table = benchmark(get_name_index)
+
+    assert len(table) >= MODULE_COUNT + EXTENSION_COUNT
+
+
+def test_discover_tests(benchmark, fake_repos):
+    from azdev.operations.testtool import _discover_tests
+
+    _, _, ext_dirs = fake_repos
+    path_table = {'core': {}, 'mod': {}, 'ext': {os.path.basename(d): d for d in ext_dirs}}
+    name_index = {os.path.basename(d): EXTENSION_PACKAGE.format(os.path.basename(d)[len('bench'):])
+                  for d in ext_dirs}
+
+    def _forget_imports():
+        for name in [m for m in sys.modules if m.startswith('azext_bench')]:
+            del sys.modules[name]
+
+    with mock.patch.object(sys, 'path', sys.path + ext_dirs), \
+            mock.patch('azdev.operations.testtool.get_path_table', return_value=path_table), \
+            mock.patch('azdev.operations.testtool.get_name_index', return_value=name_index):
+        # every round has to import the test files again, like a fresh `azdev test --discover`
+        test_index = benchmark.pedantic(_discover_tests, args=('latest',), setup=_forget_imports, rounds=3)
+    _forget_imports()
+
+    test_files = [key for key in test_index if re.fullmatch(r'test_bench\d+_\d+', key)]
+    assert len(test_files) == EXTENSION_COUNT * TEST_FILES_PER_MODULE
+
+
+def test_discover_tests_ast(benchmark, fake_repos):
+    from azdev.operations.testtool import _discover_tests, AST_BACKEND
+
+    _, _, ext_dirs = fake_repos
+    path_table = {'core': {}, 'mod': {}, 'ext': {os.path.basename(d): d for d in ext_dirs}}
+    name_index = {os.path.basename(d): EXTENSION_PACKAGE.format(os.path.basename(d)[len('bench'):])
+                  for d in ext_dirs}
+
+    with mock.patch('azdev.operations.testtool.get_path_table', return_value=path_table), \
+            mock.patch('azdev.operations.testtool.get_name_index', return_value=name_index):
+        test_index = benchmark.pedantic(_discover_tests, args=('latest', None, AST_BACKEND), rounds=3)
+
+    assert not [m for m in sys.modules if m.startswith('azext_bench')]
+    test_files = [key for key in test_index if re.fullmatch(r'test_bench\d+_\d+', key)]
+    assert len(test_files) == EXTENSION_COUNT * TEST_FILES_PER_MODULE
+
+
+def test_get_all_tested_commands_from_regex(benchmark, fake_repos):
+    regex = _import_or_skip('azdev.operations.regex')
+
+    _, _, ext_dirs = fake_repos
+    lines = []
+    for ext_dir in ext_dirs[:20]:
+        tests_dir = os.path.join(ext_dir, EXTENSION_PACKAGE.format(os.path.basename(ext_dir)[len('bench'):]),
+                                 'tests', 'latest')
+        for name in sorted(os.listdir(tests_dir)):
+            if name.startswith('test_'):
+                with open(os.path.join(tests_dir, name)) as f:
+                    lines.extend(f.readlines())
+
+    commands = benchmark(regex.get_all_tested_commands_from_regex, lines)
+
+    assert commands
+
+
+def test_meta_change_detect(benchmark, meta_files):
+    pytest.importorskip('azure_cli_diff_tool')
+    import json
+    from deepdiff import DeepDiff
+    from azure_cli_diff_tool.meta_change_detect import MetaChangeDetect
+    from azure_cli_diff_tool.utils import expand_deprecate_obj
+
+    metas = []
+    for path in meta_files:
+        with open(path) as f:
+            metas.append(json.load(f))
+        expand_deprecate_obj(metas[-1])
+    deep_diff = DeepDiff(metas[0], metas[1])
+
+    def _detect():
+        detected_changes = MetaChangeDetect(deep_diff, *metas)
+        detected_changes.check_deep_diffs()
+        return detected_changes
+
+    detected_changes = benchmark.pedantic(_detect, rounds=5)
+
+    assert detected_changes.diff_objs
+
+
+def _linter_manager(command_loader, exclusions, **kwargs):
+    linter = _import_or_skip('azdev.operations.linter.linter')
+    loader, help_file_entries, loaded_help = command_loader
+    return linter.LinterManager(command_loader=loader, help_file_entries=help_file_entries, loaded_help=loaded_help,
+                                exclusions=exclusions, min_severity=linter.LinterSeverity.LOW,
+                                use_ci_exclusions=False, **kwargs)
+
+
+@pytest.mark.parametrize('rule_group', ['commands', 'command_groups', 'params'])
+def test_linter_rules(benchmark, command_loader, linter_exclusions, rule_group):
+    manager = _linter_manager(command_loader, linter_exclusions)
+    run_args = {'run_{}'.format(rule_group): True}
+
+    benchmark(manager.run, **run_args)
+
+
+@pytest.mark.parametrize('rule_group', ['commands', 'command_groups', 'params'])
+def test_linter_rules_cached(benchmark, command_loader, linter_exclusions, rule_group, tmp_path):
+    verdict_cache = _import_or_skip('azdev.operations.linter.verdict_cache')
+    cache_path = str(tmp_path / 'linter_cache.db')
+    run_args = {'run_{}'.format(rule_group): True}
+    # a first run stores the verdicts, later runs replay them
+    _linter_manager(command_loader, linter_exclusions,
+                    verdict_cache=verdict_cache.VerdictCache(cache_path)).run(**run_args)
+
+    def _run():
+        manager = _linter_manager(command_loader, linter_exclusions,
+                                  verdict_cache=verdict_cache.VerdictCache(cache_path))
+        return manager.run(**run_args)
+
+    benchmark(_run)
+
+
+def test_linter_help_entry_rules(benchmark, command_loader, linter_exclusions):
+    _import_or_skip('azure.cli.core.parser')
+    manager = _linter_manager(command_loader, linter_exclusions,
+                              rule_inclusions=['unrecognized_help_entry_rule', 'faulty_help_type_rule',
+                                               'unrecognized_help_parameter_rule'])
+
+    benchmark(manager.run, run_help_files_entries=True)
+
+
+@pytest.mark.parametrize('level', ['command', 'argument'])
+def test_cmdcov_command_test_coverage(benchmark, command_loader, level):
+    cmdcov = _import_or_skip('azdev.operations.cmdcov.cmdcov')
+
+    loader, _, _ = command_loader
+    modules = sorted({command.split()[0] for command in loader.command_table})
+    manager = cmdcov.CmdcovManager(selected_mod_names=modules, selected_mod_paths=[], loaded_help={}, level=level,
+                                   enable_cli_own=False, exclusions={})
+    for index, (command, metadata) in enumerate(loader.command_table.items()):
+        module = command.split()[0]
+        if level == 'argument':
+            for argument in metadata.arguments.values():
+                manager.all_commands[module].append('{} {}'.format(command, argument.type.settings['options_list']))
+        else:
+            manager.all_commands[module].append(command)
+        # two out of three commands are tested, with a few of their options
+        if index % 3:
+            manager.all_tested_commands[module].append('{} --param-1 x --param-3 y'.format(command))
+
+    coverage = benchmark(manager._run_command_test_coverage)  # pylint: disable=protected-access
+
+    assert coverage['Total'][0]
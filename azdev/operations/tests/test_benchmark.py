@@ -4,17 +4,30 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+import multiprocessing
+import os
 import random
-from unittest import mock, TestCase
+import shutil
+import sys
+import tempfile
+import time
+from unittest import mock, skipUnless, TestCase
 from math import sqrt
 
 from knack.util import CLIError
 
 from ..performance import (
+    ADAPTIVE_MIN_RUNS,
+    _benchmark_cmd_run,
     _benchmark_cmd_staticstic,
+    _benchmark_cmd_warm_timer,
+    _benchmark_median_ci,
     _benchmark_load_all_commands,
+    _benchmark_process_pool_init,
+    _pstats_to_collapsed,
     benchmark,
 )
+from ..performance.scheduler import BenchmarkSampler, BenchmarkScheduler
 
 
 class TestBenchmarkStatistics(TestCase):
@@ -79,8 +92,6 @@ class TestBenchmarkCommands(TestCase):
             self.assertTrue(cmd.endswith(" --help"))
 
     def test_load_all_commands_fail(self):
-        import sys
-
         original_azure_cli_core_mod = sys.modules.get("azure.cli.core")
         sys.modules["azure.cli.core"] = None
 
@@ -104,18 +115,27 @@ class TestBenchmarkCommands(TestCase):
 #         return [1] * len(self.iterable)
 
 
-class _MockedPoolMapResult:
-    def __init__(self, func, iterable):
-        self.func = func
-        self.iterable = iterable
-
-        self._value = [self.func(i) for i in iterable]  # mocked results
-
-    def get(self, timeout=0):  # pylint: disable=unused-argument
-        return self._value
+def _mocked_pool_apply_async(self, func, args=(), kwds=None, callback=None,
+                             error_callback=None):  # pylint: disable=unused-argument
+    # run the task right away in this process so mocked timers are picked up
+    try:
+        value = func(*args)
+    except Exception as ex:  # pylint: disable=broad-except
+        error_callback(ex)
+    else:
+        callback(value)
 
 
 class TestBenchmark(TestCase):
+    def setUp(self):
+        # keep the stored results out of the user's azdev config dir
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        for target, value in [("get_azdev_config_dir", config_dir), ("get_cli_commit", "0123abcd")]:
+            patcher = mock.patch("azdev.operations.performance.result_store." + target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
     def test_benchmark_with_negative_runs(self):
         with self.assertRaisesRegex(CLIError, "Number of runs must be greater than 0."):
             benchmark([], -1)
@@ -145,10 +165,8 @@ class TestBenchmark(TestCase):
             "azdev.operations.performance._benchmark_cmd_timer",
             return_value=1,
         ), mock.patch(
-            "multiprocessing.pool.Pool.map_async",
-            lambda self, func, iterable, chunksize=None, callback=None, error_callback=None: _MockedPoolMapResult(
-                func, iterable
-            ),
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
         ):
 
             commands = ["network applicaiton-gateway create -h", "version", "find"]
@@ -158,10 +176,8 @@ class TestBenchmark(TestCase):
 
     def test_benchmark_in_actual_running(self):
         with mock.patch(
-            "multiprocessing.pool.Pool.map_async",
-            lambda self, func, iterable, chunksize=None, callback=None, error_callback=None: _MockedPoolMapResult(
-                func, iterable
-            ),
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
         ):
             commands = ["version"]
 
@@ -182,10 +198,8 @@ class TestBenchmark(TestCase):
 
     def test_benchmark_with_specific_runs(self):
         with mock.patch(
-            "multiprocessing.pool.Pool.map_async",
-            lambda self, func, iterable, chunksize=None, callback=None, error_callback=None: _MockedPoolMapResult(
-                func, iterable
-            ),
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
         ):
             commands = [
                 "network applicaiton-gateway create -h",
@@ -200,6 +214,170 @@ class TestBenchmark(TestCase):
             for r in result:
                 self.assertEqual(r["Runs"], 5)
 
+    def test_benchmark_measures_repeated_commands_once(self):
+        with mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ):
+            result = benchmark(commands=["version", "find", "version"], runs=3)
+
+            self.assertEqual([r["Command"] for r in result], ["version", "find"])
+            for r in result:
+                self.assertEqual(r["Runs"], 3)
+
+    def test_scheduler_fills_samplers_of_the_same_command(self):
+        samplers = [BenchmarkSampler("version", 2), BenchmarkSampler("version", 3)]
+        with mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ), BenchmarkScheduler(lambda command, timeout: 1, None, 10, processes=1) as scheduler:
+            done = list(scheduler.run(samplers))
+
+        self.assertEqual(len(done), 2)
+        self.assertEqual([len(s.time_series) for s in samplers], [2, 3])
+
+    def test_benchmark_with_warm_workers(self):
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            return_value=1.5,
+        ), mock.patch(
+            "azdev.operations.performance._benchmark_cmd_warm_timer",
+            return_value=0.5,
+        ), mock.patch(
+            "azdev.operations.performance._benchmark_warm_process_pool_init",
+            new=_benchmark_process_pool_init,
+        ), mock.patch(
+            "azdev.operations.performance.require_azure_cli",
+        ), mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ):
+            result = benchmark(commands=["version", "group list"], runs=3, warm=True)
+
+            self.assertEqual(len(result), 2)
+            for r in result:
+                self.assertEqual(r["Media"], 1.5)
+                self.assertEqual(r["Warm Media"], 0.5)
+                self.assertEqual(r["Warm Std"], 0)
+
+    @skipUnless(hasattr(os, "fork"), "Warm runs fork the worker.")
+    def test_warm_run_exiting_without_code_succeeds(self):
+        statuses = []
+
+        def _waitpid(pid, options, waitpid=os.waitpid):
+            result = waitpid(pid, options)
+            statuses.append(result[1])
+            return result
+
+        cli = mock.Mock()
+        cli.invoke.side_effect = SystemExit()
+        core = mock.Mock(get_default_cli=mock.Mock(return_value=cli))
+        with mock.patch.dict(sys.modules, {"azure.cli.core": core}), mock.patch("os.waitpid", _waitpid):
+            self.assertIsNotNone(_benchmark_cmd_warm_timer("version", timeout=60))
+
+        self.assertEqual(statuses, [0])
+
+    def test_benchmark_transformer_with_failed_cold_runs(self):
+        from azdev.transformers import performance_benchmark_data_transformer
+
+        row = {"Command": "version", "Min": None, "Avg": None, "Max": None, "Media": None, "Std": None,
+               "Failed": 3, "Warm Avg": 0.5, "Warm Media": 0.5}
+        output = performance_benchmark_data_transformer([row, dict(row, Media=1.5, Failed=0)])
+
+        self.assertIsNone(output[0]["Startup"])
+        self.assertEqual(output[1]["Startup"], 1.0)
+
+    def test_benchmark_adaptive_stops_when_stable(self):
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            return_value=1,
+        ), mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ):
+            result = benchmark(commands=["version"], max_rel_ci=0.05)
+
+            # constant timings settle after the first batch
+            self.assertEqual(result[0]["Runs"], max(ADAPTIVE_MIN_RUNS, multiprocessing.cpu_count()))
+            self.assertEqual(result[0]["Media"], 1)
+
+    def test_benchmark_adaptive_respects_time_budget(self):
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            side_effect=lambda *_: random.random(),
+        ), mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ):
+            result = benchmark(commands=["version"], max_rel_ci=0.0001, time_budget=0)
+
+            self.assertEqual(result[0]["Runs"], max(ADAPTIVE_MIN_RUNS, multiprocessing.cpu_count()))
+
+    def test_benchmark_records_timeouts_as_failures(self):
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            side_effect=lambda command, _: None if command == "vm create" else 1,
+        ), mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ):
+            result = benchmark(commands=["vm create", "version"], runs=3)
+
+            self.assertEqual(len(result), 2)
+            self.assertEqual(result[0]["Runs"], 0)
+            self.assertEqual(result[0]["Failed"], 3)
+            self.assertIsNone(result[0]["Media"])
+            self.assertEqual(result[1]["Runs"], 3)
+            self.assertEqual(result[1]["Failed"], 0)
+
+    def test_benchmark_interrupted(self):
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            side_effect=KeyboardInterrupt,
+        ), mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ):
+            with self.assertRaisesRegex(CLIError, "rerun with --resume"):
+                benchmark(commands=["version"], runs=3)
+
+    def test_benchmark_resume_from_journal(self):
+        import json
+        from azdev.operations.performance.result_store import get_azdev_config_dir
+        from azdev.operations.performance.scheduler import JOURNAL_FILE
+
+        # 'version' was finished before the sweep was killed, 'group list' got one run and a cut off line
+        with open(os.path.join(get_azdev_config_dir(), JOURNAL_FILE), "w") as f:
+            for _ in range(3):
+                f.write(json.dumps({"kind": "benchmark", "command": "version", "time": 1}) + "\n")
+            f.write(json.dumps({"kind": "benchmark", "command": "version", "done": True}) + "\n")
+            f.write(json.dumps({"kind": "benchmark", "command": "group list", "time": 2}) + "\n")
+            f.write('{"kind": "bench')
+
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            return_value=2,
+        ) as timer, mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ):
+            result = benchmark(commands=["version", "group list"], runs=3, resume=True)
+
+            self.assertEqual(timer.call_count, 2)
+            self.assertEqual([r["Runs"] for r in result], [3, 3])
+            self.assertEqual(result[0]["Media"], 1)
+            self.assertEqual(result[1]["Media"], 2)
+
+        with open(os.path.join(get_azdev_config_dir(), JOURNAL_FILE)) as f:
+            self.assertEqual(f.read().count('"done": true'), 2)
+
+    def test_median_confidence_interval(self):
+        low, high = _benchmark_median_ci(list(range(1, 101)))
+
+        self.assertLess(low, 50.5)
+        self.assertGreater(high, 50.5)
+        self.assertEqual(_benchmark_median_ci([3.0] * 10), (3.0, 3.0))
+
     # def test_benchmark_timeout(self):
     #     import time
 
@@ -218,3 +396,85 @@ class TestBenchmark(TestCase):
     #         commands = ["version"]
 
     #         benchmark(commands=commands)
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _load_module():
+    _spin(0.02)
+
+
+def _parse_args():
+    _load_module()
+    _spin(0.01)
+
+
+def _fake_az():
+    _load_module()
+    _parse_args()
+
+
+class TestBenchmarkProfile(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+
+    def _profile(self, path):
+        import cProfile
+
+        cProfile.runctx("_fake_az()", globals(), {}, filename=path)
+
+    def test_pstats_to_collapsed(self):
+        path = os.path.join(self.work_dir, "az.pstats")
+        self._profile(path)
+
+        collapsed = _pstats_to_collapsed(path)
+
+        spins = {stack: value for stack, value in collapsed.items() if stack.split(";")[-1].startswith("_spin ")}
+        # _load_module is reached through two callers, so its time shows up on two paths
+        load_paths = [stack for stack in spins if "_load_module" in stack]
+        self.assertEqual(len(load_paths), 2)
+        self.assertTrue(any("_fake_az" in stack and "_parse_args" in stack for stack in load_paths))
+        self.assertAlmostEqual(sum(spins.values()) / 1e6, 0.05, delta=0.03)
+
+    def test_profile_path_may_contain_spaces(self):
+        profile = os.path.join(self.work_dir, "dir with spaces", "vm create.pstats")
+        with mock.patch("subprocess.run") as run:
+            _benchmark_cmd_run("vm create -n 'my vm'", timeout=5, profile=profile)
+
+        self.assertEqual(run.call_args[0][0][1:], ["-m", "cProfile", "-o", profile, "-m", "azure.cli",
+                                                   "vm", "create", "-n", "my vm"])
+        self.assertEqual(run.call_args[1]["timeout"], 5)
+
+    def test_benchmark_profiles_slowest(self):
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+
+        def _run(raw_command, timeout=None, profile=None):  # pylint: disable=unused-argument
+            self._profile(profile)
+
+        with mock.patch(
+            "azdev.operations.performance.result_store.get_azdev_config_dir", return_value=config_dir,
+        ), mock.patch(
+            "azdev.operations.performance.result_store.get_cli_commit", return_value="0123abcd",
+        ), mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            side_effect=lambda command, _: 2 if command == "vm create -h" else 1,
+        ), mock.patch(
+            "azdev.operations.performance._benchmark_cmd_run", side_effect=_run,
+        ) as run, mock.patch(
+            "multiprocessing.pool.Pool.apply_async",
+            _mocked_pool_apply_async,
+        ):
+            result = benchmark(commands=["version", "vm create -h"], runs=3, profile_slowest=1,
+                               profile_dir=self.work_dir)
+
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(run.call_args[0][0], "vm create -h")
+        self.assertEqual(result[1]["Profile"], os.path.join(self.work_dir, "vm_create_-h.pstats"))
+        with open(os.path.join(self.work_dir, "vm_create_-h.collapsed")) as f:
+            self.assertTrue(all(line.rsplit(" ", 1)[1].strip().isdigit() for line in f))
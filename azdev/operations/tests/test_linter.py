@@ -0,0 +1,385 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+from collections.abc import Mapping
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from types import ModuleType, SimpleNamespace
+from unittest import mock
+
+try:
+    from azdev.operations import linter as linter_module
+    from azdev.operations.linter import linter
+    from azdev.operations.linter.util import LoadedHelp
+    from azdev.operations.linter.verdict_cache import VerdictCache, package_salt, rule_fingerprint
+    from azdev.operations.linter import rule_decorators
+    from azdev.operations.linter import verdict_cache
+except Exception as ex:  # pylint: disable=broad-except
+    # the linter reads the test coverage config of the CLI repo from GitHub when it is imported
+    raise unittest.SkipTest('The linter can not be loaded: {}'.format(ex))
+
+# rules which only read the command table and help, not the parser of an installed CLI
+RULES = ['unrecognized_help_entry_rule', 'faulty_help_type_rule', 'unrecognized_help_parameter_rule',
+         'faulty_help_example_rule', 'faulty_help_example_parameters_rule', 'missing_command_help',
+         'no_ids_for_list_commands', 'expired_command', 'missing_group_help', 'expired_command_group',
+         'require_wait_command_if_no_wait', 'missing_parameter_help', 'expired_parameter', 'expired_option',
+         'bad_short_option', 'no_parameter_defaults_for_update_commands', 'option_length_too_long',
+         'option_should_not_contain_under_score']
+
+
+class _Deprecated:
+    def __init__(self, expired):
+        self._expired = expired
+
+    def expired(self):
+        return self._expired
+
+
+def _argument(options, help_text=None, **settings):
+    return SimpleNamespace(type=SimpleNamespace(settings=dict(settings, options_list=options, help=help_text)))
+
+
+def _linter_inputs():
+    """ (command loader, YAML help, loaded help) of a small command table with a few violations. """
+    command_table = {}
+    help_file_entries = {}
+    loaded_help = {}
+    for index, command in enumerate(['vm create', 'vm update', 'vm list', 'vm disk show', 'network vnet create']):
+        arguments = {
+            'name': _argument(['--name', '-n'], 'Name.'),
+            'resource_group_name': _argument(['--resource-group', '-g'], 'Resource group.'),
+            'extra_option': _argument(['--extra_option'], None),
+        }
+        command_table[command] = SimpleNamespace(arguments=arguments, deprecate_info=None,
+                                                 supports_no_wait=index == 0)
+        parameters = [SimpleNamespace(name='--name -n', short_summary='Name.', long_summary='')]
+        help_file_entries[command] = {
+            'type': 'command',
+            'short-summary': 'Command {}.'.format(index),
+            'parameters': [{'name': '--name -n', 'short-summary': 'Name.'}],
+            'examples': [{'name': 'Hybrid only', 'text': 'az {} -n x'.format(command),
+                          'supported-profiles': '2019-03-01-hybrid'}],
+        }
+        loaded_help[command] = SimpleNamespace(short_summary='Command {}.'.format(index), long_summary='',
+                                               parameters=parameters)
+    command_group_table = {group: SimpleNamespace(group_kwargs={}) for group in ['vm', 'vm disk', 'network vnet']}
+    for group in list(command_group_table) + ['network']:
+        help_file_entries[group] = {'type': 'group', 'short-summary': 'Group.'}
+        loaded_help[group] = SimpleNamespace(short_summary='Group.', long_summary='', parameters=[])
+    command_loader = SimpleNamespace(command_table=command_table, command_group_table=command_group_table,
+                                     cmd_to_loader_map={},
+                                     cli_ctx=SimpleNamespace(invocation=SimpleNamespace(parser=None)))
+    return command_loader, help_file_entries, loaded_help
+
+
+def _run_linter(inputs, **kwargs):
+    """ (exit code, output) of a linter run on `inputs`. """
+    command_loader, help_file_entries, loaded_help = inputs
+    manager = linter.LinterManager(command_loader=command_loader, help_file_entries=help_file_entries,
+                                   loaded_help=loaded_help, min_severity=linter.LinterSeverity.LOW,
+                                   use_ci_exclusions=False, rule_inclusions=RULES, **kwargs)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        exit_code = manager.run(run_params=True, run_commands=True, run_command_groups=True,
+                                run_help_files_entries=True)
+    return exit_code, output.getvalue()
+
+
+class _HelpParser:
+    def __init__(self, group):
+        self.choices = {} if group else None
+
+
+class _HelpFile:
+    loaded = []
+
+    def __init__(self, help_ctx, name, parser):  # pylint: disable=unused-argument
+        if name == 'vm broken':
+            raise ValueError('invalid help')
+        self.short_summary = name
+
+    def load(self, parser):  # pylint: disable=unused-argument
+        _HelpFile.loaded.append(self.short_summary)
+
+
+def _store_parsers(parser, parser_keys, parser_values, sub_parser_keys, sub_parser_values):  # pylint: disable=unused-argument
+    for name, group in [('', True), ('vm', True), ('vm create', False), ('vm broken', False), ('vm list', False)]:
+        (sub_parser_keys if name else parser_keys).append(name)
+        (sub_parser_values if name else parser_values).append(_HelpParser(group))
+
+
+def _azure_cli_core_modules():
+    """ Stand-ins of the azure-cli-core modules LoadedHelp loads help with. """
+    modules = {name: ModuleType(name) for name in ['azure', 'azure.cli', 'azure.cli.core',
+                                                   'azure.cli.core.file_util', 'azure.cli.core._help']}
+    modules['azure.cli.core.file_util']._store_parsers = _store_parsers  # pylint: disable=protected-access
+    modules['azure.cli.core.file_util']._is_group = lambda parser: parser.choices is not None  # pylint: disable=protected-access
+    modules['azure.cli.core._help'].CliCommandHelpFile = _HelpFile
+    modules['azure.cli.core._help'].CliGroupHelpFile = _HelpFile
+    return modules
+
+
+class TestLoadedHelp(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(sys.modules, _azure_cli_core_modules())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        _HelpFile.loaded = []
+        cli_ctx = SimpleNamespace(invocation=SimpleNamespace(parser=None),
+                                  help_cls=lambda cli_ctx: mock.MagicMock())
+        self.loaded_help = LoadedHelp(cli_ctx)
+
+    def test_only_read_entries_are_loaded(self):
+        self.assertEqual(_HelpFile.loaded, [])
+        self.assertIn('vm create', self.loaded_help)
+        self.assertEqual(self.loaded_help.get('vm create').short_summary, 'vm create')
+        self.assertEqual(self.loaded_help['vm create'].short_summary, 'vm create')
+        self.assertEqual(_HelpFile.loaded, ['vm create'])
+
+    def test_entries_failing_to_load_are_skipped(self):
+        with self.assertLogs('cli', 'WARNING') as logs:
+            self.assertIsNone(self.loaded_help.get('vm broken'))
+        self.assertIn("Skipping 'vm broken': invalid help", logs.output[0])
+        self.assertIsNone(self.loaded_help.get('vm broken'))
+        self.assertIsNone(self.loaded_help.get('vm unknown'))
+        self.assertNotIn('vm broken', self.loaded_help)
+        self.assertEqual(_HelpFile.loaded, [])
+
+    def test_entries_failing_to_load_are_left_out(self):
+        with self.assertLogs('cli', 'WARNING'):
+            loaded_help = dict(self.loaded_help)
+        self.assertEqual(sorted(loaded_help), ['vm', 'vm create', 'vm list'])
+        self.assertEqual(len(self.loaded_help), 3)
+        self.assertEqual(sorted(name for name, _ in self.loaded_help.items()), ['vm', 'vm create', 'vm list'])
+
+
+class _RecordedHelp(Mapping):
+    """ Loaded help which records the entries read. """
+
+    def __init__(self, loaded_help):
+        self._loaded_help = loaded_help
+        self.read = set()
+
+    def __getitem__(self, name):
+        self.read.add(name)
+        return self._loaded_help[name]
+
+    def __iter__(self):
+        return iter(self._loaded_help)
+
+    def __len__(self):
+        return len(self._loaded_help)
+
+
+class TestVerdictCache(unittest.TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.cache_path = os.path.join(cache_dir, 'linter_cache.db')
+        self.inputs = _linter_inputs()
+
+    def _run(self, inputs=None, salt=''):
+        cache = VerdictCache(self.cache_path, salt=salt)
+        exit_code, output = _run_linter(inputs or self.inputs, verdict_cache=cache, jobs=1)
+        return exit_code, output, cache
+
+    def test_warm_run_matches_cold_run(self):
+        cold_exit_code, cold_output = _run_linter(self.inputs, jobs=1)
+        exit_code, output, cache = self._run()
+        self.assertEqual((exit_code, output), (cold_exit_code, cold_output))
+        self.assertEqual(cache.hits, 0)
+
+        exit_code, output, cache = self._run()
+        self.assertEqual((exit_code, output), (cold_exit_code, cold_output))
+        self.assertGreater(cache.hits, 0)
+        self.assertEqual(cache.misses, 0)
+
+    def test_skipped_examples_are_logged_on_warm_runs(self):
+        for _ in range(2):
+            with self.assertLogs('cli', 'WARNING') as logs:
+                self._run()
+            self.assertEqual(sum('SKIPPING example: az vm list -n x' in line for line in logs.output), 1)
+
+    def test_changed_entities_are_evaluated_again(self):
+        violations = ['Parameter: vm update, `name`', 'Command: `vm list`', 'Command: `vm disk show`']
+        _, output, _ = self._run()
+        for violation in violations:
+            self.assertNotIn(violation, output)
+
+        command_loader, _, loaded_help = self.inputs
+        command_loader.command_table['vm update'].arguments['name'].type.settings['default'] = 'x'
+        command_loader.command_table['vm list'].deprecate_info = _Deprecated(expired=True)
+        loaded_help['vm disk show'].short_summary = ''
+        _, output, cache = self._run()
+
+        for violation in violations:
+            self.assertIn(violation, output)
+        cold_output = _run_linter(self.inputs, jobs=1)[1]
+        self.assertEqual(output, cold_output)
+        self.assertGreater(cache.misses, 0)
+        self.assertGreater(cache.hits, 0)
+
+    def test_other_core_version_evaluates_all_rules_again(self):
+        self._run(salt='2.60.0')
+        _, _, cache = self._run(salt='2.61.0')
+        self.assertEqual(cache.hits, 0)
+        _, _, cache = self._run(salt='2.61.0')
+        self.assertEqual(cache.misses, 0)
+
+    def test_rule_hash_changes_with_its_source(self):
+        rule_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, rule_dir)
+        rule_path = os.path.join(rule_dir, 'my_rules.py')
+
+        def _load_rule(source):
+            with open(rule_path, 'w') as f:
+                f.write(source)
+            namespace = {}
+            exec(compile(source, rule_path, 'exec'), namespace)  # pylint: disable=exec-used
+            verdict_cache._file_hash.cache_clear()  # pylint: disable=protected-access
+            return namespace['my_rule']
+
+        rule = _load_rule('def my_rule(linter, command_name):\n    pass\n')
+        rule_hash = rule_fingerprint(rule)
+        self.assertEqual(rule_fingerprint(_load_rule('def my_rule(linter, command_name):\n    pass\n')), rule_hash)
+        self.assertNotEqual(rule_fingerprint(rule, salt='2.61.0'), rule_hash)
+        changed_hash = rule_fingerprint(_load_rule('def my_rule(linter, command_name):\n    return None\n'))
+        self.assertNotEqual(changed_hash, rule_hash)
+
+        cache = VerdictCache(self.cache_path)
+        cache.put('my_rule', rule_hash, 'vm list', 'entity-hash', 'violation', [['cli.x', 30, 'warning']])
+        cache.save()
+        self.assertEqual(VerdictCache(self.cache_path).get('my_rule', rule_hash, 'vm list', 'entity-hash'),
+                         (True, 'violation', [['cli.x', 30, 'warning']]))
+        self.assertEqual(VerdictCache(self.cache_path).get('my_rule', changed_hash, 'vm list', 'entity-hash'),
+                         (False, None, []))
+        self.assertEqual(VerdictCache(self.cache_path).get('my_rule', rule_hash, 'vm list', 'other-hash'),
+                         (False, None, []))
+
+    def test_rule_hash_changes_with_the_modules_it_imports_from(self):
+        rule_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, rule_dir)
+        rule_path = os.path.join(rule_dir, 'my_rules.py')
+        source = ('from azdev.operations.linter.rule_decorators import CommandRule\n'
+                  'from azdev.utilities import display\n'
+                  'def my_rule(linter, command_name):\n    display(command_name)\n')
+        with open(rule_path, 'w') as f:
+            f.write(source)
+        namespace = {}
+        exec(compile(source, rule_path, 'exec'), namespace)  # pylint: disable=exec-used
+
+        with mock.patch.object(verdict_cache, '_file_hash', side_effect=lambda path: path) as file_hash:
+            rule_fingerprint(namespace['my_rule'])
+        hashed = [call[0][0] for call in file_hash.call_args_list]
+        for module in [rule_decorators, sys.modules['azdev.utilities.display'], linter]:
+            self.assertIn(module.__file__, hashed)
+        self.assertEqual(hashed[-1], rule_path)
+
+    def test_package_salt_changes_with_the_package_source(self):
+        package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, package_dir)
+        module_path = os.path.join(package_dir, 'parser.py')
+        package = SimpleNamespace(__file__=os.path.join(package_dir, '__init__.py'))
+        for path in [package.__file__, module_path]:
+            with open(path, 'w') as f:
+                f.write('')
+
+        salt = package_salt(package)
+        with open(module_path, 'w') as f:
+            f.write('CHANGED = True\n')
+        verdict_cache._file_hash.cache_clear()  # pylint: disable=protected-access
+        self.assertNotEqual(package_salt(package), salt)
+
+
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'The linter only forks workers on POSIX.')
+class TestParallelLinter(unittest.TestCase):
+
+    def setUp(self):
+        # fork workers for every rule group, however few checks it has
+        patcher = mock.patch.object(linter, 'MIN_PARALLEL_CHECKS', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.inputs = _linter_inputs()
+
+    def _run_in_workers(self, **kwargs):
+        with self.assertLogs('cli', 'INFO') as logs:
+            exit_code, output = _run_linter(self.inputs, jobs=4, **kwargs)
+        self.assertTrue(any('rules on 4 processes' in line for line in logs.output))
+        return exit_code, output
+
+    def test_workers_match_serial_run(self):
+        serial_exit_code, serial_output = _run_linter(self.inputs, jobs=1)
+        self.assertNotEqual(serial_exit_code, 0)
+        self.assertEqual(self._run_in_workers(), (serial_exit_code, serial_output))
+
+    def test_help_is_loaded_before_forking(self):
+        command_loader, help_file_entries, loaded_help = self.inputs
+        recorded_help = _RecordedHelp(loaded_help)
+        self.inputs = command_loader, help_file_entries, recorded_help
+        self._run_in_workers()
+        # the workers read the help, only what the parent loaded before forking them is recorded
+        self.assertEqual(recorded_help.read, set(loaded_help))
+
+    def test_workers_merge_verdict_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        cache_path = os.path.join(cache_dir, 'linter_cache.db')
+        serial_result = _run_linter(self.inputs, jobs=1)
+
+        cache = VerdictCache(cache_path)
+        self.assertEqual(self._run_in_workers(verdict_cache=cache), serial_result)
+        self.assertEqual(cache.hits, 0)
+        self.assertGreater(cache.misses, 0)
+
+        cache = VerdictCache(cache_path)
+        self.assertEqual(self._run_in_workers(verdict_cache=cache), serial_result)
+        self.assertGreater(cache.hits, 0)
+        self.assertEqual(cache.misses, 0)
+
+
+class TestRunLinter(unittest.TestCase):
+
+    def _run_linter(self, rule_types):
+        """ The loaded help a linter manager got from run_linter with `rule_types`. """
+        modules = _azure_cli_core_modules()
+        modules['azure.cli.core'].get_default_cli = mock.MagicMock
+        modules['azure.cli.core'].__version__ = '2.60.0'
+        modules['azure.cli.core.file_util'].create_invoker_and_load_cmds_and_args = mock.MagicMock()
+        command_loader = SimpleNamespace(command_table={'vm list': None})
+        path_table = {'mod': {}, 'core': {}, 'ext': {}}
+        with mock.patch.dict(sys.modules, modules), \
+                mock.patch.multiple(linter_module, require_azure_cli=mock.DEFAULT, get_cli_repo_path=mock.DEFAULT,
+                                    get_ext_repo_paths=mock.DEFAULT, LoadedHelp=mock.DEFAULT,
+                                    LinterManager=mock.DEFAULT, get_path_table=mock.Mock(return_value=path_table),
+                                    filter_by_git_diff=mock.Mock(return_value=path_table),
+                                    filter_modules=mock.Mock(return_value=(command_loader, {})),
+                                    pylint_rules=mock.Mock(return_value=0)) as mocks, \
+                mock.patch('os.path.isfile', return_value=False), self.assertRaises(SystemExit), \
+                contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            mocks['LinterManager'].return_value.run.return_value = 0
+            linter_module.run_linter(rule_types=rule_types, no_cache=True)
+        return mocks['LinterManager'].call_args[1]['loaded_help'], mocks['LoadedHelp']
+
+    def test_command_test_coverage_loads_no_help(self):
+        loaded_help, loaded_help_cls = self._run_linter(['command_test_coverage'])
+        self.assertEqual(loaded_help, {})
+        loaded_help_cls.assert_not_called()
+
+    def test_commands_load_help(self):
+        loaded_help, loaded_help_cls = self._run_linter(['commands'])
+        self.assertIs(loaded_help, loaded_help_cls.return_value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import stat
+import tempfile
+from unittest import mock, TestCase
+
+from ..performance import (
+    TOTAL,
+    _parse_import_time,
+    _parse_load_times,
+    _run_load_times_parallel,
+    _summarize_import_time,
+)
+
+LOAD_TIME_OUTPUT = """DEBUG: cli.knack.cli: Command arguments: ['-h', '--debug']
+DEBUG: Loaded module 'vm' in 0.020 seconds.
+DEBUG: Loaded module 'network' in 0.010 seconds.
+DEBUG: cli.azure.cli.core: Loaded all modules in 0.031 seconds.
+"""
+
+IMPORT_TIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   msrest.serialization
+import time:       300 |        400 | msrest
+DEBUG: some unrelated output
+import time:        50 |         50 |     azure.mgmt.compute.models
+import time:        20 |         70 |   azure.mgmt.compute
+import time:        10 |         10 |   azure.cli.core.commands
+import time:        30 |        110 | azure.cli.command_modules.vm
+import time:         5 |          5 |     msrestazure.tools
+import time:        15 |         20 |   azure.cli.command_modules.vm._validators
+import time:        40 |         60 | azext_alias
+"""
+
+
+class TestImportTime(TestCase):
+    def test_parse_import_tree(self):
+        roots = _parse_import_time(IMPORT_TIME_OUTPUT.splitlines())
+
+        self.assertEqual([r['name'] for r in roots], ['msrest', 'azure.cli.command_modules.vm', 'azext_alias'])
+        self.assertEqual([c['name'] for c in roots[0]['children']], ['msrest.serialization'])
+        vm = roots[1]
+        self.assertEqual(vm['cumulative'], 110)
+        self.assertEqual([c['name'] for c in vm['children']], ['azure.mgmt.compute', 'azure.cli.core.commands'])
+        self.assertEqual(vm['children'][0]['children'][0]['name'], 'azure.mgmt.compute.models')
+
+    def test_summarize_by_module(self):
+        mods, imports = _summarize_import_time(_parse_import_time(IMPORT_TIME_OUTPUT.splitlines()))
+
+        # msrest was imported outside of any command module, so nobody is charged for it
+        self.assertEqual(mods, {'vm': 110, 'azext_alias': 60})
+        self.assertEqual(imports, {'vm': {'azure.mgmt.compute': 70}, 'azext_alias': {'msrestazure.tools': 5}})
+
+
+class TestLoadTime(TestCase):
+    def test_parse_load_times(self):
+        result = _parse_load_times(LOAD_TIME_OUTPUT)
+
+        self.assertEqual(set(result), {'vm', 'network', TOTAL})
+        self.assertAlmostEqual(result['vm'], 20)
+        self.assertAlmostEqual(result[TOTAL], 30)
+
+    def test_parse_load_times_of_module_logged_twice(self):
+        result = _parse_load_times(LOAD_TIME_OUTPUT + "DEBUG: Loaded module 'vm' in 0.005 seconds.\n")
+
+        self.assertAlmostEqual(result['vm'], 25)
+        self.assertAlmostEqual(result[TOTAL], sum(v for k, v in result.items() if k != TOTAL))
+
+    def test_parallel_runs(self):
+        if not hasattr(os, 'sched_setaffinity'):
+            self.skipTest('CPU affinity is not supported on this platform')
+
+        # a fake `az` on the PATH which prints the debug lines check_load_time looks for
+        bin_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, bin_dir)
+        fake_az = os.path.join(bin_dir, 'az')
+        with open(fake_az, 'w') as f:
+            f.write('#!/bin/sh\ncat <<EOF\n{}EOF\n'.format(LOAD_TIME_OUTPUT))
+        os.chmod(fake_az, os.stat(fake_az).st_mode | stat.S_IEXEC)
+
+        with mock.patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']}):
+            run_results = _run_load_times_parallel(4)
+
+        self.assertEqual(len(run_results), 4)
+        for result in run_results:
+            self.assertAlmostEqual(result['network'], 10)
@@ -0,0 +1,91 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from unittest import mock, TestCase
+
+from ..performance import _memory_probe, _memory_probe_run, memory, MEMORY_KIND, MEMORY_MODULES_KIND
+from ..performance._memory_probe import _owner
+from ..performance.result_store import ResultStore
+
+_Frame = namedtuple('_Frame', 'filename lineno')
+
+
+class TestMemoryProbe(TestCase):
+    def test_owner_is_closest_module_on_stack(self):
+        stack = [
+            _Frame('/env/lib/azure/cli/core/commands/__init__.py', 10),
+            _Frame('/cli/src/azure-cli/azure/cli/command_modules/vm/commands.py', 20),
+            _Frame('/cli/src/azure-cli/azure/cli/command_modules/network/_params.py', 30),
+            _Frame('/env/lib/knack/arguments.py', 40),
+        ]
+        self.assertEqual(_owner(stack), 'network')
+        self.assertEqual(_owner(stack[:2]), 'vm')
+        self.assertEqual(_owner([_Frame('/ext/azext_aks_preview/_params.py', 1)]), 'azext_aks_preview')
+        self.assertEqual(_owner(stack[:1]), _memory_probe.CORE)
+
+    def test_probe_reports_traced_memory(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        output = os.path.join(work_dir, 'probe.json')
+
+        hoard = []
+        with mock.patch.object(_memory_probe, '_run', side_effect=lambda _: hoard.append(bytearray(4 * 1024 ** 2))):
+            _memory_probe.main([output, _memory_probe.TRACE, _memory_probe.COMMAND_TABLE])
+
+        with open(output) as f:
+            result = json.load(f)
+        self.assertGreaterEqual(result['traced_peak_kb'], 4 * 1024)
+        self.assertGreaterEqual(result['modules'][_memory_probe.CORE], 4 * 1024 ** 2)
+        self.assertIn('test_memory.py:', result['top'][0][0])
+        if os.name == 'posix':
+            self.assertGreater(result['peak_rss_kb'], 0)
+
+    def test_probe_paths_may_contain_spaces(self):
+        work_dir = os.path.join(tempfile.mkdtemp(), 'dir with spaces')
+        self.addCleanup(shutil.rmtree, os.path.dirname(work_dir))
+        os.makedirs(work_dir)
+        probe_path = os.path.join(work_dir, 'probe script.py')
+        with open(probe_path, 'w') as f:
+            f.write('import json, sys\nwith open(sys.argv[1], "w") as f:\n    json.dump(sys.argv[2:], f)\n')
+
+        with mock.patch.object(_memory_probe, '__file__', probe_path):
+            self.assertEqual(_memory_probe_run(work_dir, ['vm', 'create', '--help']), ['vm', 'create', '--help'])
+
+
+class TestMemory(TestCase):
+    def setUp(self):
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        for target, value in [("get_azdev_config_dir", config_dir), ("get_cli_commit", "0123abcd")]:
+            patcher = mock.patch("azdev.operations.performance.result_store." + target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_memory_stores_rss_and_modules(self):
+        def _probe(_, args):
+            if _memory_probe.TRACE in args:
+                return {'traced_peak_kb': 2048, 'top': [['core.py:1', 1024]],
+                        'modules': {'core': 1024 ** 2, 'vm': 2 * 1024 ** 2}}
+            return {'peak_rss_kb': 100 * 1024 if args == [_memory_probe.COMMAND_TABLE] else 50 * 1024}
+
+        with mock.patch('azdev.operations.performance._memory_probe_run', side_effect=_probe) as probe, \
+                mock.patch('azdev.operations.performance.require_azure_cli'):
+            memory(commands=['vm create'], runs=2)
+
+        self.assertEqual(probe.call_count, 8)
+        self.assertIn(['vm', 'create', '--help'], [c[0][1] for c in probe.call_args_list])
+
+        store = ResultStore()
+        self.assertEqual(store.get(MEMORY_KIND, '0123abcd'), {
+            'command table': [100 * 1024] * 2,
+            'vm create --help': [50 * 1024] * 2,
+        })
+        self.assertEqual(store.get(MEMORY_MODULES_KIND, '0123abcd')['command table: vm'], [2048, 2048])
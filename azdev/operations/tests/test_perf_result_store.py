@@ -0,0 +1,92 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import shutil
+import tempfile
+from unittest import mock, TestCase
+
+from knack.util import CLIError
+
+from ..performance import compare, mann_whitney_u, median
+from ..performance.result_store import ResultStore
+
+
+class TestMannWhitneyU(TestCase):
+    def test_median(self):
+        self.assertEqual(median([3, 1, 2]), 2)
+        self.assertEqual(median([4, 1, 2, 3]), 2.5)
+
+    def test_clearly_slower(self):
+        base = [1.0, 1.1, 0.9, 1.05, 0.95, 1.02, 0.98, 1.01]
+        slower = [x + 0.5 for x in base]
+        self.assertLess(mann_whitney_u(base, slower), 0.01)
+        self.assertGreater(mann_whitney_u(slower, base), 0.99)
+
+    def test_same_distribution(self):
+        base = [1.0, 1.1, 0.9, 1.05, 0.95, 1.02, 0.98, 1.01]
+        self.assertGreater(mann_whitney_u(base, list(reversed(base))), 0.4)
+
+    def test_all_equal(self):
+        self.assertEqual(mann_whitney_u([1, 1, 1], [1, 1]), 1.0)
+
+
+class TestResultStoreCompare(TestCase):
+    def setUp(self):
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        for target, value in [("get_azdev_config_dir", config_dir), ("get_cli_commit", "0123abcd")]:
+            patcher = mock.patch("azdev.operations.performance.result_store." + target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.store = ResultStore()
+
+    def test_store_roundtrip(self):
+        self.store.add('benchmark', 'version', [1.0, 2.0], commit='aaa111')
+        self.store.add('benchmark', 'version', [3.0], commit='aaa111')
+        self.store.add('benchmark', 'version', [9.0], commit='bbb222')
+        self.store.add('benchmark', 'version', [9.0], commit='aaa111', machine='other')
+
+        self.assertEqual(self.store.get('benchmark', 'aaa'), {'version': [1.0, 2.0, 3.0]})
+        self.assertEqual(self.store.get('load-times', 'aaa'), {})
+        self.assertEqual({b['Commit'] for b in self.store.list_baselines('benchmark')}, {'aaa111', 'bbb222'})
+
+    def test_ambiguous_commit(self):
+        self.store.add('benchmark', 'version', [1.0], commit='abc1')
+        self.store.add('benchmark', 'version', [1.0], commit='abc2')
+        with self.assertRaisesRegex(CLIError, 'ambiguous'):
+            self.store.get('benchmark', 'abc')
+
+    def test_compare_detects_regression(self):
+        base = [1.0, 1.1, 0.9, 1.05, 0.95, 1.02, 0.98, 1.01]
+        self.store.add('benchmark', 'version', base, commit='base')
+        self.store.add('benchmark', 'group list', base, commit='base')
+        self.store.add('benchmark', 'version', base, commit='target')
+        self.store.add('benchmark', 'group list', [x * 2 for x in base], commit='target')
+
+        with self.assertRaisesRegex(CLIError, 'group list'):
+            compare(base='base', target='target')
+
+    def test_compare_passes_on_noise(self):
+        base = [1.0, 1.1, 0.9, 1.05, 0.95, 1.02, 0.98, 1.01]
+        self.store.add('benchmark', 'version', base, commit='base')
+        self.store.add('benchmark', 'version', [x * 1.01 for x in base], commit='target')
+
+        compare(base='base', target='target')
+
+    def test_compare_without_baselines(self):
+        with self.assertRaisesRegex(CLIError, 'No'):
+            compare()
+
+    def test_compare_unknown_baseline(self):
+        self.store.add('benchmark', 'version', [1.0, 1.1], commit='base')
+        with self.assertRaisesRegex(CLIError, "baseline 'typo'"):
+            compare(base='base', target='typo')
+
+    def test_compare_without_common_results(self):
+        self.store.add('benchmark', 'version', [1.0, 1.1], commit='base')
+        self.store.add('benchmark', 'group list', [1.0, 1.1], commit='target')
+        with self.assertRaisesRegex(CLIError, 'in common'):
+            compare(base='base', target='target')
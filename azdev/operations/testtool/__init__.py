@@ -4,13 +4,20 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import glob
+import hashlib
 from importlib import import_module
 import json
 import os
 import re
+import shutil
+import sqlite3
 from subprocess import CalledProcessError
 import sys
+import tempfile
+import time
+import timeit
 
 from knack.log import get_logger
 from knack.util import CLIError
@@ -22,21 +29,35 @@ from azdev.utilities import (
     COMMAND_MODULE_PREFIX, EXTENSION_PREFIX,
     make_dirs, get_azdev_config_dir,
     get_path_table, require_virtual_env, get_name_index)
-from .pytest_runner import get_test_runner
-from .profile_context import ProfileContext, current_profile
+from .pytest_runner import get_test_runner, ISOLATION_TEST, ISOLATION_FILE
+from .profile_context import ProfileContext, current_profile, copy_config_dir
 from .incremental_strategy import CLIAzureDevOpsContext
+from . import ast_discovery, impact, ordering, sharding
+from .timing_store import TimingStore, read_junit, FAILED, SKIPPED
 
 logger = get_logger(__name__)
 
+# bump when the layout of the test file records changes, to force a full discovery
+TEST_FILE_CACHE_VERSION = 1
 
-# pylint: disable=too-many-statements,too-many-locals
+IMPORT_BACKEND = 'import'
+AST_BACKEND = 'ast'
+# number of the slowest modules to show after a discovery
+DISCOVERY_TIMES_SHOWN = 5
+
+
+# pylint: disable=too-many-statements,too-many-locals,too-many-branches
 def run_tests(tests, xml_path=None, discover=False, in_series=False,
               run_live=False, profile=None, last_failed=False, pytest_args=None,
               no_exit_first=False, mark=None,
               git_source=None, git_target=None, git_repo=None,
-              cli_ci=False):
+              cli_ci=False, discovery_backend=IMPORT_BACKEND, record_impact=False, impacted=False,
+              shard=None, durations_from=None, order=None, isolation=None, profiles=None):
 
     require_virtual_env()
+    shard_index, shard_count = sharding.parse_shard(shard) if shard else (None, None)
+    isolation = _resolve_isolation(isolation, run_live, record_impact)
+    profiles = _parse_profiles(profiles, profile, record_impact)
 
     DEFAULT_RESULT_FILE = 'test_results.xml'
     DEFAULT_RESULT_PATH = os.path.join(get_azdev_config_dir(), DEFAULT_RESULT_FILE)
@@ -45,8 +66,6 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
 
     path_table = get_path_table()
 
-    test_index = _get_test_index(profile or current_profile(), discover)
-
     if not tests:
         tests = list(path_table['mod'].keys()) + list(path_table['core'].keys()) + list(path_table['ext'].keys())
     if tests == ['CLI']:
@@ -54,15 +73,6 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
     elif tests == ['EXT']:
         tests = list(path_table['ext'].keys())
 
-    # filter out tests whose modules haven't changed
-    modified_mods = _filter_by_git_diff(tests, test_index, git_source, git_target, git_repo)
-    if modified_mods:
-        display('\nTest on modules: {}\n'.format(', '.join(modified_mods)))
-
-    if cli_ci is True:
-        ctx = CLIAzureDevOpsContext(git_repo, git_source, git_target)
-        modified_mods = ctx.filter(test_index)
-
     # resolve the path at which to dump the XML results
     xml_path = xml_path or DEFAULT_RESULT_PATH
     if not xml_path.endswith('.xml'):
@@ -90,15 +100,80 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
                 continue
         raise key_error
 
-    # lookup test paths from index
-    test_paths = []
-    for t in modified_mods:
-        try:
-            test_path = os.path.normpath(_find_test(test_index, t))
-            test_paths.append(test_path)
-        except KeyError:
-            logger.warning("'%s' not found. If newly added, re-run with --discover", t)
-            continue
+    def _select_test_paths(profile):
+        """ The test index of a profile and the paths of the tests to run from it, in the order to run them. """
+        test_index = _get_test_index(profile, discover, discovery_backend)
+
+        # filter out tests whose modules haven't changed. With --impacted, a change can select tests of any module.
+        if impacted:
+            modified_mods = tests
+        else:
+            modified_mods = _filter_by_git_diff(tests, test_index, git_source, git_target, git_repo)
+        if modified_mods:
+            display('\nTest on modules: {}\n'.format(', '.join(modified_mods)))
+
+        if cli_ci is True:
+            ctx = CLIAzureDevOpsContext(git_repo, git_source, git_target)
+            modified_mods = ctx.filter(test_index)
+
+        # lookup test paths from index
+        test_paths = []
+        for t in modified_mods:
+            try:
+                test_path = os.path.normpath(_find_test(test_index, t))
+                test_paths.append(test_path)
+            except KeyError:
+                logger.warning("'%s' not found.", t)
+                continue
+
+        if impacted:
+            test_paths = _filter_by_impact(test_paths, test_index, profile, git_source, git_target, git_repo)
+
+        if shard:
+            if durations_from:
+                durations = sharding.read_durations(durations_from)
+            else:
+                # the timings recorded on this machine differ between agents, which would make their shards overlap
+                logger.warning('No --durations-from given, the shards are balanced by the number of tests only.')
+                durations = {}
+            test_paths, loads = sharding.shard_test_paths(test_paths, test_index, (shard_index, shard_count),
+                                                          durations)
+            display('Running shard {} of {}: {} test files, expected {:.0f}s. Expected shard times: {}\n'.format(
+                shard_index, shard_count, len(test_paths), loads[shard_index - 1],
+                ', '.join('{:.0f}s'.format(t) for t in loads)))
+
+        if order:
+            test_paths = ordering.order_test_paths(test_paths, test_index, order, TimingStore())
+            logger.info('Test files in order: %s', test_paths)
+
+        if isolation == ISOLATION_FILE:
+            test_paths = list(sharding.expand_test_paths(test_paths, test_index))
+        return test_index, test_paths
+
+    if profiles:
+        # every profile has tests of its own, in a folder of its own
+        profile_test_paths = {}
+        for name in profiles:
+            display('Profile: {}'.format(name))
+            profile_test_paths[name] = _select_test_paths(name)[1]
+            if not profile_test_paths[name]:
+                logger.warning('No tests selected to run against profile %s.', name)
+        profiles = [name for name in profiles if profile_test_paths[name]]
+        if not profiles:
+            sys.exit(0)
+        runner_kwargs = {
+            'parallel': not in_series,
+            'last_failed': last_failed,
+            'no_exit_first': no_exit_first,
+            'mark': mark,
+            'ordered': bool(order),
+            'isolation': isolation,
+        }
+        exit_code = _run_profiles(profiles, profile_test_paths, pytest_args, xml_path, runner_kwargs)
+        sys.exit(0 if not exit_code else 1)
+
+    profile = profile or current_profile()
+    test_index, test_paths = _select_test_paths(profile)
 
     exit_code = 0
 
@@ -107,14 +182,39 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
         logger.warning('No tests selected to run.')
         sys.exit(exit_code)
 
+    coverage_args = None
+    if record_impact:
+        coverage_args = impact.coverage_pytest_args(_impact_source_dirs())
+        coverage_file = os.path.join(impact.get_impact_dir(get_azdev_config_dir()), impact.COVERAGE_FILE)
+        make_dirs(os.path.dirname(coverage_file))
+        if os.path.isfile(coverage_file):
+            os.remove(coverage_file)
+        os.environ['COVERAGE_FILE'] = coverage_file
+
     exit_code = 0
+    started = time.time()
     with ProfileContext(profile):
         runner = get_test_runner(parallel=not in_series,
                                  log_path=xml_path,
                                  last_failed=last_failed,
                                  no_exit_first=no_exit_first,
-                                 mark=mark)
+                                 mark=mark,
+                                 coverage_args=coverage_args,
+                                 ordered=bool(order),
+                                 isolation=isolation)
         exit_code = runner(test_paths=test_paths, pytest_args=pytest_args)
+    wall_time = time.time() - started
+    display('\nWall time: {:.1f}s with test isolation per {}.'.format(wall_time, isolation))
+
+    _record_timings(xml_path, started, isolation, wall_time)
+
+    if record_impact:
+        impact_index_path = impact.get_impact_index_path(get_azdev_config_dir(), profile)
+        if os.path.isfile(coverage_file):
+            recorded = impact.record_impact(coverage_file, impact_index_path, test_index)
+            display('\nRecorded the files executed by {} tests: {}'.format(len(recorded), impact_index_path))
+        else:
+            logger.warning('No coverage data was written, the test impact index was not updated.')
 
     sys.exit(0 if not exit_code else 1)
 
@@ -151,64 +251,281 @@ def _filter_by_git_diff(tests, test_index, git_source, git_target, git_repo):
     return tests
 
 
-def _discover_module_tests(mod_name, mod_data):
+def _test_file_record(file_path, cached):
+    """ Size, mtime and content hash of a test file, plus the cached classes if the file did not change since. """
+    stat = os.stat(file_path)
+    record = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+    if not cached or cached.get('import_error'):
+        cached = None
+    elif cached['mtime'] == record['mtime'] and cached['size'] == record['size']:
+        record.update(hash=cached['hash'], classes=cached['classes'])
+        return record
+
+    with open(file_path, 'rb') as f:
+        record['hash'] = hashlib.sha1(f.read()).hexdigest()
+    if cached and cached['hash'] == record['hash']:
+        # touched, but not changed
+        record['classes'] = cached['classes']
+    return record
+
+
+def _resolve_isolation(isolation, run_live, record_impact):
+    if run_live and isolation not in (None, ISOLATION_TEST):
+        # live tests create real resources and may leave global state behind, they stay forked
+        logger.warning('Live tests are always isolated per test, ignoring --isolation %s.', isolation)
+        return ISOLATION_TEST
+    if record_impact and isolation == ISOLATION_FILE:
+        raise CLIError('usage error: --record-impact can not be combined with --isolation file.')
+    return isolation or ISOLATION_TEST
+
+
+def _parse_profiles(profiles, profile, record_impact):
+    if not profiles:
+        return None
+    if profile:
+        raise CLIError('usage error: --profile NAME | --profiles NAME,NAME')
+    if record_impact:
+        raise CLIError('usage error: --record-impact can not be combined with --profiles.')
+    return list(dict.fromkeys(p.strip() for p in profiles.split(',') if p.strip()))
+
+
+def _run_profiles(profiles, test_paths, pytest_args, xml_path, runner_kwargs):
+    """ Runs the tests against all profiles at the same time, each with a copy of the Azure CLI config dir that is
+    set to the profile, and shows a combined summary. `test_paths` are the paths of the tests of every profile, by
+    profile. In parallel, the profiles share the CPUs rather than each starting a worker per CPU. Returns the exit
+    code of the first profile that failed. """
+    base_path, ext = os.path.splitext(xml_path)
+    if runner_kwargs.get('parallel'):
+        runner_kwargs = dict(runner_kwargs, workers=max(1, (os.cpu_count() or 1) // len(profiles)))
+    config_root = tempfile.mkdtemp(prefix='azdev_profiles_')
+    try:
+        runs = []
+        for profile in profiles:
+            config_dir = os.path.join(config_root, profile)
+            copy_config_dir(profile, config_dir)
+            env = dict(os.environ, AZURE_CONFIG_DIR=config_dir)
+            runs.append((profile, '{}.{}{}'.format(base_path, profile, ext), env))
+        display('Running the tests against profiles {} at the same time.\n'.format(', '.join(profiles)))
+
+        def _run(run):
+            profile, log_path, env = run
+            started = time.time()
+            runner = get_test_runner(log_path=log_path, env=env, **runner_kwargs)
+            return runner(test_paths=test_paths[profile], pytest_args=pytest_args), started, time.time() - started
+
+        with ThreadPoolExecutor(len(runs)) as executor:
+            results = list(executor.map(_run, runs))
+    finally:
+        shutil.rmtree(config_root, ignore_errors=True)
+
+    subheading('Profile Summary')
+    display('{:<20} {:>7} {:>7} {:>8} {:>10}  {}'.format('Profile', 'Tests', 'Failed', 'Skipped', 'Wall', 'Results'))
+    for (profile, log_path, _), (exit_code, started, wall_time) in zip(runs, results):
+        _record_timings(log_path, started, runner_kwargs['isolation'], wall_time)
+        try:
+            outcomes = [case[3] for case in read_junit(log_path)] if os.path.getmtime(log_path) >= started else []
+        except (OSError, CLIError):
+            outcomes = []
+        display('{:<20} {:>7} {:>7} {:>8} {:>9.1f}s  {}'.format(
+            profile, len(outcomes), outcomes.count(FAILED), outcomes.count(SKIPPED), wall_time, log_path))
+        if exit_code and not outcomes.count(FAILED):
+            logger.warning('pytest exited with code %d for profile %s.', exit_code, profile)
+    return next((exit_code for exit_code, _, _ in results if exit_code), 0)
+
+
+def _record_timings(xml_path, started, isolation, wall_time):
+    """ Adds the junit results of the run that started at `started` to the timing store. """
+    # pytest may have died before writing the results, leaving the ones of an earlier run in place
+    if not os.path.isfile(xml_path) or os.path.getmtime(xml_path) < started:
+        logger.warning("No test results written to '%s', the test timings were not recorded.", xml_path)
+        return
+    try:
+        count = TimingStore().add_junit(xml_path, isolation=isolation, wall_time=wall_time)
+    except (CLIError, sqlite3.Error) as ex:
+        logger.warning('Unable to record the test timings: %s', ex)
+        return
+    logger.info('Recorded the timings of %d tests.', count)
+
+
+def test_stats(top=10):
+    """ Show the slowest tests and modules, flaky tests and duration changes recorded by `azdev test`. """
+    store = TimingStore()
+    runs = store.recent_runs(top)
+    if not runs:
+        raise CLIError('No test runs recorded yet. Test timings are recorded by every `azdev test` run.')
+
+    heading('Test Statistics')
+
+    subheading('Recent Runs')
+    display('{:<20} {:<12} {:>8} {:>12} {:>9}'.format('Date', 'Commit', 'Tests', 'Duration', 'Failures'))
+    for created, commit, count, duration, failures in runs:
+        display('{:<20} {:<12} {:>8} {:>11.1f}s {:>9}'.format(
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)), commit[:12], count, duration, failures))
+
+    subheading('Wall Time by Isolation Level')
+    levels = store.isolation_levels()
+    baseline = next((per_test for level, _, _, per_test in levels if level == ISOLATION_TEST), None)
+    display('{:<10} {:>6} {:>12} {:>14} {:>22}'.format(
+        'Isolation', 'Runs', 'Tests/Run', 'Wall/Test', 'Saved vs Per-Test'))
+    for level, count, tests, per_test in levels:
+        saved = '{:>21.1f}s'.format((baseline - per_test) * tests) if baseline is not None else '{:>22}'.format('-')
+        display('{:<10} {:>6} {:>12.0f} {:>13.3f}s {}'.format(level, count, tests, per_test, saved))
+
+    subheading('Slowest Tests')
+    display('{:<90} {:>10} {:>6}'.format('Test', 'Mean', 'Runs'))
+    for test, duration, count in store.slowest_tests(top):
+        display('{:<90} {:>9.2f}s {:>6}'.format(test, duration, count))
+
+    subheading('Slowest Modules')
+    display('{:<40} {:>10} {:>6}'.format('Module', 'Mean', 'Runs'))
+    for module, duration, count in store.slowest_modules(top):
+        display('{:<40} {:>9.1f}s {:>6}'.format(module, duration, count))
+
+    subheading('Flaky Tests')
+    flaky = store.flaky_tests(top)
+    if not flaky:
+        display('No test both passed and failed at the same commit.')
+    else:
+        display('{:<90} {:>8} {:>8}'.format('Test', 'Passed', 'Failed'))
+        for test, passes, failures in flaky:
+            display('{:<90} {:>8} {:>8}'.format(test, passes, failures))
+
+    subheading('Largest Duration Changes')
+    changes = store.duration_changes(top)
+    if not changes:
+        display('Not enough runs of the same tests yet.')
+    else:
+        display('{:<90} {:>10} {:>10} {:>9}'.format('Test', 'Before', 'Latest', 'Change'))
+        for test, before, latest, change in changes:
+            display('{:<90} {:>9.2f}s {:>9.2f}s {:>8.0%}'.format(test, before, latest, change))
+
+
+def _filter_by_impact(test_paths, test_index, profile, git_source, git_target, git_repo):
+    """ Narrows the selected tests down to those impacted by the changes between two branches. """
+    from azdev.utilities import diff_branches
+
+    if not all([git_target, git_repo]):
+        raise CLIError('usage error: --impacted [--src NAME] --tgt NAME --repo PATH')
+
+    impact_index_path = impact.get_impact_index_path(get_azdev_config_dir(), profile)
+    impact_index = impact.load_impact_index(impact_index_path)
+    if impact_index is None:
+        raise CLIError("No test impact index found at '{}'. Record one with `azdev test --record-impact` "
+                       "first.".format(impact_index_path))
+
+    repo_path = os.path.abspath(git_repo)
+    changed_files = [os.path.join(repo_path, f) for f in diff_branches(git_repo, git_target, git_source)]
+    impacted_tests = impact.select_impacted_tests(impact_index, changed_files, test_index)
+
+    def _is_selected(test_path):
+        test_path = os.path.normcase(test_path)
+        for selected in test_paths:
+            selected = os.path.normcase(selected)
+            if test_path == selected or test_path.startswith((selected + '::', selected + os.sep)):
+                return True
+        return False
+
+    test_paths = [t for t in impacted_tests if _is_selected(t)]
+    display('\n{} tests are impacted by {} changed files.\n'.format(len(test_paths), len(changed_files)))
+    return test_paths
+
+
+def _impact_source_dirs():
+    """ The repos whose files are recorded by --record-impact. """
+    from azdev.utilities import get_cli_repo_path, get_ext_repo_paths
+
+    source_dirs = [get_cli_repo_path()]
+    try:
+        source_dirs += get_ext_repo_paths()
+    except CLIError:
+        pass
+    return [d for d in source_dirs if d and d != '_NONE_']
+
+
+def _discover_module_tests(mod_name, mod_data, cached_files=None):
+    """ Collects the test classes of every test file of a module into mod_data['files'] and a record of each file
+        into mod_data['file_records']. Files whose record in `cached_files` is still up to date are not imported.
+    """
 
     # get the list of test files in each module
     total_tests = 0
     total_files = 0
+    imported_files = 0
     logger.info('Mod: %s', mod_name)
     try:
         contents = os.listdir(mod_data['filepath'])
-        test_files = {
-            x[:-len('.py')]: {} for x in contents if x.startswith('test_') and x.endswith('.py')
-        }
+        test_files = sorted(x[:-len('.py')] for x in contents if x.startswith('test_') and x.endswith('.py'))
         total_files = len(test_files)
     except FileNotFoundError:
         logger.info('  No test files found.')
         return None
 
+    cached_files = cached_files or {}
+    mod_data['file_records'] = {}
     for file_name in test_files:
-        mod_data['files'][file_name] = {}
-        test_file_path = mod_data['base_path'] + '.' + file_name
+        record = _test_file_record(os.path.join(mod_data['filepath'], file_name + '.py'), cached_files.get(file_name))
+        if 'classes' not in record:
+            imported_files += 1
+            record['classes'] = _import_test_classes(mod_data['base_path'] + '.' + file_name)
+            if record['classes'] is None:
+                record.update(classes={}, import_error=True)
+        mod_data['files'][file_name] = record['classes']
+        mod_data['file_records'][file_name] = record
+        total_tests += sum(len(tests) for tests in record['classes'].values())
+    logger.info('  %s tests found in %s files, %s of them imported.', total_tests, total_files, imported_files)
+    return mod_data
+
+
+def _import_test_classes(test_file_path):
+    """ Imports a test file and returns {class name: [test names]}, or None if it can't be imported. """
+    try:
+        module = import_module(test_file_path)
+    except ImportError as ex:
+        logger.info('    %s', ex)
+        return None
+    classes = {}
+    module_dict = module.__dict__
+    possible_test_classes = {x: y for x, y in module_dict.items() if not x.startswith('_')}
+    for class_name, class_def in possible_test_classes.items():
         try:
-            module = import_module(test_file_path)
-        except ImportError as ex:
-            logger.info('    %s', ex)
+            class_dict = class_def.__dict__
+        except AttributeError:
+            # skip non-class symbols in files like constants, imported methods, etc.
             continue
-        module_dict = module.__dict__
-        possible_test_classes = {x: y for x, y in module_dict.items() if not x.startswith('_')}
-        for class_name, class_def in possible_test_classes.items():
-            try:
-                class_dict = class_def.__dict__
-            except AttributeError:
-                # skip non-class symbols in files like constants, imported methods, etc.
-                continue
-            if class_dict.get('__module__') == test_file_path:
-                tests = [x for x in class_def.__dict__ if x.startswith('test_')]
-                if tests:
-                    mod_data['files'][file_name][class_name] = tests
-                total_tests += len(tests)
-    logger.info('  %s tests found in %s files.', total_tests, total_files)
-    return mod_data
+        if class_dict.get('__module__') == test_file_path:
+            tests = [x for x in class_def.__dict__ if x.startswith('test_')]
+            if tests:
+                classes[class_name] = tests
+    return classes
 
 
-# pylint: disable=too-many-statements, too-many-locals
-def _discover_tests(profile):
+def _discover_tests(profile, file_cache=None, backend=IMPORT_BACKEND):
     """ Builds an index of tests so that the user can simply supply the name they wish to test instead of the
         full path.
+
+        `file_cache` maps each tests directory to the records of its test files from an earlier discovery. Files
+        that did not change since are not imported again, and the dict is updated in place to the current tree.
+        Modules are discovered on a process pool. With the 'ast' `backend` test files are parsed instead of being
+        imported.
     """
+    heading('Discovering Tests')
+    module_data = _collect_module_data(profile, file_cache, backend)
+    _report_discovery_times(module_data)
+    return _build_test_index(module_data)
+
+
+def _collect_module_data(profile, file_cache=None, backend=IMPORT_BACKEND):
     profile_split = profile.split('-')
     profile_namespace = '_'.join([profile_split[-1]] + profile_split[:-1])
 
-    heading('Discovering Tests')
-
     path_table = get_path_table()
     core_modules = path_table['core'].items()
     command_modules = path_table['mod'].items()
     extensions = path_table['ext'].items()
     inverse_name_table = get_name_index(invert=True)
 
-    module_data = {}
+    # (index name, import name, mod_data) of every module
+    modules = []
 
     logger.info('\nCore Modules: %s', ', '.join([name for name, _ in core_modules]))
     for mod_name, mod_path in core_modules:
@@ -222,9 +539,7 @@ def _discover_tests(profile):
             'base_path': '{}.tests'.format(mod_name).replace('-', '.'),
             'files': {}
         }
-        tests = _discover_module_tests(mod_name, mod_data)
-        if tests:
-            module_data[mod_name] = tests
+        modules.append((mod_name, mod_name, mod_data))
 
     logger.info('\nCommand Modules: %s', ', '.join([name for name, _ in command_modules]))
     for mod_name, mod_path in command_modules:
@@ -237,9 +552,7 @@ def _discover_tests(profile):
             'base_path': 'azure.cli.command_modules.{}.tests.{}'.format(mod_name, profile_namespace),
             'files': {}
         }
-        tests = _discover_module_tests(mod_name, mod_data)
-        if tests:
-            module_data[mod_name] = tests
+        modules.append((mod_name, mod_name, mod_data))
 
     logger.info('\nExtensions: %s', ', '.join([name for name, _ in extensions if name]))
     for mod_name, mod_path in extensions:
@@ -256,10 +569,84 @@ def _discover_tests(profile):
             'base_path': '{}.tests.{}'.format(import_name, profile_namespace),
             'files': {}
         }
-        tests = _discover_module_tests(import_name, mod_data)
+        modules.append((mod_name, import_name, mod_data))
+
+    previous_files = dict(file_cache or {})
+    tasks = [(backend, import_name, mod_data, previous_files.get(mod_data['filepath']))
+             for _, import_name, mod_data in modules]
+    results = [None] * len(tasks)
+    pending = []
+    for i, task in enumerate(tasks):
+        if backend == IMPORT_BACKEND and _is_module_unchanged(task[2]['filepath'], task[3]):
+            # nothing to import, which is quicker than handing the module to a worker
+            results[i] = _discover_module_task(task)
+        else:
+            pending.append(i)
+    if pending:
+        with ProcessPoolExecutor(min(len(pending), os.cpu_count() or 1)) as executor:
+            for i, tests in zip(pending, executor.map(_discover_module_task, [tasks[i] for i in pending])):
+                results[i] = tests
+
+    # merge in the order of the path table, so that conflicts in the index resolve like in a serial run
+    module_data = {}
+    if file_cache is not None:
+        # modules and test files which are gone are dropped from the cache along the way
+        file_cache.clear()
+    for (mod_name, _, mod_data), tests in zip(modules, results):
         if tests:
             module_data[mod_name] = tests
+            if file_cache is not None:
+                file_cache[mod_data['filepath']] = tests['file_records']
+
+    return module_data
+
 
+def _is_module_unchanged(tests_dir, cached_files):
+    """ Whether none of the test files of a module was added, removed or modified since they were cached. """
+    try:
+        file_names = {x[:-len('.py')] for x in os.listdir(tests_dir) if x.startswith('test_') and x.endswith('.py')}
+    except FileNotFoundError:
+        return True
+    if not cached_files or file_names != set(cached_files):
+        return False
+    for file_name, cached in cached_files.items():
+        stat = os.stat(os.path.join(tests_dir, file_name + '.py'))
+        if cached.get('import_error') or (stat.st_mtime_ns, stat.st_size) != (cached['mtime'], cached['size']):
+            return False
+    return True
+
+
+def _discover_module_task(task):
+    """ Discovers the tests of one module, in a worker process of `_collect_module_data`. """
+    backend, import_name, mod_data, cached_files = task
+    start = timeit.default_timer()
+    if backend == AST_BACKEND:
+        file_records = ast_discovery.discover_module_tests(mod_data['filepath'], mod_data['base_path'])
+        if file_records is None:
+            return None
+        mod_data['files'] = {name: record['classes'] for name, record in file_records.items()}
+        mod_data['file_records'] = file_records
+        tests = mod_data
+    else:
+        tests = _discover_module_tests(import_name, mod_data, cached_files)
+    if tests:
+        tests['discovery_time'] = timeit.default_timer() - start
+    return tests
+
+
+def _report_discovery_times(module_data, top=DISCOVERY_TIMES_SHOWN):
+    """ Logs the discovery time of every module and shows the slowest ones. """
+    times = [(mod_name, mod_data['discovery_time']) for mod_name, mod_data in module_data.items()]
+    for mod_name, seconds in times:
+        logger.info('%s discovered in %.3fs', mod_name, seconds)
+    slowest = sorted(times, key=lambda t: t[1], reverse=True)[:top]
+    if slowest:
+        subheading('Slowest Modules to Discover')
+        for mod_name, seconds in slowest:
+            display('{:<40} {:>8.3f}s'.format(mod_name, seconds))
+
+
+def _build_test_index(module_data):
     test_index = {}
     conflicted_keys = []
 
@@ -310,24 +697,67 @@ def _discover_tests(profile):
     return test_index
 
 
-def _get_test_index(profile, discover):
+def _get_test_index(profile, discover, backend=IMPORT_BACKEND):
+    """ Loads the test index of a profile. The test files recorded in the index are checked for changes on every
+        load and only new or changed files are imported again. `discover` rebuilds the index from scratch, as does
+        switching the discovery `backend`.
+    """
     config_dir = get_azdev_config_dir()
     test_index_dir = os.path.join(config_dir, 'test_index')
     make_dirs(test_index_dir)
     test_index_path = os.path.join(test_index_dir, '{}.json'.format(profile))
-    test_index = {}
-    if discover:
-        test_index = _discover_tests(profile)
-        with open(test_index_path, 'w') as f:
-            f.write(json.dumps(test_index))
-        display('\ntest index updated: {}'.format(test_index_path))
-    elif os.path.isfile(test_index_path):
-        with open(test_index_path, 'r') as f:
-            test_index = json.loads(''.join(f.readlines()))
-        display('\ntest index found: {}'.format(test_index_path))
+    file_cache_path = os.path.join(test_index_dir, '{}.files.json'.format(profile))
+
+    file_cache = None
+    if not discover and os.path.isfile(test_index_path):
+        file_cache = _load_file_cache(file_cache_path, backend)
+
+    if file_cache is None:
+        file_cache = {}
+        test_index = _discover_tests(profile, file_cache, backend)
+        status = 'updated' if os.path.isfile(test_index_path) else 'created'
     else:
-        test_index = _discover_tests(profile)
-        with open(test_index_path, 'w') as f:
-            f.write(json.dumps(test_index))
-        display('\ntest index created: {}'.format(test_index_path))
+        previous_states = _file_states(file_cache)
+        module_data = _collect_module_data(profile, file_cache, backend)
+        changed_files = _count_changed_files(previous_states, _file_states(file_cache))
+        if changed_files:
+            display('\n{} test files were added, changed or removed since the last discovery.'.format(changed_files))
+            _report_discovery_times(module_data)
+            test_index = _build_test_index(module_data)
+            status = 'updated'
+        else:
+            with open(test_index_path, 'r') as f:
+                test_index = json.loads(''.join(f.readlines()))
+            display('\ntest index found: {}'.format(test_index_path))
+            return test_index
+
+    with open(test_index_path, 'w') as f:
+        f.write(json.dumps(test_index))
+    with open(file_cache_path, 'w') as f:
+        f.write(json.dumps({'version': TEST_FILE_CACHE_VERSION, 'backend': backend, 'dirs': file_cache}))
+    display('\ntest index {}: {}'.format(status, test_index_path))
     return test_index
+
+
+def _load_file_cache(path, backend):
+    """ The test file records saved with the test index, or None if there are none to trust. """
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != TEST_FILE_CACHE_VERSION or \
+            data.get('backend', IMPORT_BACKEND) != backend:
+        return None
+    return data['dirs']
+
+
+def _file_states(file_cache):
+    # the classes of a file can change while the file does not, e.g. when it failed to import before or, with the
+    # ast backend, when a base class in another file changed
+    return {(test_dir, file_name): (record['hash'], json.dumps(record['classes'], sort_keys=True))
+            for test_dir, records in file_cache.items() for file_name, record in records.items()}
+
+
+def _count_changed_files(before, after):
+    return sum(1 for key in before.keys() | after.keys() if before.get(key) != after.get(key))
@@ -0,0 +1,225 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+""" Test discovery which parses test files with `ast` instead of importing them.
+
+Importing a test file pulls in the SDKs, azure.cli.testsdk and VCR it depends on, while listing its tests only needs
+the names of its classes and their test_* methods. Base classes are followed through imports of other files of the
+same source tree, so tests inherited from a base class that is not a test class of its own, like a private mixin or a
+class in a helper file, are listed too, under the first class that inherits them. Tests that are generated at run
+time, e.g. with setattr, can't be seen this way.
+"""
+
+import ast
+import hashlib
+import os
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+# bases nested deeper than this, or importing each other in a cycle, are not followed
+MAX_INHERITANCE_DEPTH = 20
+
+
+class _SourceModule:  # pylint: disable=too-few-public-methods
+    """ The top-level classes and imported names of one parsed Python file. """
+
+    def __init__(self, name, is_package, tree):
+        self.name = name
+        # {class name: ([base name as dotted parts], [test names defined in the class])}
+        self.classes = {}
+        # {local name: (module name, imported attribute or None for a module)}
+        self.imports = {}
+        for node in _top_level_nodes(tree.body):
+            if isinstance(node, ast.ClassDef):
+                bases = [_dotted_parts(b) for b in node.bases]
+                self.classes[node.name] = ([b for b in bases if b], _own_tests(node))
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.imports[alias.asname] = (alias.name, None)
+                    else:
+                        top_level = alias.name.split('.')[0]
+                        self.imports[top_level] = (top_level, None)
+            elif isinstance(node, ast.ImportFrom):
+                module = self._absolute_module(node, is_package)
+                for alias in node.names:
+                    self.imports[alias.asname or alias.name] = (module, alias.name)
+
+    def _absolute_module(self, node, is_package):
+        if not node.level:
+            return node.module
+        package = self.name.split('.')
+        if not is_package:
+            package = package[:-1]
+        if node.level > 1:
+            package = package[:-(node.level - 1)]
+        return '.'.join(package + ([node.module] if node.module else []))
+
+
+def _top_level_nodes(body):
+    """ Statements of a module body, including those in top-level if/try blocks. """
+    for node in body:
+        if isinstance(node, ast.If):
+            yield from _top_level_nodes(node.body + node.orelse)
+        elif isinstance(node, ast.Try):
+            yield from _top_level_nodes(node.body + node.orelse + node.finalbody +
+                                        [n for h in node.handlers for n in h.body])
+        else:
+            yield node
+
+
+def _own_tests(class_node):
+    tests = []
+    for node in class_node.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names = [node.name]
+        elif isinstance(node, ast.Assign):
+            names = [t.id for t in node.targets if isinstance(t, ast.Name)]
+        else:
+            continue
+        tests.extend(n for n in names if n.startswith('test_') and n not in tests)
+    return tests
+
+
+def _dotted_parts(node):
+    """ ['module', 'Base'] for a base class written as `module.Base`, None for anything but a (dotted) name. """
+    if isinstance(node, ast.Name):
+        return [node.id]
+    if isinstance(node, ast.Attribute):
+        parts = _dotted_parts(node.value)
+        return parts + [node.attr] if parts else None
+    return None
+
+
+def _is_test_class(module_name, class_name):
+    """ Whether discovery lists the class on its own: a public class of a test file. """
+    return module_name.split('.')[-1].startswith('test_') and not class_name.startswith('_')
+
+
+class TestFileParser:
+    """ Lists the tests of the files below `root`, the directory that contains the top-level package, by parsing
+    them. Every file is parsed at most once. """
+
+    def __init__(self, root):
+        self.root = root
+        self._modules = {}
+
+    def module(self, name):
+        """ The parsed module with a dotted `name`, or None if it is not a file below root or can't be parsed. """
+        if name not in self._modules:
+            self._modules[name] = None
+            base = os.path.join(self.root, *name.split('.'))
+            for path, is_package in [(base + '.py', False), (os.path.join(base, '__init__.py'), True)]:
+                if os.path.isfile(path):
+                    with open(path, 'rb') as f:
+                        self._modules[name] = self.parse(name, is_package, f.read())
+                    break
+        return self._modules[name]
+
+    def parse(self, name, is_package, source):
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError) as ex:
+            logger.info('    %s: %s', name, ex)
+            return None
+        self._modules[name] = _SourceModule(name, is_package, tree)
+        return self._modules[name]
+
+    def file_classes(self, name, source, inherited=None):
+        """ {class name: [test names]} of the public classes defined in a test file. Like import discovery, a class
+        lists the tests it defines. Tests it inherits are listed only if the class defining them isn't listed on its
+        own, i.e. isn't a public class of a test file, and if they are not in `inherited`, the set of (class, test)
+        of the inherited tests listed so far, which this adds to. """
+        module = self.parse(name, False, source)
+        if module is None:
+            return None
+        inherited = set() if inherited is None else inherited
+        classes = {}
+        for class_name in module.classes:
+            if class_name.startswith('_'):
+                continue
+            tests = []
+            for test, origin in self._class_tests(module, class_name, 0):
+                if origin == (module.name, class_name):
+                    tests.append(test)
+                elif not _is_test_class(*origin) and (origin, test) not in inherited:
+                    inherited.add((origin, test))
+                    tests.append(test)
+            if tests:
+                classes[class_name] = tests
+        return classes
+
+    def _class_tests(self, module, class_name, depth):
+        """ [(test name, (module name, class name) of the class defining the test)] of a class and its bases. """
+        bases, own_tests = module.classes[class_name]
+        tests = [(test, (module.name, class_name)) for test in own_tests]
+        if depth >= MAX_INHERITANCE_DEPTH:
+            return tests
+        names = set(own_tests)
+        for base in bases:
+            for test, origin in self._resolve_tests(module, base, depth + 1):
+                if test not in names:
+                    names.add(test)
+                    tests.append((test, origin))
+        return tests
+
+    def _resolve_tests(self, module, parts, depth):
+        """ Tests of the class that `parts`, a dotted name used in `module`, refers to, as `_class_tests` lists
+        them. """
+        if depth >= MAX_INHERITANCE_DEPTH or module is None:
+            return []
+        first, rest = parts[0], parts[1:]
+        if not rest and first in module.classes:
+            return self._class_tests(module, first, depth)
+        if first not in module.imports:
+            # a builtin, or a name this parser can't follow
+            return []
+        target, attr = module.imports[first]
+        if not rest:
+            imported = self.module(target)
+            if imported is not None and (attr in imported.classes or attr in imported.imports):
+                return self._resolve_tests(imported, [attr], depth + 1)
+            return []
+        # module.Base, or package.module.Base
+        target = '.'.join([target] + ([attr] if attr else []) + rest[:-1])
+        return self._resolve_tests(self.module(target), rest[-1:], depth + 1)
+
+
+def discover_module_tests(tests_dir, base_path):
+    """ Records of the test files in `tests_dir`, the directory of the package `base_path`, in the shape the test
+    index keeps: {file name: {'mtime', 'size', 'hash', 'classes': {class name: [test names]}}}. Returns None if
+    the directory does not exist. """
+    try:
+        file_names = sorted(x[:-len('.py')] for x in os.listdir(tests_dir)
+                            if x.startswith('test_') and x.endswith('.py'))
+    except FileNotFoundError:
+        return None
+
+    root = tests_dir
+    for _ in base_path.split('.'):
+        root = os.path.dirname(root)
+    parser = TestFileParser(root)
+
+    records = {}
+    # an inherited test is listed under the first class inheriting it, in every later one it would be a duplicate
+    inherited = set()
+    for file_name in file_names:
+        file_path = os.path.join(tests_dir, file_name + '.py')
+        stat = os.stat(file_path)
+        with open(file_path, 'rb') as f:
+            source = f.read()
+        classes = parser.file_classes('{}.{}'.format(base_path, file_name), source, inherited)
+        records[file_name] = {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': hashlib.sha1(source).hexdigest(),
+            'classes': classes or {},
+        }
+        if classes is None:
+            records[file_name]['import_error'] = True
+    return records
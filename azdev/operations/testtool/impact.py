@@ -0,0 +1,153 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+""" Test impact analysis: which tests executed which source files.
+
+`azdev test --record-impact` runs the tests under pytest-cov with one coverage context per test and stores the
+files every test executed in an impact index. `azdev test --impacted` selects only the tests whose recorded files
+intersect a git diff, plus the tests of changed test files and recordings.
+"""
+
+import json
+import os
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+logger = get_logger(__name__)
+
+IMPACT_DIR = 'test_impact'
+COVERAGE_FILE = '.coverage'
+IMPACT_INDEX_VERSION = 1
+
+
+def get_impact_dir(config_dir):
+    return os.path.join(config_dir, IMPACT_DIR)
+
+
+def get_impact_index_path(config_dir, profile):
+    return os.path.join(get_impact_dir(config_dir), '{}.json'.format(profile))
+
+
+def coverage_pytest_args(source_dirs):
+    """ pytest arguments to record the files every test executes, with pytest-cov. """
+    try:
+        import pytest_cov  # pylint: disable=unused-import
+    except ImportError:
+        raise CLIError('--record-impact requires pytest-cov. Install it with `pip install pytest-cov`.')
+    return ['--cov={}'.format(d) for d in source_dirs] + ['--cov-context=test', '--cov-report=']
+
+
+def _test_path_resolver(test_index):
+    """ Maps the pytest node id of a test to the path of the test in `test_index`. Node ids are relative to the
+    pytest rootdir, so their file part is matched against the end of the test files in the index. """
+    files_by_name = {}
+    for path in test_index.values():
+        file_path = path.split('::')[0]
+        if file_path.endswith('.py'):
+            files_by_name.setdefault(os.path.basename(file_path), set()).add(os.path.normpath(file_path))
+
+    def _resolve(node_id):
+        file_part, sep, rest = node_id.partition('::')
+        file_part = os.path.normpath(file_part)
+        for file_path in files_by_name.get(os.path.basename(file_part), []):
+            if file_path == file_part or file_path.endswith(os.sep + file_part):
+                return file_path + sep + rest
+        return None
+
+    return _resolve
+
+
+def load_impact_index(path):
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != IMPACT_INDEX_VERSION:
+        return None
+    return data
+
+
+def record_impact(coverage_file, impact_index_path, test_index):
+    """ Adds the files executed by each test in the coverage data of a `--record-impact` run to the impact index.
+    Tests that ran replace what was recorded for them before. """
+    from coverage import CoverageData
+
+    data = CoverageData(basename=coverage_file)
+    data.read()
+    resolve = _test_path_resolver(test_index)
+
+    recorded = {}
+    unresolved = set()
+    for measured_file in data.measured_files():
+        source_file = os.path.normcase(os.path.abspath(measured_file))
+        for contexts in data.contexts_by_lineno(measured_file).values():
+            for context in contexts:
+                # pytest-cov names the contexts '<node id>|setup', '<node id>|run' and '<node id>|teardown'
+                node_id = context.rpartition('|')[0]
+                if not node_id:
+                    continue
+                test_path = resolve(node_id)
+                if test_path is None:
+                    unresolved.add(node_id)
+                    continue
+                recorded.setdefault(test_path, set()).add(source_file)
+    if unresolved:
+        logger.warning('%d recorded tests are not in the test index and were skipped.', len(unresolved))
+
+    index = load_impact_index(impact_index_path) or {'version': IMPACT_INDEX_VERSION, 'files': [], 'tests': {}}
+    files = index['files']
+    tests = {test: {files[i] for i in file_ids} for test, file_ids in index['tests'].items()}
+    tests.update(recorded)
+
+    # store the files once, and refer to them by position
+    files = sorted({f for test_files in tests.values() for f in test_files})
+    file_ids = {f: i for i, f in enumerate(files)}
+    index = {
+        'version': IMPACT_INDEX_VERSION,
+        'files': files,
+        'tests': {test: sorted(file_ids[f] for f in test_files) for test, test_files in sorted(tests.items())},
+    }
+    os.makedirs(os.path.dirname(impact_index_path), exist_ok=True)
+    with open(impact_index_path, 'w') as f:
+        json.dump(index, f)
+    return recorded
+
+
+def select_impacted_tests(impact_index, changed_files, test_index):
+    """ Paths of the tests affected by `changed_files`, absolute paths of the files changed by a diff.
+
+    A test is affected if it executed a changed file when it was recorded, if it is in a changed test file or if
+    its recording changed. Changed Python files which no recorded test executed are logged, since their tests
+    can't be told.
+    """
+    files = [os.path.normcase(f) for f in impact_index['files']]
+    changed_files = {os.path.normcase(os.path.abspath(f)) for f in changed_files}
+    changed_ids = {i for i, f in enumerate(files) if f in changed_files}
+    recorded_files = set(files)
+
+    selected = {test for test, file_ids in impact_index['tests'].items() if changed_ids.intersection(file_ids)}
+    unknown = []
+    for changed_file in sorted(changed_files):
+        name = os.path.basename(changed_file)
+        directory = os.path.basename(os.path.dirname(changed_file))
+        if name.startswith('test_') and name.endswith('.py'):
+            if os.path.isfile(changed_file):
+                selected.add(changed_file)
+        elif directory == 'recordings' and name.endswith('.yaml'):
+            test_path = test_index.get(name[:-len('.yaml')])
+            if test_path:
+                selected.add(test_path)
+        elif name.endswith('.py') and changed_file not in recorded_files:
+            unknown.append(changed_file)
+    if unknown:
+        logger.warning('No recorded test executed these changed files, so no test was selected for them: %s',
+                       ', '.join(unknown))
+
+    # a whole test file covers the tests recorded in it
+    files_selected = {s for s in selected if '::' not in s}
+    return sorted(s for s in selected if '::' not in s or os.path.normcase(s.split('::')[0]) not in files_selected)
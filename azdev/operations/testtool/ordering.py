@@ -0,0 +1,77 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+""" Orders the selected tests so that likely failures surface first and parallel workers finish together. """
+
+import os
+
+from knack.log import get_logger
+
+from .sharding import expand_test_paths, estimate_durations
+
+logger = get_logger(__name__)
+
+ORDER_FAILED = 'failed'
+ORDER_CHANGED = 'changed'
+ORDER_SLOWEST = 'slowest'
+ORDER_STRATEGIES = [ORDER_FAILED, ORDER_CHANGED, ORDER_SLOWEST]
+
+
+def _module_dir(unit):
+    """ The module or extension source directory a test file belongs to: the directory above its 'tests'. """
+    file_path = unit.split('::')[0]
+    parts = file_path.split(os.sep)
+    if 'tests' in parts:
+        return os.sep.join(parts[:len(parts) - 1 - parts[::-1].index('tests')])
+    return os.path.dirname(file_path)
+
+
+def _latest_change(module_dir):
+    """ The latest modification time of a Python file in a module. """
+    latest = 0
+    for root, dirs, files in os.walk(module_dir):
+        # recordings hold thousands of yaml files and no code
+        dirs[:] = [d for d in dirs if d not in ('recordings', '__pycache__')]
+        for name in files:
+            if name.endswith('.py'):
+                try:
+                    latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+                except OSError:
+                    continue
+    return latest
+
+
+def order_test_paths(test_paths, test_index, strategies, store):
+    """ The test files of `test_paths` sorted by `strategies`, in order of precedence:
+
+    - failed: files with a test that failed the last time it ran come first.
+    - changed: files of modules with Python files changed since the last recorded run come first.
+    - slowest: files with the longest expected duration come first.
+
+    Ties keep the order of `test_paths`. Outcomes and durations are taken from the timing store `store`.
+    """
+    units = expand_test_paths(test_paths, test_index)
+    keys = {unit: [] for unit in units}
+    for strategy in strategies:
+        if strategy == ORDER_FAILED:
+            failed = store.recent_failures()
+            for unit, tests in units.items():
+                keys[unit].append(0 if failed.intersection(tests) else 1)
+        elif strategy == ORDER_CHANGED:
+            since = store.last_run_time() or 0
+            changed = {}
+            for unit in units:
+                module_dir = _module_dir(unit)
+                if module_dir not in changed:
+                    changed[module_dir] = _latest_change(module_dir) > since
+                keys[unit].append(0 if changed[module_dir] else 1)
+            logger.info('Modules changed since the last run: %s', ', '.join(m for m, c in changed.items() if c))
+        elif strategy == ORDER_SLOWEST:
+            durations = estimate_durations(units, store.durations())
+            for unit in units:
+                keys[unit].append(-durations[unit])
+    positions = {unit: i for i, unit in enumerate(units)}
+    return sorted(units, key=lambda u: (keys[u], positions[u]))
@@ -4,19 +4,28 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+import configparser
 import os
+import shutil
 import traceback
 
 from knack.log import get_logger
 from knack.util import CLIError
 
 from azdev.utilities import call, cmd
-from azdev.utilities import display
+from azdev.utilities import display, get_azure_config_dir
 
 
 logger = get_logger(__name__)
 os.environ['AZURE_CORE_COLLECT_TELEMETRY'] = 'False'
 
+CONFIG_FILE = 'config'
+CLOUDS_CONFIG_FILE = 'clouds.config'
+DEFAULT_CLOUD = 'AzureCloud'
+DEFAULT_PROFILE = 'latest'
+# what the CLI writes to its config dir that a copy for a test run does not need
+_NOT_COPIED = ['logs', 'telemetry', 'commands', '*.lock']
+
 
 class ProfileContext:
     def __init__(self, profile_name=None):
@@ -27,6 +36,8 @@ class ProfileContext:
     def __enter__(self):
         if self.target_profile is None or self.target_profile == self.origin_profile:
             display('The tests are set to run against current profile "{}"'.format(self.origin_profile))
+        elif _set_profile(self.target_profile):
+            display('Switched to target profile "{}"'.format(self.target_profile))
         else:
             result = cmd('az cloud update --profile {}'.format(self.target_profile),
                          'Switching to target profile "{}"...'.format(self.target_profile))
@@ -36,7 +47,8 @@ class ProfileContext:
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.target_profile is not None and self.target_profile != self.origin_profile:
             display('Switching back to origin profile "{}"...'.format(self.origin_profile))
-            call('az cloud update --profile {}'.format(self.origin_profile))
+            if not _set_profile(self.origin_profile):
+                call('az cloud update --profile {}'.format(self.origin_profile))
 
         if exc_tb:
             display('')
@@ -44,4 +56,69 @@ class ProfileContext:
 
 
 def current_profile():
+    """ The API profile of the active cloud. It is read from the Azure CLI config files, which saves starting `az`,
+    unless they can't be parsed. """
+    try:
+        return _read_profile()
+    except (configparser.Error, OSError, UnicodeDecodeError) as ex:
+        logger.debug('Unable to read the profile from the Azure CLI config: %s', ex)
     return cmd('az cloud show --query profile -otsv', show_stderr=False).result
+
+
+def _active_cloud(config_dir):
+    # the CLI reads [cloud] name from the config file, which AZURE_CLOUD_NAME overrides
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(os.path.join(config_dir, CONFIG_FILE), encoding='utf-8')
+    return os.environ.get('AZURE_CLOUD_NAME') or config.get('cloud', 'name', fallback=DEFAULT_CLOUD)
+
+
+def _read_clouds_config(config_dir):
+    clouds = configparser.ConfigParser(interpolation=None)
+    clouds.read(os.path.join(config_dir, CLOUDS_CONFIG_FILE), encoding='utf-8')
+    return clouds
+
+
+def _read_profile(config_dir=None):
+    config_dir = config_dir or get_azure_config_dir()
+    return _read_clouds_config(config_dir).get(_active_cloud(config_dir), 'profile', fallback=DEFAULT_PROFILE)
+
+
+def _set_profile(profile, config_dir=None):
+    """ Sets the API profile of the active cloud in the clouds config file, like `az cloud update --profile` does.
+    Returns False if that has to be left to `az`, because the supported profiles are unknown or the config files
+    can't be parsed. """
+    try:
+        from azure.cli.core.profiles import API_PROFILES  # pylint: disable=import-error
+    except ImportError:
+        return False
+    if profile not in API_PROFILES:
+        raise CLIError("Profile '{}' is not supported. Supported profiles: {}".format(
+            profile, ', '.join(API_PROFILES)))
+    config_dir = config_dir or get_azure_config_dir()
+    try:
+        cloud = _active_cloud(config_dir)
+        clouds = _read_clouds_config(config_dir)
+        if not clouds.has_section(cloud):
+            clouds.add_section(cloud)
+        clouds.set(cloud, 'profile', profile)
+        with open(os.path.join(config_dir, CLOUDS_CONFIG_FILE), 'w', encoding='utf-8') as f:
+            clouds.write(f)
+    except (configparser.Error, OSError, UnicodeDecodeError) as ex:
+        logger.debug('Unable to set the profile in the Azure CLI config: %s', ex)
+        return False
+    return True
+
+
+def copy_config_dir(profile, target_dir):
+    """ Copies the Azure CLI config dir, with its login, to `target_dir` and sets `profile` in the copy. Tests run
+    with AZURE_CONFIG_DIR set to the copy use that profile without changing it for anything else. """
+    source_dir = get_azure_config_dir()
+    if os.path.isdir(source_dir):
+        shutil.copytree(source_dir, target_dir, ignore=shutil.ignore_patterns(*_NOT_COPIED))
+    else:
+        os.makedirs(target_dir)
+    if not _set_profile(profile, target_dir):
+        result = cmd('az cloud update --profile {}'.format(profile),
+                     env=dict(os.environ, AZURE_CONFIG_DIR=target_dir))
+        if result.exit_code != 0:
+            raise CLIError(result.error.output.decode('utf-8'))
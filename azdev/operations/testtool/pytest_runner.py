@@ -5,19 +5,38 @@
 # -----------------------------------------------------------------------------
 
 import os
+import shutil
+import subprocess
+import tempfile
+import time
+from xml.etree import ElementTree
 
 from knack.log import get_logger
 
 from azdev.utilities import call
 
+ISOLATION_TEST = 'test'
+ISOLATION_FILE = 'file'
+ISOLATION_WORKER = 'worker'
 
-def get_test_runner(parallel, log_path, last_failed, no_exit_first, mark):
-    """Create a pytest execution method"""
+# pytest exit code when no test was collected, e.g. because none in a file has the selected mark
+_NO_TESTS_COLLECTED = 5
+
+
+def get_test_runner(parallel, log_path, last_failed, no_exit_first, mark, coverage_args=None, ordered=False,
+                    isolation=ISOLATION_TEST, env=None, workers=None):
+    """Create a pytest execution method
+
+    `isolation` is how much tests are kept apart: 'test' forks a process for every test (POSIX only), 'file' runs
+    every test file in its own pytest process and 'worker' runs all tests of an xdist worker in one interpreter.
+    pytest runs with the environment variables `env`, or those of azdev if omitted. In parallel, tests run on
+    `workers` processes, or one per CPU if omitted.
+    """
     def _run(test_paths, pytest_args):
 
         logger = get_logger(__name__)
 
-        if os.name == 'posix':
+        if os.name == 'posix' and isolation == ISOLATION_TEST:
             arguments = ['-x', '-v', '--forked', '-p no:warnings', '--log-level=WARN', '--junit-xml', log_path]
         else:
             arguments = ['-x', '-v', '-p no:warnings', '--log-level=WARN', '--junit-xml', log_path]
@@ -25,18 +44,83 @@ def get_test_runner(parallel, log_path, last_failed, no_exit_first, mark):
         if no_exit_first:
             arguments.remove('-x')
 
+        if coverage_args:
+            # coverage recorded in a forked child of a test would be lost
+            if '--forked' in arguments:
+                arguments.remove('--forked')
+            arguments += coverage_args
+
         if mark:
             arguments.append('-m "{}"'.format(mark))
 
+        if ordered:
+            # test_paths are in the order to run them, which a plugin like pytest-randomly would undo
+            arguments.append('-p no:randomly')
+
+        if isolation == ISOLATION_FILE:
+            options = arguments + (['--lf'] if last_failed else []) + (pytest_args or [])
+            return _run_per_file(test_paths, options, log_path, (workers or os.cpu_count()) if parallel else 1,
+                                 exit_first=not no_exit_first, env=env)
+
         arguments.extend(test_paths)
         if parallel:
-            arguments += ['-n', 'auto']
+            arguments += ['-n', str(workers or 'auto')]
         if last_failed:
             arguments.append('--lf')
         if pytest_args:
             arguments += pytest_args
         cmd = 'python -m pytest {}'.format(' '.join(arguments))
         logger.info('Running: %s', cmd)
-        return call(cmd)
+        return call(cmd, env=env)
 
     return _run
+
+
+def _run_per_file(test_paths, arguments, log_path, slots, exit_first, env=None):
+    """ Runs the tests of every test file in a pytest process of its own, up to `slots` at a time, and merges their
+    junit XML results into `log_path`. With `exit_first` no further file is started once one has failed. """
+    logger = get_logger(__name__)
+
+    by_file = {}
+    for test_path in test_paths:
+        by_file.setdefault(test_path.split('::')[0], []).append(test_path)
+    pending = list(by_file.values())
+
+    parts_dir = tempfile.mkdtemp()
+    parts = []
+    running = []
+    exit_code = 0
+    try:
+        while pending or running:
+            while pending and len(running) < slots and not (exit_first and exit_code):
+                part = os.path.join(parts_dir, 'part{}.xml'.format(len(parts)))
+                parts.append(part)
+                options = [part if a == log_path else a for a in arguments]
+                cmd = 'python -m pytest {}'.format(' '.join(options + pending.pop(0)))
+                logger.info('Running: %s', cmd)
+                running.append(subprocess.Popen(cmd, shell=True, env=env))  # pylint: disable=consider-using-with
+            if exit_first and exit_code:
+                pending = []
+            if not running:
+                break
+            time.sleep(0.05)
+            for process in [p for p in running if p.poll() is not None]:
+                running.remove(process)
+                if process.returncode not in (0, _NO_TESTS_COLLECTED) and not exit_code:
+                    exit_code = process.returncode
+        _merge_junit(parts, log_path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    return exit_code
+
+
+def _merge_junit(parts, log_path):
+    merged = ElementTree.Element('testsuites')
+    for part in parts:
+        try:
+            root = ElementTree.parse(part).getroot()
+        except (OSError, ElementTree.ParseError):
+            # the process died before writing its results
+            continue
+        merged.extend(root.iter('testsuite') if root.tag == 'testsuites' else [root])
+    ElementTree.ElementTree(merged).write(log_path, encoding='utf-8', xml_declaration=True)
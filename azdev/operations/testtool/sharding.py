@@ -0,0 +1,124 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+""" Splits the selected tests into shards of near-equal run time, for CI pipelines that fan out across agents. """
+
+import heapq
+import os
+import re
+from xml.etree import ElementTree
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+logger = get_logger(__name__)
+
+_SHARD_REGEX = re.compile(r'^(?P<index>\d+)/(?P<count>\d+)$')
+_PARAMETERS_REGEX = re.compile(r'\[.*\]$')
+
+
+def parse_shard(value):
+    """ (index, count) of a 'i/N' shard, with a 1-based index. """
+    match = _SHARD_REGEX.match(value or '')
+    if not match or not 1 <= int(match.group('index')) <= int(match.group('count')):
+        raise CLIError("usage error: --shard INDEX/COUNT with 1 <= INDEX <= COUNT, e.g. '2/8'. Got '{}'.".format(value))
+    return int(match.group('index')), int(match.group('count'))
+
+
+def read_durations(xml_paths):
+    """ Mean duration in seconds of every test case in junit XML files, keyed by (class name, test name). Runs of
+    the parameters of a parametrized test are summed up. """
+    runs = {}
+    for xml_path in xml_paths:
+        if not os.path.isfile(xml_path):
+            logger.warning("No test results at '%s' to take durations from.", xml_path)
+            continue
+        try:
+            tree = ElementTree.parse(xml_path)
+        except ElementTree.ParseError as ex:
+            logger.warning("Unable to read test results at '%s': %s", xml_path, ex)
+            continue
+        file_durations = {}
+        for case in tree.iter('testcase'):
+            key = (case.get('classname', '').split('.')[-1], _PARAMETERS_REGEX.sub('', case.get('name', '')))
+            file_durations[key] = file_durations.get(key, 0.0) + float(case.get('time') or 0)
+        for key, duration in file_durations.items():
+            runs.setdefault(key, []).append(duration)
+    return {key: sum(durations) / len(durations) for key, durations in runs.items()}
+
+
+def expand_test_paths(test_paths, test_index):
+    """ {unit: [(class name, test name)]} of the tests selected by `test_paths`, in their order. Directories are
+    split into their test files. Files, classes and tests that were selected on their own are units themselves.
+    Selected paths and test files of selected directories without tests in the index, e.g. files with only
+    module-level tests, are units without tests rather than dropped. """
+    tests_by_file = {}
+    for path in dict.fromkeys(test_index.values()):
+        parts = path.split('::')
+        if len(parts) == 3:
+            tests_by_file.setdefault(parts[0], []).append((parts[1], parts[2]))
+
+    units = {}
+    for test_path in test_paths:
+        parts = test_path.split('::')
+        if len(parts) == 3:
+            units[test_path] = [(parts[1], parts[2])]
+        elif len(parts) == 2:
+            units[test_path] = [t for t in tests_by_file.get(parts[0], []) if t[0] == parts[1]]
+        elif test_path in tests_by_file:
+            units[test_path] = tests_by_file[test_path]
+        else:
+            prefix = os.path.join(test_path, '')
+            for file_path, tests in tests_by_file.items():
+                if file_path.startswith(prefix):
+                    units[file_path] = tests
+            for file_path in _test_files(test_path):
+                units.setdefault(file_path, [])
+            if not any(unit.startswith(prefix) for unit in units):
+                units[test_path] = []
+    return units
+
+
+def _test_files(directory):
+    """ Paths of the test files below `directory`, sorted. """
+    test_files = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        test_files.extend(os.path.join(root, f) for f in sorted(files) if f.startswith('test_') and f.endswith('.py'))
+    return test_files
+
+
+def estimate_durations(units, durations):
+    """ Expected seconds of every unit of `expand_test_paths`. Tests without a duration are assumed to take as long
+    as the average test with one. Without any durations, every test counts as one second. """
+    known = [durations[t] for tests in units.values() for t in tests if t in durations]
+    default = sum(known) / len(known) if known else 1.0
+    unknown = sum(1 for tests in units.values() for t in tests if t not in durations)
+    if unknown and durations:
+        logger.warning('%d tests have no recorded duration, assuming %.2fs for each.', unknown, default)
+    return {unit: sum(durations.get(t, default) for t in tests) or default for unit, tests in units.items()}
+
+
+def _pack(durations, count):
+    """ Greedy longest-processing-time bin packing: the longest remaining unit goes to the least loaded shard. """
+    shards = [[] for _ in range(count)]
+    loads = [(0.0, i) for i in range(count)]
+    for unit in sorted(durations, key=lambda u: (-durations[u], u)):
+        load, i = heapq.heappop(loads)
+        shards[i].append(unit)
+        heapq.heappush(loads, (load + durations[unit], i))
+    return shards
+
+
+def shard_test_paths(test_paths, test_index, shard, durations):
+    """ The test paths of shard `shard`, an (index, count) tuple, out of `test_paths`, plus the expected duration of
+    every shard. `durations` are seconds by (class name, test name), as returned by `read_durations`. The same
+    inputs give the same shards on every agent. """
+    index, count = shard
+    unit_durations = estimate_durations(expand_test_paths(test_paths, test_index), durations)
+    shards = _pack(unit_durations, count)
+    loads = [sum(unit_durations[u] for u in s) for s in shards]
+    return sorted(shards[index - 1]), loads
@@ -0,0 +1,94 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from knack.util import CLIError
+
+from azdev.operations.testtool import impact
+
+_TEST_FILE = '''
+import unittest
+
+from pkg import network, storage
+
+
+class NetworkTest(unittest.TestCase):
+    def test_network(self):
+        self.assertEqual(network.create(), 'network')
+
+
+class StorageTest(unittest.TestCase):
+    def test_storage(self):
+        self.assertEqual(storage.create(), 'storage')
+'''
+
+
+class TestImpact(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repo)
+        for name in ['network', 'storage']:
+            self._write(os.path.join('pkg', name + '.py'), 'def create():\n    return {!r}\n'.format(name))
+        self._write(os.path.join('pkg', '__init__.py'), '')
+        self.test_file = self._write(os.path.join('tests', 'test_pkg.py'), _TEST_FILE)
+        self.test_index = {
+            'test_network': self.test_file + '::NetworkTest::test_network',
+            'test_storage': self.test_file + '::StorageTest::test_storage',
+            'test_pkg': self.test_file,
+        }
+
+    def _write(self, path, content):
+        path = os.path.join(self.repo, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_record_and_select_impacted_tests(self):
+        try:
+            args = impact.coverage_pytest_args([os.path.join(self.repo, 'pkg')])
+        except CLIError:
+            self.skipTest('pytest-cov is not installed')
+        coverage_file = os.path.join(self.repo, impact.COVERAGE_FILE)
+        env = dict(os.environ, COVERAGE_FILE=coverage_file, PYTHONPATH=self.repo)
+        subprocess.run([sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', self.test_file] + args,
+                       cwd=self.repo, env=env, check=True, stdout=subprocess.DEVNULL)
+
+        index_path = os.path.join(self.repo, 'impact', 'latest.json')
+        recorded = impact.record_impact(coverage_file, index_path, self.test_index)
+        self.assertEqual(sorted(recorded), [self.test_index['test_network'], self.test_index['test_storage']])
+
+        impact_index = impact.load_impact_index(index_path)
+        network_file = os.path.join(self.repo, 'pkg', 'network.py')
+        self.assertEqual(impact.select_impacted_tests(impact_index, [network_file], self.test_index),
+                         [self.test_index['test_network']])
+        self.assertEqual(impact.select_impacted_tests(impact_index, [os.path.join(self.repo, 'README.md')],
+                                                      self.test_index), [])
+
+    def test_select_changed_test_files_and_recordings(self):
+        impact_index = {'version': impact.IMPACT_INDEX_VERSION, 'files': [os.path.join(self.repo, 'pkg', 'a.py')],
+                        'tests': {self.test_index['test_network']: [0]}}
+        recording = os.path.join(self.repo, 'tests', 'recordings', 'test_storage.yaml')
+
+        self.assertEqual(impact.select_impacted_tests(impact_index, [recording], self.test_index),
+                         [self.test_index['test_storage']])
+        # a changed test file selects the whole file instead of the tests recorded in it
+        self.assertEqual(impact.select_impacted_tests(impact_index, [os.path.join(self.repo, 'pkg', 'a.py'),
+                                                                     self.test_file], self.test_index),
+                         [self.test_file])
+        with self.assertLogs(impact.logger.name, 'WARNING'):
+            impact.select_impacted_tests(impact_index, [os.path.join(self.repo, 'pkg', 'new.py')], self.test_index)
+
+
+if __name__ == '__main__':
+    unittest.main()
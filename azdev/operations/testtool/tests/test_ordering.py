@@ -0,0 +1,59 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from azdev.operations.testtool import ordering
+
+
+class TestOrdering(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.test_index = {}
+        self.mod_dirs = {}
+        for mod in ['network', 'storage', 'vm']:
+            self.mod_dirs[mod] = os.path.join(self.root, mod)
+            tests_dir = os.path.join(self.mod_dirs[mod], 'tests', 'latest')
+            os.makedirs(tests_dir)
+            with open(os.path.join(self.mod_dirs[mod], 'custom.py'), 'w'):
+                pass
+            os.utime(os.path.join(self.mod_dirs[mod], 'custom.py'), (100, 100))
+            self.test_index[mod] = tests_dir
+            file_path = os.path.join(tests_dir, 'test_{}.py'.format(mod))
+            self.test_index['test_' + mod] = '{}::{}Test::test_{}'.format(file_path, mod.title(), mod)
+        self.files = {mod: self.test_index['test_' + mod].split('::')[0] for mod in self.mod_dirs}
+
+        self.store = mock.MagicMock()
+        self.store.recent_failures.return_value = {('VmTest', 'test_vm')}
+        self.store.durations.return_value = {('NetworkTest', 'test_network'): 5.0,
+                                             ('StorageTest', 'test_storage'): 50.0}
+        self.store.last_run_time.return_value = 200
+
+    def _order(self, strategies):
+        return ordering.order_test_paths([self.test_index[m] for m in ['network', 'storage', 'vm']],
+                                         self.test_index, strategies, self.store)
+
+    def test_order(self):
+        self.assertEqual(self._order([]), [self.files['network'], self.files['storage'], self.files['vm']])
+        self.assertEqual(self._order(['failed']), [self.files['vm'], self.files['network'], self.files['storage']])
+        # vm has no recorded duration and is assumed to take the average
+        self.assertEqual(self._order(['slowest']), [self.files['storage'], self.files['vm'], self.files['network']])
+
+        os.utime(os.path.join(self.mod_dirs['network'], 'custom.py'), (300, 300))
+        self.assertEqual(self._order(['changed', 'slowest']),
+                         [self.files['network'], self.files['storage'], self.files['vm']])
+        self.assertEqual(self._order(['failed', 'changed']),
+                         [self.files['vm'], self.files['network'], self.files['storage']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,11 +4,17 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+import os
+import shutil
+import tempfile
+import types
 import unittest
+from unittest import mock
 
 from knack.util import CLIError
 
-from azdev.operations.testtool.profile_context import ProfileContext
+from azdev.operations.testtool import _run_profiles
+from azdev.operations.testtool.profile_context import ProfileContext, current_profile, _read_profile
 
 
 class TestProfileContext(unittest.TestCase):
@@ -31,3 +37,99 @@ class TestProfileContext(unittest.TestCase):
         with self.assertRaises(Exception):
             with ProfileContext('latest'):
                 raise Exception('inner Exception')
+
+
+class TestProfileConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir)
+        env = mock.patch.dict(os.environ, {'AZURE_CONFIG_DIR': self.config_dir})
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop('AZURE_CLOUD_NAME', None)
+        # the profiles the installed CLI supports
+        profiles = types.ModuleType('azure.cli.core.profiles')
+        profiles.API_PROFILES = {'latest': {}, '2019-03-01-hybrid': {}}
+        modules = mock.patch.dict('sys.modules', {'azure.cli.core.profiles': profiles})
+        modules.start()
+        self.addCleanup(modules.stop)
+        # no test may fall back to running az
+        az = mock.patch('azdev.operations.testtool.profile_context.cmd', side_effect=AssertionError('az was run'))
+        az.start()
+        self.addCleanup(az.stop)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.config_dir, name), 'w') as f:
+            f.write(content)
+
+    def test_profile_defaults_without_config(self):
+        self.assertEqual(current_profile(), 'latest')
+
+    def test_profile_of_active_cloud(self):
+        self._write('config', '[cloud]\nname = AzureUSGovernment\n')
+        self._write('clouds.config', '[AzureCloud]\nprofile = latest\n\n'
+                                     '[AzureUSGovernment]\nprofile = 2019-03-01-hybrid\n')
+        self.assertEqual(current_profile(), '2019-03-01-hybrid')
+
+        with mock.patch.dict(os.environ, {'AZURE_CLOUD_NAME': 'AzureCloud'}):
+            self.assertEqual(current_profile(), 'latest')
+
+    def test_switch_and_restore_profile_in_process(self):
+        self._write('clouds.config', '[AzureCloud]\nprofile = latest\nendpoint_x = https://example.com/%s\n')
+
+        with ProfileContext('2019-03-01-hybrid'):
+            self.assertEqual(current_profile(), '2019-03-01-hybrid')
+        self.assertEqual(current_profile(), 'latest')
+        with open(os.path.join(self.config_dir, 'clouds.config')) as f:
+            self.assertIn('endpoint_x = https://example.com/%s', f.read())
+
+    def test_switch_to_unsupported_profile_in_process(self):
+        with self.assertRaises(CLIError):
+            with ProfileContext('unknown-profile'):
+                pass
+
+    def test_profiles_run_in_copies_of_the_config_dir(self):
+        self._write('clouds.config', '[AzureCloud]\nprofile = latest\n')
+        self._write('msal_token_cache.json', '{}')
+        seen = {}
+        run_paths = {}
+        workers = []
+
+        def _get_test_runner(log_path, env, **kwargs):
+            workers.append(kwargs['workers'])
+
+            def _run(test_paths, pytest_args):  # pylint: disable=unused-argument
+                config_dir = env['AZURE_CONFIG_DIR']
+                seen[_read_profile(config_dir)] = os.path.isfile(os.path.join(config_dir, 'msal_token_cache.json'))
+                run_paths[_read_profile(config_dir)] = test_paths
+                with open(log_path, 'w') as f:
+                    outcome = '<failure />' if 'hybrid' in log_path else ''
+                    f.write('<testsuite><testcase classname="A" name="test_a" time="1">{}</testcase>'
+                            '</testsuite>'.format(outcome))
+                return 1 if outcome else 0
+            return _run
+
+        xml_path = os.path.join(self.config_dir, 'results.xml')
+        with mock.patch('azdev.operations.testtool.get_test_runner', _get_test_runner), \
+                mock.patch('azdev.operations.testtool._record_timings'), mock.patch('os.cpu_count', return_value=9):
+            test_paths = {'latest': ['latest/test_a.py'], '2019-03-01-hybrid': ['hybrid_2019_03_01/test_a.py']}
+            exit_code = _run_profiles(['latest', '2019-03-01-hybrid'], test_paths, None, xml_path,
+                                      {'isolation': 'test', 'parallel': True})
+
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(seen, {'latest': True, '2019-03-01-hybrid': True})
+        self.assertEqual(run_paths, test_paths)
+        # the profiles run at the same time share the CPUs
+        self.assertEqual(workers, [4, 4])
+        self.assertTrue(os.path.isfile(os.path.join(self.config_dir, 'results.latest.xml')))
+        self.assertTrue(os.path.isfile(os.path.join(self.config_dir, 'results.2019-03-01-hybrid.xml')))
+        # the profile of the user's config dir is left alone
+        self.assertEqual(current_profile(), 'latest')
+
+    def test_unparsable_config_falls_back_to_az(self):
+        self._write('clouds.config', 'not a config file')
+        result = types.SimpleNamespace(result='latest')
+        with mock.patch('azdev.operations.testtool.profile_context.cmd', return_value=result) as az:
+            self.assertEqual(current_profile(), 'latest')
+        az.assert_called_once()
@@ -0,0 +1,76 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from xml.etree import ElementTree
+
+from azdev.operations.testtool.pytest_runner import get_test_runner, ISOLATION_FILE
+
+
+class TestFileIsolation(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.log_path = os.path.join(self.root, 'results.xml')
+
+    def _test_file(self, name, source):
+        path = os.path.join(self.root, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def _run(self, test_paths, no_exit_first=True):
+        runner = get_test_runner(parallel=False, log_path=self.log_path, last_failed=False,
+                                 no_exit_first=no_exit_first, mark=None, isolation=ISOLATION_FILE)
+        exit_code = runner(test_paths=test_paths, pytest_args=['-q', '-p no:cacheprovider'])
+        cases = {c.get('name'): c for c in ElementTree.parse(self.log_path).getroot().iter('testcase')}
+        return exit_code, cases
+
+    def test_every_file_runs_in_its_own_process(self):
+        # module state set by one file is not seen by the other
+        first = self._test_file('test_first.py', 'import os\n\ndef test_first():\n    os.environ["AZDEV_X"] = "1"\n')
+        second = self._test_file('test_second.py',
+                                 'import os\n\ndef test_second():\n    assert "AZDEV_X" not in os.environ\n')
+
+        exit_code, cases = self._run([first, second + '::test_second'])
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(sorted(cases), ['test_first', 'test_second'])
+
+    def test_failure_stops_further_files_with_exit_first(self):
+        failing = self._test_file('test_a.py', 'def test_a():\n    assert False\n')
+        passing = self._test_file('test_b.py', 'def test_b():\n    pass\n')
+
+        exit_code, cases = self._run([failing, passing], no_exit_first=False)
+
+        self.assertNotEqual(exit_code, 0)
+        self.assertEqual(list(cases), ['test_a'])
+        self.assertIsNotNone(cases['test_a'].find('failure'))
+
+
+class TestWorkers(unittest.TestCase):
+
+    def _pytest_command(self, **kwargs):
+        runner = get_test_runner(parallel=True, log_path='results.xml', last_failed=False, no_exit_first=False,
+                                 mark=None, **kwargs)
+        with mock.patch('azdev.operations.testtool.pytest_runner.call', return_value=0) as call:
+            runner(test_paths=['test_a.py'], pytest_args=None)
+        return call.call_args[0][0]
+
+    def test_one_worker_per_cpu_by_default(self):
+        self.assertIn('-n auto', self._pytest_command())
+
+    def test_workers_limit_the_worker_processes(self):
+        self.assertIn('-n 3', self._pytest_command(workers=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from knack.util import CLIError
+
+from azdev.operations.testtool import sharding
+
+_RESULTS = '''<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest">
+{}
+</testsuite></testsuites>
+'''
+
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.mod_dir = os.path.join(self.root, 'vm', 'tests', 'latest')
+        # file i has class Class{i} with i + 1 tests of i seconds each
+        self.test_index = {'vm': self.mod_dir}
+        cases = []
+        for i in range(1, 9):
+            file_path = os.path.join(self.mod_dir, 'test_file{}.py'.format(i))
+            self.test_index['test_file{}'.format(i)] = file_path
+            for j in range(i + 1):
+                self.test_index['test_{}_{}'.format(i, j)] = '{0}::Class{1}::test_{1}_{2}'.format(file_path, i, j)
+                cases.append('<testcase classname="vm.tests.latest.test_file{0}.Class{0}" name="test_{0}_{1}" '
+                             'time="{0}" />'.format(i, j))
+        # parameters of a parametrized test add up
+        cases.append('<testcase classname="x.Class1" name="test_1_0[a]" time="1" />')
+        self.xml_path = os.path.join(self.root, 'results.xml')
+        with open(self.xml_path, 'w') as f:
+            f.write(_RESULTS.format('\n'.join(cases)))
+
+    def test_parse_shard(self):
+        self.assertEqual(sharding.parse_shard('2/8'), (2, 8))
+        for value in ['0/8', '9/8', '2', 'a/b', '2/8/1']:
+            with self.assertRaises(CLIError):
+                sharding.parse_shard(value)
+
+    def test_read_durations(self):
+        durations = sharding.read_durations([self.xml_path, os.path.join(self.root, 'missing.xml')])
+        self.assertEqual(durations[('Class3', 'test_3_0')], 3.0)
+        self.assertEqual(durations[('Class1', 'test_1_0')], 2.0)
+
+    def test_shards_are_balanced_and_cover_all_files(self):
+        durations = sharding.read_durations([self.xml_path])
+        shards = [sharding.shard_test_paths([self.mod_dir], self.test_index, (i, 3), durations) for i in range(1, 4)]
+
+        files = sorted(p for paths, _ in shards for p in paths)
+        self.assertEqual(files, sorted(p for k, p in self.test_index.items() if k.startswith('test_file')))
+        loads = shards[0][1]
+        self.assertEqual(sum(loads), sum(i * (i + 1) for i in range(1, 9)) + 1)
+        self.assertLessEqual(max(loads) - min(loads), 8)
+
+    def test_tests_without_durations_take_the_average(self):
+        file_path = self.test_index['test_file1']
+        index = dict(self.test_index, test_new=file_path + '::Class1::test_new')
+
+        with self.assertLogs(sharding.logger.name, 'WARNING'):
+            _, loads = sharding.shard_test_paths([file_path + '::Class1'], index, (1, 1),
+                                                 sharding.read_durations([self.xml_path]))
+        self.assertGreater(loads[0], 3.0)
+
+    def test_shards_without_durations_are_balanced_by_test_count(self):
+        shards = [sharding.shard_test_paths([self.mod_dir], self.test_index, (i, 3), {}) for i in range(1, 4)]
+        self.assertEqual(shards, [sharding.shard_test_paths([self.mod_dir], self.test_index, (i, 3), {})
+                                  for i in range(1, 4)])
+        # file i has i + 1 tests
+        self.assertEqual(sum(shards[0][1]), sum(i + 1 for i in range(1, 9)))
+        self.assertEqual(sorted(p for paths, _ in shards for p in paths),
+                         sorted(p for k, p in self.test_index.items() if k.startswith('test_file')))
+
+    def test_paths_without_indexed_tests_are_kept(self):
+        # a file with only module-level tests, which the test index has no entries for
+        module_level = os.path.join(self.mod_dir, 'test_module_level.py')
+        os.makedirs(self.mod_dir)
+        with open(module_level, 'w') as f:
+            f.write('def test_plain():\n    pass\n')
+        unindexed = os.path.join(self.root, 'other', 'test_renamed.py')
+        empty_dir = os.path.join(self.root, 'empty')
+
+        units = sharding.expand_test_paths([self.mod_dir, unindexed, empty_dir], self.test_index)
+        self.assertEqual(len(units), 11)
+        for path in [module_level, unindexed, empty_dir]:
+            self.assertEqual(units[path], [])
+
+        durations = sharding.estimate_durations(units, sharding.read_durations([self.xml_path]))
+        self.assertGreater(durations[module_level], 0)
+        paths = [p for i in range(1, 4)
+                 for p in sharding.shard_test_paths([self.mod_dir, unindexed], self.test_index, (i, 3),
+                                                    sharding.read_durations([self.xml_path]))[0]]
+        self.assertIn(module_level, paths)
+        self.assertIn(unindexed, paths)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,255 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+from unittest import mock
+
+from azdev.operations import testtool
+
+_TEST_FILE = '''
+from unittest import TestCase
+
+
+class {name}(TestCase):
+    def test_{name}_one(self):
+        pass
+'''
+
+_INHERITING_TEST_FILE = '''
+from . import base as base_module
+from .base import Base as RenamedBase
+
+
+class _Mixin:
+    def test_mixin(self):
+        pass
+
+
+class GammaTest(RenamedBase, _Mixin):
+    def test_gamma_two(self):
+        pass
+
+
+class AliasedGammaTest(base_module.Other):
+    pass
+'''
+
+_PUBLIC_BASE_TEST_FILE = '''
+from unittest import TestCase
+
+from .base import Base
+
+
+class VmBase(TestCase):
+    def test_common(self):
+        pass
+
+
+class VmSub(VmBase):
+    def test_sub(self):
+        pass
+
+
+class FirstHelped(Base):
+    pass
+
+
+class SecondHelped(Base):
+    pass
+'''
+
+
+class TestIncrementalTestIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path_table = {'core': {}, 'mod': {}, 'ext': {}}
+        self.name_index = {}
+        self.tests_dir = self._add_extension('idx')
+        self._write(os.path.join(self.tests_dir, 'test_alpha.py'), _TEST_FILE.format(name='Alpha'))
+        self._write(os.path.join(self.tests_dir, 'test_beta.py'), _TEST_FILE.format(name='Beta'))
+
+        self.imported = []
+
+        def _import(name):
+            self.imported.append(name)
+            return import_module(name)
+
+        for patcher in [
+                mock.patch.object(sys, 'path', sys.path + [os.path.join(self.root, 'idx'),
+                                                           os.path.join(self.root, 'idx2')]),
+                mock.patch('azdev.operations.testtool.get_azdev_config_dir', return_value=self.root),
+                mock.patch('azdev.operations.testtool.get_path_table', return_value=self.path_table),
+                mock.patch('azdev.operations.testtool.get_name_index', return_value=self.name_index),
+                mock.patch('azdev.operations.testtool.import_module', side_effect=_import),
+                # discovery runs in-process to see the patches
+                mock.patch('azdev.operations.testtool.ProcessPoolExecutor', _InlineExecutor)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self._forget_imports)
+
+    def _add_extension(self, name):
+        ext_dir = os.path.join(self.root, name)
+        package = os.path.join(ext_dir, 'azext_' + name)
+        tests_dir = os.path.join(package, 'tests', 'latest')
+        os.makedirs(tests_dir)
+        for path in [package, os.path.join(package, 'tests'), tests_dir]:
+            self._write(os.path.join(path, '__init__.py'), '')
+        self.path_table['ext'][name] = ext_dir
+        self.name_index[name] = 'azext_' + name
+        return tests_dir
+
+    @staticmethod
+    def _write(path, content):
+        with open(path, 'w') as f:
+            f.write(content)
+
+    @staticmethod
+    def _forget_imports():
+        for name in [m for m in sys.modules if m.startswith('azext_idx')]:
+            del sys.modules[name]
+
+    def _get_index(self, discover=False):
+        self.imported = []
+        self._forget_imports()
+        return testtool._get_test_index('latest', discover)  # pylint: disable=protected-access
+
+    def test_unchanged_files_are_not_imported_again(self):
+        index = self._get_index()
+        self.assertEqual(sorted(self.imported),
+                         ['azext_idx.tests.latest.test_alpha', 'azext_idx.tests.latest.test_beta'])
+        self.assertIn('test_Alpha_one', index)
+
+        self.assertEqual(self._get_index(), index)
+        self.assertEqual(self.imported, [])
+
+        # touched without changing the content
+        os.utime(os.path.join(self.tests_dir, 'test_alpha.py'), (1, 1))
+        self.assertEqual(self._get_index(), index)
+        self.assertEqual(self.imported, [])
+
+        self._get_index(discover=True)
+        self.assertEqual(len(self.imported), 2)
+
+    def test_added_changed_and_removed_files_are_picked_up(self):
+        self._get_index()
+
+        self._write(os.path.join(self.tests_dir, 'test_alpha.py'), _TEST_FILE.format(name='Gamma') + ' ')
+        self._write(os.path.join(self.tests_dir, 'test_delta.py'), _TEST_FILE.format(name='Delta'))
+        os.remove(os.path.join(self.tests_dir, 'test_beta.py'))
+        index = self._get_index()
+
+        self.assertEqual(sorted(self.imported),
+                         ['azext_idx.tests.latest.test_alpha', 'azext_idx.tests.latest.test_delta'])
+        self.assertIn('test_Gamma_one', index)
+        self.assertIn('test_Delta_one', index)
+        self.assertNotIn('test_Alpha_one', index)
+        self.assertNotIn('test_beta', index)
+        self.assertEqual(index['test_alpha'], os.path.join(self.tests_dir, 'test_alpha.py'))
+
+    def test_ast_backend_matches_import_backend(self):
+        import_index = self._get_index()
+        ast_index = self._get_index_with_ast()
+
+        self.assertEqual(ast_index, import_index)
+        self.assertEqual(self.imported, [])
+
+    def test_ast_backend_resolves_inherited_tests(self):
+        self._write(os.path.join(self.tests_dir, 'base.py'),
+                    _TEST_FILE.format(name='Base') + _TEST_FILE.format(name='Other'))
+        self._write(os.path.join(self.tests_dir, 'test_gamma.py'), _INHERITING_TEST_FILE)
+        index = self._get_index_with_ast()
+
+        gamma_path = os.path.join(self.tests_dir, 'test_gamma.py')
+        self.assertEqual(index['test_Base_one'], gamma_path + '::GammaTest::test_Base_one')
+        self.assertEqual(index['test_mixin'], gamma_path + '::GammaTest::test_mixin')
+        self.assertEqual(index['test_Other_one'], gamma_path + '::AliasedGammaTest::test_Other_one')
+        self.assertNotIn('_Mixin', index)
+
+        # changing only the file of the base classes is picked up as well
+        self._write(os.path.join(self.tests_dir, 'base.py'), _TEST_FILE.format(name='Base'))
+        index = self._get_index_with_ast()
+        self.assertNotIn('test_Other_one', index)
+        self.assertNotIn('AliasedGammaTest', index)
+
+    def test_ast_backend_lists_tests_of_public_base_classes_once(self):
+        self._write(os.path.join(self.tests_dir, 'base.py'), _TEST_FILE.format(name='Base'))
+        self._write(os.path.join(self.tests_dir, 'test_vm.py'), _PUBLIC_BASE_TEST_FILE)
+        with mock.patch('azdev.operations.testtool.logger') as logger:
+            ast_index = self._get_index_with_ast(discover=True)
+            import_index = self._get_index(discover=True)
+        logger.error.assert_not_called()
+
+        vm_path = os.path.join(self.tests_dir, 'test_vm.py')
+        self.assertEqual(ast_index['test_common'], import_index['test_common'])
+        self.assertEqual(ast_index['test_common'], vm_path + '::VmBase::test_common')
+        self.assertEqual(ast_index['test_sub'], import_index['test_sub'])
+        # a test of a helper base class is listed under the first class inheriting it only
+        self.assertEqual(ast_index['test_Base_one'], vm_path + '::FirstHelped::test_Base_one')
+        self.assertNotIn('SecondHelped', ast_index)
+
+    def test_parallel_discovery_merges_like_serial_discovery(self):
+        self._write(os.path.join(self._add_extension('idx2'), 'test_alpha.py'), _TEST_FILE.format(name='Alpha'))
+
+        for backend in [testtool.IMPORT_BACKEND, testtool.AST_BACKEND]:
+            serial_index = testtool._discover_tests('latest', backend=backend)  # pylint: disable=protected-access
+            self._forget_imports()
+            with mock.patch('azdev.operations.testtool.ProcessPoolExecutor', ProcessPoolExecutor):
+                parallel_index = testtool._discover_tests('latest', backend=backend)  # pylint: disable=protected-access
+
+            self.assertEqual(parallel_index, serial_index)
+            self.assertEqual(list(parallel_index), list(serial_index))
+            self.assertNotIn('Alpha', parallel_index)
+            self.assertIn('azext_idx.Alpha', parallel_index)
+            self.assertIn('azext_idx2.Alpha', parallel_index)
+
+    def test_profiles_run_the_tests_of_their_own_folder(self):
+        hybrid_dir = os.path.join(os.path.dirname(self.tests_dir), 'hybrid_2019_03_01')
+        os.makedirs(hybrid_dir)
+        self._write(os.path.join(hybrid_dir, '__init__.py'), '')
+        self._write(os.path.join(hybrid_dir, 'test_hybrid.py'), _TEST_FILE.format(name='Hybrid'))
+
+        with mock.patch('azdev.operations.testtool.require_virtual_env'), \
+                mock.patch('azdev.operations.testtool._run_profiles', return_value=0) as run_profiles, \
+                self.assertRaises(SystemExit):
+            testtool.run_tests(['idx'], profiles='latest,2019-03-01-hybrid',
+                               isolation=testtool.ISOLATION_FILE)
+
+        profiles, test_paths = run_profiles.call_args[0][:2]
+        self.assertEqual(profiles, ['latest', '2019-03-01-hybrid'])
+        self.assertEqual(test_paths['latest'], [os.path.join(self.tests_dir, 'test_alpha.py'),
+                                                os.path.join(self.tests_dir, 'test_beta.py')])
+        self.assertEqual(test_paths['2019-03-01-hybrid'], [os.path.join(hybrid_dir, 'test_hybrid.py')])
+
+    def _get_index_with_ast(self, discover=False):
+        self.imported = []
+        return testtool._get_test_index('latest', discover, testtool.AST_BACKEND)  # pylint: disable=protected-access
+
+
+class _InlineExecutor:
+    def __init__(self, *_):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    @staticmethod
+    def map(func, *iterables, **_):
+        return map(func, *iterables)
+
+
+if __name__ == '__main__':
+    unittest.main()
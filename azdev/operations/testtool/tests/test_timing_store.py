@@ -0,0 +1,85 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from azdev.operations.testtool.timing_store import TimingStore
+
+_VM = 'azure.cli.command_modules.vm.tests.latest.test_vm.VMTest'
+_EXT = 'azext_aks_preview.tests.latest.test_aks.AksTest'
+
+
+def _case(classname, name, duration, outcome=None):
+    child = {'failed': '<failure message="boom" />', 'skipped': '<skipped />'}.get(outcome, '')
+    return '<testcase classname="{}" name="{}" time="{}">{}</testcase>'.format(classname, name, duration, child)
+
+
+class TestTimingStore(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.store = TimingStore(os.path.join(self.root, 'timings.db'))
+
+    def _add_run(self, cases, commit='0123abcd', created=None, **kwargs):
+        xml_path = os.path.join(self.root, 'results.xml')
+        with open(xml_path, 'w') as f:
+            f.write('<testsuites><testsuite>{}</testsuite></testsuites>'.format(''.join(cases)))
+        return self.store.add_junit(xml_path, commit=commit, created=created, **kwargs)
+
+    def test_statistics(self):
+        for run in range(5):
+            self.assertEqual(self._add_run([
+                _case(_VM, 'test_vm_create', 10 + run * 10),
+                _case(_VM, 'test_vm_list', 1, 'failed' if run == 2 else None),
+                _case(_VM, 'test_vm_skip', 100, 'skipped'),
+                _case(_EXT, 'test_aks[a]', 2),
+                _case(_EXT, 'test_aks[b]', 3),
+            ], created=1000 + run), 5)
+
+        self.assertEqual(self.store.slowest_tests(1), [(_VM + '.test_vm_create', 30.0, 5)])
+        self.assertEqual([m[0] for m in self.store.slowest_modules(5)], ['vm', 'azext_aks_preview'])
+        self.assertEqual(self.store.flaky_tests(5), [(_VM + '.test_vm_list', 4, 1)])
+        self.assertEqual(self.store.duration_changes(1), [(_VM + '.test_vm_create', 25.0, 50.0, 1.0)])
+        self.assertEqual(self.store.recent_runs(1), [(1004, '0123abcd', 5, 156.0, 0)])
+
+        durations = self.store.durations()
+        self.assertEqual(durations[('AksTest', 'test_aks')], 5.0)
+        self.assertNotIn(('VMTest', 'test_vm_skip'), durations)
+
+    def test_failures_at_different_commits_are_not_flaky(self):
+        self._add_run([_case(_VM, 'test_vm_list', 1)], commit='aaaa')
+        self._add_run([_case(_VM, 'test_vm_list', 1, 'failed')], commit='bbbb')
+
+        self.assertEqual(self.store.flaky_tests(5), [])
+
+    def test_wall_time_by_isolation_level(self):
+        cases = [_case(_VM, 'test_vm_create', 1), _case(_VM, 'test_vm_list', 1)]
+        self._add_run(cases, isolation='test', wall_time=10)
+        self._add_run(cases, isolation='test', wall_time=14)
+        self._add_run(cases, isolation='worker', wall_time=4)
+        self._add_run(cases)
+
+        self.assertEqual(self.store.isolation_levels(), [('test', 2, 2.0, 6.0), ('worker', 1, 2.0, 2.0)])
+
+    def test_store_without_isolation_columns_is_upgraded(self):
+        import sqlite3
+        path = os.path.join(self.root, 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE runs (id INTEGER PRIMARY KEY, created REAL NOT NULL, commit_id TEXT NOT NULL, '
+                     'source TEXT)')
+        conn.close()
+
+        self.store = TimingStore(path)
+        self._add_run([_case(_VM, 'test_vm_create', 1)], isolation='file', wall_time=3)
+        self.assertEqual(self.store.isolation_levels(), [('file', 1, 1.0, 3.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+from contextlib import contextmanager
+import os
+import re
+import sqlite3
+import time
+from xml.etree import ElementTree
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from azdev.utilities import get_azdev_config_dir, make_dirs
+
+logger = get_logger(__name__)
+
+TIMING_STORE_FILE = 'test_timings.db'
+
+PASSED = 'passed'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+_MODULE_REGEX = re.compile(r'command_modules\.(?P<mod>[^.]+)|(?P<ext>azext_[^.]+)|'
+                           r'azure\.cli\.(?!command_modules)(?P<core>[^.]+)')
+_PARAMETERS_REGEX = re.compile(r'\[.*\]$')
+
+
+def _module_name(classname):
+    """ The command module, extension or core package a junit test case class name belongs to. """
+    match = _MODULE_REGEX.search(classname)
+    if not match:
+        return classname.split('.')[0]
+    return match.group('mod') or match.group('ext') or match.group('core')
+
+
+def _outcome(case):
+    if case.find('failure') is not None or case.find('error') is not None:
+        return FAILED
+    if case.find('skipped') is not None:
+        return SKIPPED
+    return PASSED
+
+
+def read_junit(xml_path):
+    """ (class name, test name, duration, outcome) of every test case in a junit XML file. """
+    try:
+        tree = ElementTree.parse(xml_path)
+    except ElementTree.ParseError as ex:
+        raise CLIError("Unable to read test results at '{}': {}".format(xml_path, ex))
+    return [(case.get('classname', ''), case.get('name', ''), float(case.get('time') or 0), _outcome(case))
+            for case in tree.iter('testcase')]
+
+
+class TimingStore:
+    """ Durations and outcomes of every test of every `azdev test` run, kept in a SQLite file in the azdev
+    config dir. """
+
+    def __init__(self, path=None):
+        if not path:
+            make_dirs(get_azdev_config_dir())
+            path = os.path.join(get_azdev_config_dir(), TIMING_STORE_FILE)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS runs ('
+                         'id INTEGER PRIMARY KEY, created REAL NOT NULL, commit_id TEXT NOT NULL, source TEXT)')
+            conn.execute('CREATE TABLE IF NOT EXISTS results ('
+                         'run_id INTEGER NOT NULL, module TEXT NOT NULL, classname TEXT NOT NULL, '
+                         'name TEXT NOT NULL, duration REAL NOT NULL, outcome TEXT NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS results_test ON results (classname, name)')
+            columns = [c[1] for c in conn.execute('PRAGMA table_info(runs)')]
+            for column, column_type in [('isolation', 'TEXT'), ('wall_time', 'REAL')]:
+                if column not in columns:
+                    conn.execute('ALTER TABLE runs ADD COLUMN {} {}'.format(column, column_type))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_junit(self, xml_path, commit=None, created=None, isolation=None, wall_time=None):
+        """ Record the test cases of a junit XML file as one run, which took `wall_time` seconds with test
+        isolation level `isolation`. Returns the number of test cases. """
+        from azdev.operations.performance.result_store import get_cli_commit
+
+        rows = [(_module_name(case[0]),) + case for case in read_junit(xml_path)]
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            run_id = conn.execute('INSERT INTO runs (created, commit_id, source, isolation, wall_time) '
+                                  'VALUES (?, ?, ?, ?, ?)',
+                                  (created or time.time(), commit or get_cli_commit(), xml_path, isolation,
+                                   wall_time)).lastrowid
+            conn.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)', [(run_id,) + row for row in rows])
+        return len(rows)
+
+    def durations(self):
+        """ Mean duration in seconds of every test that ran, keyed by (class name, test name). Runs of the
+        parameters of a parametrized test are summed up. """
+        with self._connect() as conn:
+            rows = conn.execute('SELECT run_id, classname, name, duration FROM results WHERE outcome != ?',
+                                (SKIPPED,)).fetchall()
+        runs = {}
+        for run_id, classname, name, duration in rows:
+            key = (classname.split('.')[-1], _PARAMETERS_REGEX.sub('', name))
+            per_run = runs.setdefault(key, {})
+            per_run[run_id] = per_run.get(run_id, 0.0) + duration
+        return {key: sum(per_run.values()) / len(per_run) for key, per_run in runs.items()}
+
+    def recent_failures(self):
+        """ (class name, test name) of the tests that failed the last time they ran. """
+        with self._connect() as conn:
+            rows = conn.execute('SELECT classname, name, outcome FROM results WHERE outcome != ? ORDER BY run_id',
+                                (SKIPPED,)).fetchall()
+        latest = {}
+        for classname, name, outcome in rows:
+            latest[(classname.split('.')[-1], _PARAMETERS_REGEX.sub('', name))] = outcome
+        return {key for key, outcome in latest.items() if outcome == FAILED}
+
+    def last_run_time(self):
+        """ When the latest run was recorded, or None. """
+        with self._connect() as conn:
+            return conn.execute('SELECT MAX(created) FROM runs').fetchone()[0]
+
+    def slowest_tests(self, top):
+        """ (test, mean duration, runs) of the `top` slowest tests. """
+        with self._connect() as conn:
+            return conn.execute("SELECT classname || '.' || name, AVG(duration), COUNT(*) FROM results "
+                                'WHERE outcome != ? GROUP BY classname, name ORDER BY AVG(duration) DESC LIMIT ?',
+                                (SKIPPED, top)).fetchall()
+
+    def slowest_modules(self, top):
+        """ (module, mean duration of all its tests in a run, runs) of the `top` slowest modules. """
+        with self._connect() as conn:
+            return conn.execute('SELECT module, AVG(total), COUNT(*) FROM ('
+                                '  SELECT run_id, module, SUM(duration) AS total FROM results WHERE outcome != ? '
+                                '  GROUP BY run_id, module) '
+                                'GROUP BY module ORDER BY AVG(total) DESC LIMIT ?', (SKIPPED, top)).fetchall()
+
+    def flaky_tests(self, top):
+        """ (test, passes, failures) of tests that both passed and failed at the same CLI commit. """
+        with self._connect() as conn:
+            return conn.execute("SELECT classname || '.' || name, SUM(passes), SUM(failures) FROM ("
+                                "  SELECT classname, name, SUM(outcome = ?) AS passes, SUM(outcome = ?) AS failures "
+                                '  FROM results JOIN runs ON runs.id = results.run_id '
+                                '  GROUP BY classname, name, commit_id HAVING passes > 0 AND failures > 0) '
+                                'GROUP BY classname, name ORDER BY SUM(failures) DESC, 1 LIMIT ?',
+                                (PASSED, FAILED, top)).fetchall()
+
+    def duration_changes(self, top, min_runs=3):
+        """ (test, median of earlier durations, latest duration, change) of the `top` tests whose latest duration
+        differs the most from the median of their `min_runs` or more earlier passing runs. """
+        from statistics import median
+
+        with self._connect() as conn:
+            rows = conn.execute("SELECT classname || '.' || name, duration FROM results "
+                                'WHERE outcome = ? ORDER BY run_id', (PASSED,)).fetchall()
+        history = {}
+        for test, duration in rows:
+            history.setdefault(test, []).append(duration)
+
+        changes = []
+        for test, durations in history.items():
+            if len(durations) <= min_runs:
+                continue
+            before, latest = median(durations[:-1]), durations[-1]
+            if before:
+                changes.append((test, before, latest, (latest - before) / before))
+        return sorted(changes, key=lambda c: abs(c[3]), reverse=True)[:top]
+
+    def isolation_levels(self):
+        """ (isolation level, runs, mean tests per run, mean wall time per test) of the runs with a wall time. """
+        with self._connect() as conn:
+            return conn.execute('SELECT isolation, COUNT(*), AVG(tests), AVG(wall_time / tests) FROM ('
+                                '  SELECT runs.id, isolation, wall_time, COUNT(*) AS tests '
+                                '  FROM runs JOIN results ON runs.id = results.run_id '
+                                '  WHERE wall_time IS NOT NULL AND isolation IS NOT NULL GROUP BY runs.id) '
+                                'GROUP BY isolation ORDER BY isolation').fetchall()
+
+    def recent_runs(self, top):
+        """ (created, commit, tests, total duration, failures) of the `top` latest runs, latest first. """
+        with self._connect() as conn:
+            return conn.execute('SELECT runs.created, runs.commit_id, COUNT(*), SUM(duration), SUM(outcome = ?) '
+                                'FROM runs JOIN results ON runs.id = results.run_id '
+                                'GROUP BY runs.id ORDER BY runs.created DESC LIMIT ?', (FAILED, top)).fetchall()
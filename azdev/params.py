@@ -41,7 +41,8 @@ def load_arguments(self, _):
         c.argument('deps', options_list=['--deps-from', '-d'], choices=['requirements.txt', 'setup.py'], default='requirements.txt', help="Choose the file to resolve dependencies.")
 
     with ArgumentsContext(self, 'test') as c:
-        c.argument('discover', options_list='--discover', action='store_true', help='Build an index of test names so that you don\'t need to specify fully qualified test paths.')
+        c.argument('discover', options_list='--discover', action='store_true', help='Rebuild the index of test names from scratch. The index is otherwise kept up to date by re-importing only the test files that were added or changed.')
+        c.argument('discovery_backend', options_list='--discovery-backend', choices=['import', 'ast'], default='import', help='How to find the tests of each test file: import it, or parse it with `ast` on a process pool without importing it. The `ast` backend also lists tests inherited from base classes in other files, but not tests generated at run time.')
         c.argument('xml_path', options_list='--xml-path', help='Path and filename at which to store the results in XML format. If omitted, the file will be saved as `test_results.xml` in your `.azdev` directory.')
         c.argument('in_series', options_list='--series', action='store_true', help='Disable test parallelization.')
         c.argument('run_live', options_list='--live', action='store_true', help='Run all tests live.')
@@ -51,10 +52,15 @@ def load_arguments(self, _):
                           "Omit to check all or use 'CLI' or 'EXT' to check only CLI modules or extensions respectively.",
                      completer=get_test_completion)
         c.argument('profile', options_list='--profile', help='Run automation against a specific profile. If omit, the tests will run against current profile.')
+        c.argument('profiles', options_list='--profiles', help='Comma-separated list of profiles to run the tests against at the same time, e.g. `latest,2019-03-01-hybrid`. Each profile runs the tests of its own test folder, e.g. tests/hybrid_2019_03_01, with a copy of the Azure CLI config dir and writes its results next to --xml-path, with the profile name added to the file name.')
         c.argument('pytest_args', nargs=argparse.REMAINDER, options_list=['--pytest-args', '-a'], help='Denotes the remaining args will be passed to pytest.')
         c.argument('last_failed', options_list='--lf', action='store_true', help='Re-run the last tests that failed.')
         c.argument('no_exit_first', options_list='--no-exitfirst', action='store_true', help='Do not exit on first error or failed test')
         c.argument('mark', help='Select tests with this mark. You can add @pytest.mark.custom_mark to a test')
+        c.argument('isolation', choices=['test', 'file', 'worker'],
+                   help='How tests are kept apart. `test` forks a process for every test (POSIX only), `file` runs every test file in a pytest process of its own and `worker` runs all tests of a parallel worker in one warm interpreter, which is fastest for recorded tests. Live tests are always isolated per test. Default: test.')
+        c.argument('order', nargs='+', choices=['failed', 'changed', 'slowest'],
+                   help='Run the test files in this order, by precedence: `failed` puts files with tests that failed in their last run first, `changed` those of modules changed since the last run, and `slowest` the longest running ones, so that parallel workers finish together. Uses the timings recorded by earlier runs.')
 
         # CI parameters
         c.argument('cli_ci',
@@ -62,6 +68,19 @@ def load_arguments(self, _):
                    arg_group='Continuous Integration',
                    help='Apply incremental test strategy to Azure CLI on Azure DevOps')
 
+        c.argument('record_impact', action='store_true', arg_group='Test Impact',
+                   help='Record which source files every test executes, with pytest-cov, into a local test impact index. Tests run unforked while recording.')
+        c.argument('impacted', action='store_true', arg_group='Test Impact',
+                   help='Run only the tests whose recorded source files changed between --tgt and --src of --repo, plus tests in changed test files and recordings. Requires an index from --record-impact.')
+
+        c.argument('shard', arg_group='Sharding',
+                   help="Run only one of N shards of the selected tests, given as INDEX/COUNT, e.g. '2/8'. Test files are spread over the shards so that their expected run times, taken from earlier junit XML results, are about equal.")
+        c.argument('durations_from', nargs='+', arg_group='Sharding',
+                   help='Space-separated list of junit XML files of earlier runs to take test durations from for --shard. Without it, shards are balanced by the number of tests in each test file, so that every agent splits the tests the same way.')
+
+    with ArgumentsContext(self, 'test-stats') as c:
+        c.argument('top', type=int, help='Number of entries to show per table.')
+
     with ArgumentsContext(self, 'coverage') as c:
         c.argument('prefix', type=str, help='Filter analysis by command prefix.')
         c.argument('report', action='store_true', help='Display results as a report.')
@@ -98,6 +117,10 @@ def load_arguments(self, _):
                         'For example, specifying "medium" runs linter rules that have "high" or "medium" severity. '
                         'However, specifying "low" runs the linter on every rule, regardless of severity. '
                         'Defaults to "high".')
+        c.argument('no_cache', options_list='--no-cache', action='store_true',
+                   help='Evaluate every rule on every entity. By default the verdicts of earlier runs are replayed for commands, parameters and help entries whose metadata, help and rules did not change.')
+        c.argument('jobs', options_list='--jobs', type=int,
+                   help='Number of processes to evaluate the rules in. They are forked after the command table is loaded, so they share it. Rules run in a single process on platforms that can not fork. Default: the number of CPUs.')
     # endregion
 
     # region statistics
@@ -138,9 +161,37 @@ def load_arguments(self, _):
     with ArgumentsContext(self, 'perf') as c:
         c.argument('runs', type=int, help='Number of runs to average performance over.')
 
+    with ArgumentsContext(self, 'perf load-times') as c:
+        c.argument('import_time', action='store_true', help='Run the CLI with `python -X importtime` and report the cumulative import time per command module and its slowest transitive imports.')
+        c.argument('top', type=int, help='Number of transitive imports to show per module with --import-time.')
+        c.argument('parallel', action='store_true', help='Run the warm-up once, then run the measured runs concurrently, each pinned to its own CPU core. Linux only.')
+
     with ArgumentsContext(self, 'perf benchmark') as c:
         c.positional('commands', nargs="*", help="Command prefix to run benchmark. Omit to check all commands with --help.")
         c.argument('top', type=int, help='Show N slowest commands. 0 for all.')
+        c.argument('warm', action='store_true',
+                   help='Also time every command in a child forked from a worker that already imported azure.cli.core. '
+                        'The difference to the cold numbers is the interpreter startup and import cost. POSIX only.')
+        c.argument('max_rel_ci', type=float, arg_group='Adaptive Sampling',
+                   help='Instead of a fixed number of runs, keep sampling each command until the 95%% confidence interval of its median is narrower than this fraction of the median, e.g. 0.05. --runs is ignored.')
+        c.argument('time_budget', type=float, arg_group='Adaptive Sampling',
+                   help='Maximum number of seconds to spend on one command with --max-rel-ci.')
+        c.argument('task_timeout', type=float, help='Seconds after which a single run is killed and recorded as failed.')
+        c.argument('profile_slowest', type=int, arg_group='Profiling',
+                   help='Afterwards, rerun the N slowest commands under cProfile and save a .pstats file and collapsed stacks for flame graph tools for each.')
+        c.argument('profile_dir', arg_group='Profiling', help='Directory to write the profiles of --profile-slowest to. Defaults to the profiles folder in the azdev config dir.')
+        c.argument('resume', action='store_true', help='Continue an interrupted benchmark from its journal: commands already measured are skipped and runs already taken are kept.')
+
+    with ArgumentsContext(self, 'perf memory') as c:
+        c.positional('commands', nargs='*', help='Commands to measure `az <command> --help` for, e.g. "vm create". The full command table load is always measured.')
+        c.argument('top', type=int, help='Number of command modules and allocating source lines to show per target.')
+
+    with ArgumentsContext(self, 'perf compare') as c:
+        c.argument('base', help='Commit (or unique prefix) of the CLI repo to use as baseline. Defaults to the second most recent stored baseline.')
+        c.argument('target', help='Commit (or unique prefix) of the CLI repo to compare with the baseline. Defaults to the most recent stored baseline.')
+        c.argument('kind', choices=['benchmark', 'benchmark-warm', 'load-times', 'import-times', 'memory', 'memory-modules'], help='Which stored measurements to compare.')
+        c.argument('alpha', type=float, help='Significance level of the Mann-Whitney U test.')
+        c.argument('min_change', type=float, help='Minimum relative change of the median that counts as a regression, e.g. 0.05 for 5%%.')
 
     with ArgumentsContext(self, 'extension') as c:
         c.argument('dist_dir', help='Name of a directory in which to save the resulting WHL files.')
@@ -18,6 +18,15 @@ def performance_benchmark_data_transformer(result):
         item["Max"] = r["Max"]
         item["Media"] = r["Media"]
         item["Std"] = r["Std"]
+        item["Failed"] = r.get("Failed", 0)
+        if "Warm Media" in r:
+            item["Warm Avg"] = r["Warm Avg"]
+            item["Warm Media"] = r["Warm Media"]
+            # what is left after removing the dispatch time is interpreter startup and imports
+            # the medians are None when every run of the command failed
+            medians = [r["Media"], r["Warm Media"]]
+            item["Startup"] = round(medians[0] - medians[1], 4) \
+                if all(isinstance(m, (int, float)) for m in medians) else None
         output.append(item)
 
     return output
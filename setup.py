@@ -61,6 +61,7 @@ setup(
         'azdev.operations.testtool',
         'azdev.operations.extensions',
         'azdev.operations.statistics',
+        'azdev.operations.performance',
         'azdev.operations.command_change',
         'azdev.operations.cmdcov',
         'azdev.utilities',